@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+import http_pool
+import metrics
+import rate_limiter
+import resilience
+import response_cache
+from json_stream import ArrayItemParser
+
+# langchain takes seconds to import: only pay for it once a model is needed
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+# gpt-4o accepts response_format json_schema, so the schemas of schemas.py
+# are enforced during generation (see structured_output.bind_schema)
+DEFAULT_MODEL = os.environ.get("AGENT_MODEL", "gpt-4o")
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_llms: Dict[Tuple, ChatOpenAI] = {}
+_graphs: Dict[Tuple, Any] = {}
+# id(graph) -> agent name, to label the metrics of each call
+_graph_names: Dict[int, str] = {}
+
+
+def _params_key(model: str, params: Dict[str, Any]) -> Tuple:
+    return (model, tuple(sorted(params.items())))
+
+
+def get_llm(model: str = DEFAULT_MODEL, **params: Any) -> ChatOpenAI:
+    """Return the process-wide chat client for the given model settings.
+
+    Every client sends its requests through the pools of :mod:`http_pool`,
+    shared with the podcast generator, so connections stay warm between
+    calls. The SDK's own retries are off unless ``max_retries`` is given:
+    calls are retried by :mod:`resilience` instead.
+    """
+    key = _params_key(model, params)
+    llm = _llms.get(key)
+    if llm is None:
+        with _lock:
+            llm = _llms.get(key)
+            if llm is None:
+                from langchain_openai import ChatOpenAI
+                defaults = {
+                    "max_retries": 0,
+                    "http_client": http_pool.get_client(),
+                    "http_async_client": http_pool.get_async_client(),
+                }
+                llm = ChatOpenAI(model=model, **{**defaults, **params})
+                _llms[key] = llm
+    return llm
+
+
+def get_graph(
+    name: str,
+    build: Callable[[ChatOpenAI], Any],
+    model: str = DEFAULT_MODEL,
+    **params: Any,
+) -> Any:
+    """Return the compiled graph ``name``, building it once per process."""
+    key = (name,) + _params_key(model, params)
+    graph = _graphs.get(key)
+    if graph is None:
+        with _lock:
+            graph = _graphs.get(key)
+            if graph is None:
+                graph = build(get_llm(model, **params))
+                _graphs[key] = graph
+                _graph_names[id(graph)] = name
+    return graph
+
+
+def cache_entry(
+    prompt: str, model: str = DEFAULT_MODEL, **params: Any
+) -> Tuple[response_cache.ResponseCache, str]:
+    """Return the response cache and the content address of ``prompt``."""
+    temperature = get_llm(model, **params).temperature
+    return response_cache.get_cache(), response_cache.make_key(prompt, model, temperature)
+
+
+def complete(
+    graph: Any,
+    prompt: str,
+    array_key: Optional[str] = None,
+    on_item: Optional[Callable[[Any], None]] = None,
+) -> str:
+    """Run ``graph`` on ``prompt`` and return the completion text.
+
+    With ``on_item`` the completion is streamed token by token and every
+    object of the ``array_key`` array is handed to it as soon as its closing
+    brace arrives, long before the model has finished. Calls go through the
+    shared ``chat`` rate limiter and are retried on transient errors, unless
+    items were already handed out.
+    """
+    from langchain_core.messages import HumanMessage
+
+    messages = [HumanMessage(content=prompt)]
+    emitted: List[Any] = []
+
+    def attempt() -> str:
+        with rate_limiter.get_limiter("chat").limit(_estimate_tokens(prompt)) as permit:
+            started = time.perf_counter()
+            message = None
+            if on_item is None:
+                message = graph.invoke(messages)[-1]
+                text = message.content
+            else:
+                parser = ArrayItemParser(array_key)
+                parts = []
+                for chunk, _ in graph.stream(messages, stream_mode="messages"):
+                    _feed_chunk(chunk, parser, parts, _emitting(on_item, emitted))
+                text = "".join(parts)
+            permit.record_usage(_log_usage(graph, prompt, text, started, message))
+        return text
+
+    try:
+        return resilience.call(attempt, "llm", upstream="chat", retryable=_retryable(emitted))
+    except Exception:
+        metrics.ERRORS.inc(component="llm")
+        raise
+
+
+async def acomplete(
+    graph: Any,
+    prompt: str,
+    array_key: Optional[str] = None,
+    on_item: Optional[Callable[[Any], None]] = None,
+) -> str:
+    """Async :func:`complete`, running the graph with ``ainvoke``/``astream``."""
+    from langchain_core.messages import HumanMessage
+
+    messages = [HumanMessage(content=prompt)]
+    emitted: List[Any] = []
+
+    async def attempt() -> str:
+        async with rate_limiter.get_limiter("chat").alimit(_estimate_tokens(prompt)) as permit:
+            started = time.perf_counter()
+            message = None
+            if on_item is None:
+                message = (await graph.ainvoke(messages))[-1]
+                text = message.content
+            else:
+                parser = ArrayItemParser(array_key)
+                parts = []
+                async for chunk, _ in graph.astream(messages, stream_mode="messages"):
+                    _feed_chunk(chunk, parser, parts, _emitting(on_item, emitted))
+                text = "".join(parts)
+            permit.record_usage(_log_usage(graph, prompt, text, started, message))
+        return text
+
+    try:
+        return await resilience.acall(attempt, "llm", upstream="chat", retryable=_retryable(emitted))
+    except Exception:
+        metrics.ERRORS.inc(component="llm")
+        raise
+
+
+def _emitting(on_item: Callable[[Any], None], emitted: List[Any]) -> Callable[[Any], None]:
+    def emit(item: Any) -> None:
+        emitted.append(item)
+        on_item(item)
+    return emit
+
+
+def _retryable(emitted: List[Any]) -> Callable[[BaseException], bool]:
+    """Retry transient errors only while no item has reached the caller, so
+    a retried stream never hands out duplicates."""
+    return lambda error: not emitted and resilience.is_retryable(error)
+
+
+def _estimate_tokens(prompt: str) -> int:
+    """Tokens a call will cost: the prompt plus a typical completion."""
+    import prompting
+
+    return prompting.count_tokens(prompt) + rate_limiter.OUTPUT_TOKENS_ESTIMATE
+
+
+def _feed_chunk(
+    chunk: Any, parser: ArrayItemParser, parts: list, on_item: Callable[[Any], None]
+) -> None:
+    from langchain_core.messages import AIMessageChunk
+
+    if not isinstance(chunk, AIMessageChunk) or not isinstance(chunk.content, str):
+        return
+    parts.append(chunk.content)
+    for item in parser.feed(chunk.content):
+        on_item(item)
+
+
+def _log_usage(graph: Any, prompt: str, text: str, started: float, message: Any = None) -> int:
+    """Record the duration and the tokens sent and received by one model
+    call, and return their sum.
+
+    Uses the usage reported by the API when there is one, otherwise counts
+    locally with the tokenizer.
+    """
+    import prompting
+
+    usage = getattr(message, "usage_metadata", None) or {}
+    tokens_in = usage.get("input_tokens") or prompting.count_tokens(prompt)
+    tokens_out = usage.get("output_tokens") or prompting.count_tokens(text)
+    elapsed = time.perf_counter() - started
+    agent = _graph_names.get(id(graph), "unknown")
+    metrics.LLM_CALL_SECONDS.observe(elapsed, agent=agent)
+    metrics.LLM_TOKENS.inc(tokens_in, agent=agent, direction="input")
+    metrics.LLM_TOKENS.inc(tokens_out, agent=agent, direction="output")
+    logger.info("%s: tokens entrada=%d saída=%d (%.2fs)", agent, tokens_in, tokens_out, elapsed)
+    return tokens_in + tokens_out
+
+
+def replay_items(
+    result: dict, array_key: str, on_item: Optional[Callable[[Any], None]]
+) -> None:
+    """Hand every item of a cached result to ``on_item``."""
+    if on_item is not None:
+        for item in result.get(array_key, []):
+            on_item(item)
+
+
+def warm_up(model: str = DEFAULT_MODEL, **params: Any) -> None:
+    """Compile every agent graph and load the tokenizer so the first request
+    does not pay for it."""
+    import course_content_agent
+    import flashcards_agent
+    import prompting
+    import quizzes_agent
+
+    for agent in (course_content_agent, flashcards_agent, quizzes_agent):
+        agent.get_graph(model, **params)
+    prompting.warm_up(model)
+
+
+def clear() -> None:
+    """Drop every cached client and graph (mainly for benchmarks)."""
+    with _lock:
+        _llms.clear()
+        _graphs.clear()
+        _graph_names.clear()
@@ -5,21 +5,27 @@
 Utilitários para manipulação de áudio no sistema de podcast
 """
 
+import logging
 import os
+import shutil
 import tempfile
 import subprocess
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from dataclasses import dataclass
 import json
+from importlib.util import find_spec
 
-try:
-    from pydub import AudioSegment
-    from pydub.playback import play
-    PYDUB_AVAILABLE = True
-except ImportError:
-    PYDUB_AVAILABLE = False
-    print("⚠️  PyDub não instalado. Funcionalidade de áudio limitada.")
-    print("   Instale com: pip install pydub")
+import mp3_frames
+
+logger = logging.getLogger(__name__)
+
+# O pydub só é importado quando um áudio é processado: importá-lo procura o
+# ffmpeg no PATH, custo que não precisa ser pago na subida do processo
+PYDUB_AVAILABLE = find_spec("pydub") is not None
+if not PYDUB_AVAILABLE:
+    logger.warning("PyDub não instalado. Funcionalidade de áudio limitada. Instale com: pip install pydub")
+
+FFMPEG_AVAILABLE = shutil.which("ffmpeg") is not None
 
 @dataclass
 class AudioConfig:
@@ -52,8 +58,32 @@ class AudioProcessor:
             Caminho do arquivo concatenado
         """
 
+        # Clipes mp3 do TTS têm o mesmo formato: basta copiar os frames, sem
+        # decodificar nem recodificar
+        if self.config.format == "mp3" and output_path.lower().endswith(".mp3"):
+            existing = [f for f in audio_files if os.path.exists(f)]
+            for missing in set(audio_files) - set(existing):
+                logger.warning("Arquivo não encontrado: %s", missing)
+            try:
+                duration = mp3_frames.concatenate(
+                    existing, output_path, gap_ms=silence_duration if add_silence else 0
+                )
+                logger.info("Áudio concatenado (cópia de frames) salvo em: %s", output_path)
+                logger.info("Duração total: %.1f segundos", duration)
+                return output_path
+            except mp3_frames.Mp3FormatError as e:
+                logger.warning("Concatenação por frames indisponível (%s), recodificando", e)
+
+        return self.concatenate_with_pydub(audio_files, output_path, add_silence, silence_duration)
+
+    def concatenate_with_pydub(self, audio_files: List[str], output_path: str,
+                               add_silence: bool = True, silence_duration: int = 500) -> str:
+        """Concatena decodificando tudo e recodificando o resultado (qualquer formato)"""
+
         if not PYDUB_AVAILABLE:
-            return self._concatenate_with_ffmpeg(audio_files, output_path)
+            return self._concatenate_with_ffmpeg(audio_files, output_path, silence_duration if add_silence else 0)
+
+        from pydub import AudioSegment
 
         try:
             # Inicia com áudio vazio
@@ -61,7 +91,7 @@ class AudioProcessor:
 
             for i, audio_file in enumerate(audio_files):
                 if not os.path.exists(audio_file):
-                    print(f"⚠️  Arquivo não encontrado: {audio_file}")
+                    logger.warning("Arquivo não encontrado: %s", audio_file)
                     continue
 
                 # Carrega arquivo de áudio
@@ -78,45 +108,129 @@ class AudioProcessor:
             # Salva arquivo final
             combined.export(output_path, format=self.config.format)
 
-            print(f"✅ Áudio concatenado salvo em: {output_path}")
-            print(f"⏱️  Duração total: {len(combined) / 1000:.1f} segundos")
+            logger.info("Áudio concatenado salvo em: %s", output_path)
+            logger.info("Duração total: %.1f segundos", len(combined) / 1000)
 
             return output_path
 
         except Exception as e:
-            print(f"❌ Erro na concatenação: {e}")
-            return self._concatenate_with_ffmpeg(audio_files, output_path)
+            logger.error("Erro na concatenação: %s", e)
+            return self._concatenate_with_ffmpeg(audio_files, output_path, silence_duration if add_silence else 0)
 
-    def _concatenate_with_ffmpeg(self, audio_files: List[str], output_path: str) -> str:
-        """Fallback usando ffmpeg para concatenação"""
+    def _concatenate_with_ffmpeg(self, audio_files: List[str], output_path: str,
+                                 silence_duration: int = 0) -> str:
+        """Fallback usando ffmpeg para concatenação, com o silêncio entre segmentos"""
 
         try:
-            # Cria arquivo de lista para ffmpeg
-            filelist_path = os.path.join(self.temp_dir, "filelist.txt")
+            existing = [f for f in audio_files if os.path.exists(f)]
+            self.mix_with_ffmpeg(existing, output_path, silence_duration=silence_duration)
+            logger.info("Áudio concatenado com ffmpeg: %s", output_path)
+            return output_path
 
-            with open(filelist_path, 'w') as f:
-                for audio_file in audio_files:
-                    if os.path.exists(audio_file):
-                        f.write(f"file '{audio_file}'\n")
+        except Exception as e:
+            logger.error("Erro no fallback ffmpeg: %s", e)
+            return self._create_placeholder_audio(output_path)
 
-            # Comando ffmpeg para concatenar
-            cmd = [
-                'ffmpeg', '-f', 'concat', '-safe', '0', '-i', filelist_path,
-                '-c', 'copy', output_path, '-y'
-            ]
+    def mix_with_ffmpeg(self, audio_files: List[str], output_path: str,
+                        silence_duration: int = 0, intro_path: Optional[str] = None,
+                        outro_path: Optional[str] = None, gain_db: float = 0.0,
+                        normalize: bool = False) -> str:
+        """
+        Monta o podcast numa única execução do ffmpeg: segmentos, silêncio
+        entre eles, introdução, encerramento, ganho e normalização ficam num
+        só filter graph, então o resultado custa uma decodificação e uma
+        codificação, não importa quantas etapas estejam ligadas
 
-            result = subprocess.run(cmd, capture_output=True, text=True)
+        Args:
+            audio_files: Segmentos, na ordem
+            output_path: Caminho para salvar o resultado
+            silence_duration: Silêncio entre segmentos em ms (0 para nenhum)
+            intro_path: Áudio de introdução (opcional)
+            outro_path: Áudio de encerramento (opcional)
+            gain_db: Ganho em dB aplicado antes da normalização
+            normalize: Se deve normalizar a loudness (EBU R128, -16 LUFS)
 
-            if result.returncode == 0:
-                print(f"✅ Áudio concatenado com ffmpeg: {output_path}")
-                return output_path
-            else:
-                print(f"❌ Erro no ffmpeg: {result.stderr}")
-                return self._create_placeholder_audio(output_path)
+        Returns:
+            Caminho do arquivo criado
 
-        except Exception as e:
-            print(f"❌ Erro no fallback ffmpeg: {e}")
-            return self._create_placeholder_audio(output_path)
+        Raises:
+            RuntimeError: se o ffmpeg não estiver instalado ou falhar
+        """
+
+        if not FFMPEG_AVAILABLE:
+            raise RuntimeError("ffmpeg não encontrado no PATH")
+        if not audio_files:
+            raise RuntimeError("nenhum segmento para montar")
+
+        inputs, graph = self._mix_graph(audio_files, silence_duration, intro_path, outro_path, gain_db, normalize)
+        cmd = [
+            'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+            *inputs,
+            '-filter_complex', graph,
+            '-map', '[out]',
+            *self._encoder_args(),
+            output_path,
+        ]
+
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg falhou: {result.stderr.strip()[-500:]}")
+
+        logger.debug("Podcast montado com ffmpeg (%s segmentos): %s", len(audio_files), output_path)
+        return output_path
+
+    def _mix_graph(self, audio_files: List[str], silence_duration: int,
+                   intro_path: Optional[str], outro_path: Optional[str],
+                   gain_db: float, normalize: bool) -> Tuple[List[str], str]:
+        """Argumentos de entrada e filter graph de mix_with_ffmpeg"""
+
+        sample_rate = self.config.sample_rate
+        layout = "mono" if self.config.channels == 1 else "stereo"
+        # Toda entrada é convertida para o mesmo formato antes do concat
+        common = f"aresample={sample_rate},aformat=sample_fmts=s16:channel_layouts={layout}"
+
+        files = []
+        if intro_path and os.path.exists(intro_path):
+            files.append(("intro", intro_path))
+        files += [("segment", path) for path in audio_files]
+        if outro_path and os.path.exists(outro_path):
+            files.append(("outro", outro_path))
+
+        inputs: List[str] = []
+        filters: List[str] = []
+        sequence: List[str] = []
+        gaps = 0
+        for i, (kind, path) in enumerate(files):
+            inputs += ['-i', path]
+            filters.append(f"[{i}:a]{common}[a{i}]")
+            if kind == "segment" and silence_duration > 0 and sequence and files[i - 1][0] == "segment":
+                filters.append(
+                    f"anullsrc=r={sample_rate}:cl={layout},atrim=duration={silence_duration / 1000:.3f},"
+                    f"{common}[g{gaps}]"
+                )
+                sequence.append(f"[g{gaps}]")
+                gaps += 1
+            sequence.append(f"[a{i}]")
+
+        filters.append(f"{''.join(sequence)}concat=n={len(sequence)}:v=0:a=1[cat]")
+
+        post = []
+        if gain_db:
+            post.append(f"volume={gain_db:+.2f}dB")
+        if normalize:
+            # O loudnorm trabalha a 192 kHz: volta para a taxa do podcast
+            post += ["loudnorm=I=-16:TP=-1.5:LRA=11", f"aresample={sample_rate}"]
+        filters.append(f"[cat]{','.join(post) or 'anull'}[out]")
+
+        return inputs, ";".join(filters)
+
+    def _encoder_args(self) -> List[str]:
+        args = ['-ar', str(self.config.sample_rate), '-ac', str(self.config.channels)]
+        if self.config.format == "mp3":
+            # Qualidade VBR do LAME (0 = melhor, 9 = menor arquivo)
+            quality = {"high": "2", "medium": "5", "low": "7"}.get(self.config.quality, "2")
+            args += ['-c:a', 'libmp3lame', '-q:a', quality]
+        return args
 
     def _create_placeholder_audio(self, output_path: str) -> str:
         """Cria arquivo de áudio placeholder quando não consegue concatenar"""
@@ -124,6 +238,8 @@ class AudioProcessor:
         try:
             # Cria áudio de placeholder usando pydub
             if PYDUB_AVAILABLE:
+                from pydub import AudioSegment
+
                 # Tom simples de 1 segundo
                 tone = AudioSegment.from_file(None, format="raw",
                                             frame_rate=self.config.sample_rate,
@@ -142,7 +258,7 @@ class AudioProcessor:
             return output_path
 
         except Exception as e:
-            print(f"❌ Erro ao criar placeholder: {e}")
+            logger.error("Erro ao criar placeholder: %s", e)
             return ""
 
     def add_intro_outro(self, main_audio: str, intro_path: Optional[str] = None,
@@ -161,9 +277,11 @@ class AudioProcessor:
         """
 
         if not PYDUB_AVAILABLE:
-            print("⚠️  PyDub necessário para adicionar intro/outro")
+            logger.warning("PyDub necessário para adicionar intro/outro")
             return main_audio
 
+        from pydub import AudioSegment
+
         try:
             # Carrega áudio principal
             main = AudioSegment.from_file(main_audio)
@@ -172,13 +290,13 @@ class AudioProcessor:
             if intro_path and os.path.exists(intro_path):
                 intro = AudioSegment.from_file(intro_path)
                 main = intro + main
-                print("🎵 Introdução adicionada")
+                logger.debug("Introdução adicionada")
 
             # Adiciona encerramento
             if outro_path and os.path.exists(outro_path):
                 outro = AudioSegment.from_file(outro_path)
                 main = main + outro
-                print("🎵 Encerramento adicionado")
+                logger.debug("Encerramento adicionado")
 
             # Salva resultado
             output_path = output_path or main_audio.replace('.mp3', '_final.mp3')
@@ -187,7 +305,7 @@ class AudioProcessor:
             return output_path
 
         except Exception as e:
-            print(f"❌ Erro ao adicionar intro/outro: {e}")
+            logger.error("Erro ao adicionar intro/outro: %s", e)
             return main_audio
 
     def adjust_volume(self, audio_path: str, volume_change: float) -> str:
@@ -203,19 +321,21 @@ class AudioProcessor:
         """
 
         if not PYDUB_AVAILABLE:
-            print("⚠️  PyDub necessário para ajustar volume")
+            logger.warning("PyDub necessário para ajustar volume")
             return audio_path
 
+        from pydub import AudioSegment
+
         try:
             audio = AudioSegment.from_file(audio_path)
             adjusted = audio + volume_change
             adjusted.export(audio_path, format=self.config.format)
 
-            print(f"🔊 Volume ajustado em {volume_change:+.1f}dB")
+            logger.debug("Volume ajustado em %+.1fdB", volume_change)
             return audio_path
 
         except Exception as e:
-            print(f"❌ Erro ao ajustar volume: {e}")
+            logger.error("Erro ao ajustar volume: %s", e)
             return audio_path
 
     def get_audio_info(self, audio_path: str) -> dict:
@@ -237,6 +357,8 @@ class AudioProcessor:
                 "available": False
             }
 
+        from pydub import AudioSegment
+
         try:
             audio = AudioSegment.from_file(audio_path)
 
@@ -249,7 +371,7 @@ class AudioProcessor:
             }
 
         except Exception as e:
-            print(f"❌ Erro ao obter info do áudio: {e}")
+            logger.error("Erro ao obter info do áudio: %s", e)
             return {"duration": 0, "available": False}
 
     def create_silence(self, duration_seconds: float, output_path: str) -> str:
@@ -265,18 +387,20 @@ class AudioProcessor:
         """
 
         if not PYDUB_AVAILABLE:
-            print("⚠️  PyDub necessário para criar silêncio")
+            logger.warning("PyDub necessário para criar silêncio")
             return ""
 
+        from pydub import AudioSegment
+
         try:
             silence = AudioSegment.silent(duration=int(duration_seconds * 1000))
             silence.export(output_path, format=self.config.format)
 
-            print(f"🔇 Silêncio de {duration_seconds}s criado")
+            logger.debug("Silêncio de %ss criado", duration_seconds)
             return output_path
 
         except Exception as e:
-            print(f"❌ Erro ao criar silêncio: {e}")
+            logger.error("Erro ao criar silêncio: %s", e)
             return ""
 
     def cleanup_temp_files(self):
@@ -285,20 +409,24 @@ class AudioProcessor:
         try:
             import shutil
             shutil.rmtree(self.temp_dir)
-            print("🧹 Arquivos temporários removidos")
+            logger.info("Arquivos temporários removidos")
 
         except Exception as e:
-            print(f"⚠️  Erro ao limpar arquivos temporários: {e}")
+            logger.warning("Erro ao limpar arquivos temporários: %s", e)
 
 class PodcastMixer:
     """Classe para mixagem avançada de podcasts"""
 
-    def _init_(self):
+    def __init__(self):
         self.processor = AudioProcessor()
 
     def create_professional_mix(self, segments: List[str], output_path: str,
                                add_background_music: bool = False,
-                               normalize_volume: bool = True) -> str:
+                               normalize_volume: bool = True,
+                               intro_path: Optional[str] = None,
+                               outro_path: Optional[str] = None,
+                               silence_duration: int = 500,
+                               gain_db: float = 0.0) -> str:
         """
         Cria mixagem profissional do podcast
 
@@ -307,38 +435,63 @@ class PodcastMixer:
             output_path: Caminho de saída
             add_background_music: Se deve adicionar música de fundo
             normalize_volume: Se deve normalizar o volume
+            intro_path: Áudio de introdução (opcional)
+            outro_path: Áudio de encerramento (opcional)
+            silence_duration: Silêncio entre segmentos em ms
+            gain_db: Ganho em dB
 
         Returns:
             Caminho do arquivo final
         """
 
-        print("🎛️  Iniciando mixagem profissional...")
+        logger.info("Iniciando mixagem profissional...")
+
+        # Com ffmpeg, todas as etapas rodam numa única passada
+        if FFMPEG_AVAILABLE:
+            try:
+                self.processor.mix_with_ffmpeg(
+                    segments, output_path,
+                    silence_duration=silence_duration,
+                    intro_path=intro_path,
+                    outro_path=outro_path,
+                    gain_db=gain_db,
+                    normalize=normalize_volume,
+                )
+                if add_background_music:
+                    output_path = self._add_background_music(output_path)
+                logger.info("Mixagem profissional concluída")
+                return output_path
+            except RuntimeError as e:
+                logger.warning("Mixagem em passada única falhou (%s), usando etapas separadas", e)
 
         # 1. Concatena segmentos básicos
         temp_path = os.path.join(self.processor.temp_dir, "temp_mix.mp3")
-        self.processor.concatenate_audio_files(segments, temp_path)
+        self.processor.concatenate_audio_files(segments, temp_path, silence_duration=silence_duration)
 
-        # 2. Normaliza volume se solicitado
-        if normalize_volume:
-            self.processor.adjust_volume(temp_path, 0)  # Normalização básica
+        # 2. Introdução e encerramento
+        if intro_path or outro_path:
+            temp_path = self.processor.add_intro_outro(temp_path, intro_path, outro_path)
 
-        # 3. Adiciona música de fundo se solicitado
+        # 3. Ajusta o volume se solicitado
+        if gain_db:
+            self.processor.adjust_volume(temp_path, gain_db)
+
+        # 4. Adiciona música de fundo se solicitado
         if add_background_music:
             temp_path = self._add_background_music(temp_path)
 
-        # 4. Move para caminho final
+        # 5. Move para caminho final
         if temp_path != output_path:
-            import shutil
             shutil.move(temp_path, output_path)
 
-        print("✅ Mixagem profissional concluída")
+        logger.info("Mixagem profissional concluída")
         return output_path
 
     def _add_background_music(self, audio_path: str) -> str:
         """Adiciona música de fundo sutil"""
 
         # Implementação básica - pode ser expandida
-        print("🎵 Adicionando música de fundo...")
+        logger.info("Adicionando música de fundo...")
         return audio_path
 
     def create_chapters(self, audio_path: str, chapter_times: List[float],
@@ -355,7 +508,7 @@ class PodcastMixer:
             Caminho do arquivo com capítulos
         """
 
-        print("📚 Adicionando capítulos ao podcast...")
+        logger.info("Adicionando capítulos ao podcast...")
 
         # Cria arquivo de metadados para capítulos
         metadata_path = audio_path.replace('.mp3', '_chapters.json')
@@ -371,7 +524,7 @@ class PodcastMixer:
         with open(metadata_path, 'w', encoding='utf-8') as f:
             json.dump({"chapters": chapters}, f, indent=2, ensure_ascii=False)
 
-        print(f"✅ Capítulos salvos em: {metadata_path}")
+        logger.info("Capítulos salvos em: %s", metadata_path)
         return audio_path
 
 def test_audio_system():
@@ -0,0 +1,56 @@
+"""Benchmark the per-call setup cost of the agents with and without the registry.
+
+No request is sent to OpenAI: only client construction and graph compilation
+are measured, which is the overhead every call used to pay.
+
+    cd backend && python -m benchmarks.agent_registry
+"""
+from __future__ import annotations
+
+import os
+import statistics
+import time
+from typing import Callable, List
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+import agent_registry
+import course_content_agent
+import flashcards_agent
+import quizzes_agent
+
+AGENTS = (course_content_agent, flashcards_agent, quizzes_agent)
+
+
+def _measure(fn: Callable[[], object], runs: int) -> List[float]:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _report(label: str, timings: List[float]) -> None:
+    print(
+        f"{label:<36} mean={statistics.mean(timings):8.3f}ms "
+        f"p50={statistics.median(timings):8.3f}ms max={max(timings):8.3f}ms"
+    )
+
+
+def main(runs: int = 50) -> None:
+    for agent in AGENTS:
+        name = agent.__name__
+        before = _measure(agent.build_graph, runs)
+
+        agent_registry.clear()
+        first = _measure(agent.get_graph, 1)
+        after = _measure(agent.get_graph, runs)
+
+        _report(f"{name} (fresh)", before)
+        _report(f"{name} (registry, 1st)", first)
+        _report(f"{name} (registry)", after)
+
+
+if __name__ == "__main__":
+    main()
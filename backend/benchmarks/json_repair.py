@@ -0,0 +1,67 @@
+"""Benchmark json_repair against the regex clean-up it replaced.
+
+Runs both on large well-formed responses and on inputs that make the old
+regexes backtrack, doubling the size each time: the legacy timings grow
+quadratically while ``repair_json`` stays linear.
+
+    cd backend && python -m benchmarks.json_repair
+"""
+from __future__ import annotations
+
+import json
+import re
+import time
+from typing import Callable
+
+from json_repair import repair_json
+
+
+def legacy_repair(response: str) -> str:
+    """The post-processing previously inlined in the flashcards/quiz agents."""
+    match = re.search(r"\{[\s\S]*\}", response)
+    if match:
+        response = match.group(0)
+    response = response.replace("'", '"')
+
+    def escape_inner_quotes(match):
+        value = match.group(0)
+        return '"' + value[1:-1].replace('"', r'\"') + '"'
+
+    return re.sub(r'"([^"]*"(?:[^"]*"[^"]*")*)"', escape_inner_quotes, response)
+
+
+def _large_response(size: int) -> str:
+    with open("flashcards.json", encoding="utf-8") as f:
+        cards = json.load(f)["flashcards"]
+    repeated = (cards * (size // len(cards) + 1))[:size]
+    return json.dumps({"flashcards": repeated}, ensure_ascii=False, indent=2)
+
+
+INPUTS = {
+    "large response (n cards)": _large_response,
+    "unbalanced quotes (n)": lambda n: '{"a": "' + 'x"' * n,
+    "unclosed braces (n)": lambda n: "{" * n,
+}
+SIZES = (250, 500, 1000, 2000)
+
+
+def _time(fn: Callable[[str], str], text: str) -> float:
+    start = time.perf_counter()
+    fn(text)
+    return (time.perf_counter() - start) * 1000
+
+
+def main() -> None:
+    for label, build in INPUTS.items():
+        print(label)
+        for size in SIZES:
+            text = build(size)
+            print(
+                f"  n={size:<5} chars={len(text):<8} "
+                f"legacy={_time(legacy_repair, text):9.2f}ms "
+                f"repair_json={_time(repair_json, text):9.2f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
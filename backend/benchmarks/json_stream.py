@@ -0,0 +1,52 @@
+"""Benchmark first-item latency of the incremental JSON parser.
+
+Replays the sample outputs shipped in this directory as a token stream at a
+fixed generation rate and reports when the first item could be handed
+downstream versus when the whole document is available for ``json.loads``.
+Also reports raw parser throughput.
+
+    cd backend && python -m benchmarks.json_stream
+"""
+from __future__ import annotations
+
+import time
+
+from json_stream import ArrayItemParser
+
+SAMPLES = (
+    ("course_content.json", "modules"),
+    ("flashcards.json", "flashcards"),
+    ("quiz.json", "questions"),
+)
+CHARS_PER_TOKEN = 4
+TOKENS_PER_SECOND = 40
+
+
+def main() -> None:
+    for path, array_key in SAMPLES:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        tokens = [text[i:i + CHARS_PER_TOKEN] for i in range(0, len(text), CHARS_PER_TOKEN)]
+
+        parser = ArrayItemParser(array_key)
+        first_token = None
+        items = 0
+        start = time.perf_counter()
+        for index, token in enumerate(tokens, start=1):
+            completed = parser.feed(token)
+            if completed and first_token is None:
+                first_token = index
+            items += len(completed)
+        parse_seconds = time.perf_counter() - start
+
+        first_item = (first_token or len(tokens)) / TOKENS_PER_SECOND
+        full = len(tokens) / TOKENS_PER_SECOND
+        print(
+            f"{path:<20} items={items:<3} first item={first_item:6.2f}s "
+            f"full document={full:6.2f}s ({first_item / full:5.1%}) "
+            f"parser={len(text) / parse_seconds / 1e6:6.2f} MB/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
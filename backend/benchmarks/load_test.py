@@ -0,0 +1,70 @@
+"""Load test a deployed app and report how many requests each container served.
+
+Fires ``--requests`` concurrent calls at the ``load_probe`` endpoint of the
+``Agents`` class, which sleeps like an LLM call and returns the id of the
+container that handled it. It runs in the agent containers, with their
+``modal.concurrent`` limit, so a handful of containers should absorb the whole
+burst; with the old synchronous endpoints every in-flight request needed a
+container of its own. The endpoint is only deployed with ``LOAD_PROBE=1``:
+
+    cd backend && LOAD_PROBE=1 modal deploy modal_app.py
+    python -m benchmarks.load_test \\
+        --url https://<workspace>--edu-one-load-probe.modal.run --requests 200
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import httpx
+
+
+async def _call(client: httpx.AsyncClient, url: str, seconds: float) -> Tuple[Optional[str], float]:
+    start = time.perf_counter()
+    try:
+        response = await client.get(url, params={"seconds": seconds})
+        response.raise_for_status()
+        container = response.json().get("container")
+    except Exception as e:
+        print(f"request failed: {e}")
+        container = None
+    return container, time.perf_counter() - start
+
+
+async def run(url: str, requests: int, seconds: float, timeout: float) -> None:
+    limits = httpx.Limits(max_connections=requests, max_keepalive_connections=requests)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(_call(client, url, seconds) for _ in range(requests)))
+        wall = time.perf_counter() - start
+
+    containers = Counter(container for container, _ in results if container is not None)
+    latencies: List[float] = sorted(latency for _, latency in results)
+    failed = requests - sum(containers.values())
+
+    print(f"requests      {requests} ({failed} failed) in {wall:.2f}s")
+    print(f"throughput    {requests / wall:.1f} req/s")
+    print(f"latency       p50={statistics.median(latencies):.2f}s "
+          f"p95={latencies[int(len(latencies) * 0.95) - 1]:.2f}s max={latencies[-1]:.2f}s")
+    if containers:
+        print(f"containers    {len(containers)}")
+        print(f"req/container mean={statistics.mean(containers.values()):.1f} "
+              f"max={max(containers.values())}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", required=True, help="URL of the load_probe endpoint")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=2.0, help="simulated call latency")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.requests, args.seconds, args.timeout))
+
+
+if __name__ == "__main__":
+    main()
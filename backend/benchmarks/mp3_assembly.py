@@ -0,0 +1,86 @@
+"""Benchmark podcast assembly: frame copy versus pydub decode/re-encode.
+
+Builds podcasts of 10, 60 and 300 segments from copies of one TTS-like clip
+(24 kHz mono mp3, ~6 s) with the 800 ms gap the podcast uses, and reports
+wall time and peak Python memory (tracemalloc) of each engine. The pydub
+path needs ffmpeg; without it only the frame engine runs, on a clip made of
+silent frames.
+
+    cd backend && python -m benchmarks.mp3_assembly
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+import mp3_frames
+from audio_utils import PYDUB_AVAILABLE, AudioProcessor
+
+SIZES = (10, 60, 300)
+CLIP_MS = 6000
+GAP_MS = 800
+
+
+def _make_clip(path: str) -> bool:
+    """Write the source clip; returns whether it is real (encoded) audio."""
+    if PYDUB_AVAILABLE and shutil.which("ffmpeg"):
+        from pydub.generators import Sine
+
+        tone = Sine(220).to_audio_segment(duration=CLIP_MS, volume=-20)
+        tone.set_frame_rate(24000).set_channels(1).export(path, format="mp3", bitrate="64k")
+        return True
+    # MPEG-2 Layer III at 24 kHz mono, like the TTS clips
+    fmt = mp3_frames.FrameFormat(version=2, sample_rate_index=1, channel_mode=3, bitrate_index=8)
+    with open(path, "wb") as f:
+        f.write(mp3_frames.silence(fmt, CLIP_MS))
+    return False
+
+
+def _measure(fn: Callable[[], object]) -> Tuple[float, float]:
+    """Seconds ``fn`` takes and peak MiB it allocates, from separate runs
+    since tracing allocations slows it down."""
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 ** 2
+
+
+def main() -> None:
+    workdir = tempfile.mkdtemp()
+    try:
+        source = os.path.join(workdir, "clip.mp3")
+        real_audio = _make_clip(source)
+        if not real_audio:
+            print("ffmpeg not found: pydub path skipped, frame engine on silent frames")
+
+        processor = AudioProcessor()
+        for size in SIZES:
+            clips: List[str] = []
+            for i in range(size):
+                clip = os.path.join(workdir, f"segment_{i}.mp3")
+                shutil.copyfile(source, clip)
+                clips.append(clip)
+
+            output = os.path.join(workdir, "podcast.mp3")
+            seconds, peak = _measure(lambda: mp3_frames.concatenate(clips, output, gap_ms=GAP_MS))
+            line = f"segments={size:<4} frames:  {seconds * 1000:9.1f}ms peak={peak:8.2f}MiB"
+            if real_audio:
+                seconds, peak = _measure(
+                    lambda: processor.concatenate_with_pydub(clips, output, silence_duration=GAP_MS)
+                )
+                line += f"   pydub: {seconds * 1000:9.1f}ms peak={peak:8.2f}MiB"
+            print(line)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Startup benchmark for every entry point of the backend.
+
+Three measurements, each in fresh interpreters so nothing is already
+imported or cached:
+
+* import time of each module, with the heaviest packages it pulls in
+  (parsed from ``python -X importtime``);
+* time to first response of each endpoint in ``modal_app``: importing the
+  app and booting the container as Modal does, then serving one request;
+* time to first response of each CLI ``main()``.
+
+OpenAI is never called: completions are answered with canned JSON, so the
+numbers are the startup and per-request overhead, not model latency. The
+podcast endpoint and CLI stop once the pipeline is ready, since TTS output
+cannot be faked meaningfully.
+
+    cd backend && python -m benchmarks.startup [--runs 3]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = (
+    "modal_app",
+    "course_content_agent",
+    "flashcards_agent",
+    "quizzes_agent",
+    "podcast",
+    "audio_utils",
+)
+
+COURSE = {"modules": [{"title": "Módulo 1: Introdução", "lessons": ["Aula 1", "Aula 2"]}]}
+
+# Prepended to every child script: answer completions without the network
+_STUB = """
+import json, sys
+sys.path.insert(0, {backend!r})
+import agent_registry
+_CANNED = {{
+    "modules": {course!r},
+    "flashcards": {{"flashcards": [{{"question": "O que é?", "answer": "Isto."}}]}},
+    "questions": {{"questions": [{{"question": "O que é?", "question_type": "multiple-choice",
+                                   "options": ["Isto", "Aquilo"], "correct_answer": "Isto"}}]}},
+}}
+# The graph is still built by the caller, so its compilation is measured
+def _complete(graph, prompt, array_key=None, on_item=None):
+    return json.dumps(_CANNED[array_key], ensure_ascii=False)
+async def _acomplete(graph, prompt, array_key=None, on_item=None):
+    return _complete(graph, prompt, array_key, on_item)
+agent_registry.complete = _complete
+agent_registry.acomplete = _acomplete
+"""
+
+_ENDPOINT = """
+import asyncio, time
+start = time.perf_counter()
+import modal_app
+imported = time.perf_counter()
+{boot}
+booted = time.perf_counter()
+{call}
+done = time.perf_counter()
+print(json.dumps({{"import": imported - start, "boot": booted - imported, "first": done - booted}}))
+"""
+
+# Agents.start (container enter); .local() does not run enter hooks itself
+_AGENT_BOOT = "agent_registry.warm_up()"
+
+ENDPOINTS: Dict[str, Tuple[str, str]] = {
+    "health": ("", "modal_app.health.local()"),
+    "generate_course_content": (
+        _AGENT_BOOT,
+        "asyncio.run(modal_app.Agents().generate_course_content.local("
+        "modal_app.CourseRequest(topic='Python')))",
+    ),
+    "generate_flashcards": (
+        _AGENT_BOOT,
+        "asyncio.run(modal_app.Agents().generate_flashcards.local("
+        f"modal_app.FlashcardsRequest(course_content={COURSE!r})))",
+    ),
+    "generate_flashcards_batch": (
+        _AGENT_BOOT,
+        "asyncio.run(modal_app.Agents().generate_flashcards_batch.local(modal_app.FlashcardsBatchRequest("
+        f"items=[{{'id': str(i), 'course_content': {COURSE!r}}} for i in range(4)])))",
+    ),
+    "generate_quiz": (
+        _AGENT_BOOT,
+        "asyncio.run(modal_app.Agents().generate_quiz.local("
+        f"modal_app.QuizRequest(content_json={json.dumps(COURSE)!r})))",
+    ),
+    "generate_course_package": (
+        _AGENT_BOOT,
+        "asyncio.run(modal_app.Agents().generate_course_package.local("
+        "modal_app.CoursePackageRequest(topic='Python')))",
+    ),
+    # Podcast.start (container enter) only: TTS is not faked
+    "generate_podcast": (
+        "from podcast import get_service; get_service().start()",
+        "",
+    ),
+}
+
+_CLI = """
+import time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+sys.argv = [{module!r} + ".py"] + {args!r}
+try:
+    {module}.main()
+except SystemExit:
+    pass
+done = time.perf_counter()
+print(json.dumps({{"import": imported - start, "main": done - imported}}))
+"""
+
+CLIS: Dict[str, List[str]] = {
+    "course_content_agent": ["Python"],
+    "flashcards_agent": ["Python"],
+    "quizzes_agent": [json.dumps(COURSE)],
+    # Without an API key main() stops right after startup
+    "podcast": [],
+}
+
+
+def _run(code: str, env: Dict[str, str] | None = None, cwd: str = BACKEND_DIR) -> Dict[str, float]:
+    base = {**os.environ, "RESPONSE_CACHE_BACKEND": "none", "OPENAI_API_KEY": "sk-benchmark"}
+    output = subprocess.run(
+        [sys.executable, "-c", _STUB.format(backend=BACKEND_DIR, course=COURSE) + code],
+        cwd=cwd, env={**base, **(env or {})}, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def import_breakdown(module: str, top: int = 6) -> Tuple[float, List[Tuple[str, float]]]:
+    """Total import time of ``module`` and its ``top`` heaviest packages, in ms."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env={**os.environ, "OPENAI_API_KEY": "sk-benchmark"},
+        capture_output=True, text=True, check=True,
+    ).stderr
+
+    total = 0.0
+    packages: Dict[str, float] = defaultdict(float)
+    children: Dict[str, float] = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        # Children are listed before their parent, so the direct imports of a
+        # top-level module are the depth-1 lines since the previous one
+        if depth == 1:
+            children[name.split(".")[0]] += int(cumulative) / 1000
+        elif depth == 0:
+            if name == module:
+                total, packages = int(cumulative) / 1000, children
+            children = defaultdict(float)
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return total, heaviest
+
+
+def _median(runs: List[Dict[str, float]], key: str) -> float:
+    return statistics.median(run[key] for run in runs) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Startup benchmark")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per measurement")
+    args = parser.parse_args()
+
+    print("== import time per module ==")
+    for module in MODULES:
+        total, heaviest = import_breakdown(module)
+        breakdown = ", ".join(f"{name} {ms:.0f}ms" for name, ms in heaviest)
+        print(f"{module:<26} {total:8.1f}ms  ({breakdown})")
+
+    print(f"\n== endpoints: time to first response (median of {args.runs}) ==")
+    for endpoint, (boot, call) in ENDPOINTS.items():
+        runs = [_run(_ENDPOINT.format(boot=boot, call=call)) for _ in range(args.runs)]
+        imported, booted, first = (_median(runs, key) for key in ("import", "boot", "first"))
+        print(
+            f"{endpoint:<26} import={imported:8.1f}ms boot={booted:8.1f}ms "
+            f"first={first:8.1f}ms total={imported + booted + first:8.1f}ms"
+        )
+
+    print(f"\n== CLI main(): time to first response (median of {args.runs}) ==")
+    for module, cli_args in CLIS.items():
+        env = {"OPENAI_API_KEY": ""} if module == "podcast" else None
+        with tempfile.TemporaryDirectory() as cwd:
+            # main() may write its output files to the working directory
+            runs = [
+                _run(_CLI.format(module=module, args=cli_args), env=env, cwd=cwd)
+                for _ in range(args.runs)
+            ]
+        imported, ran = _median(runs, "import"), _median(runs, "main")
+        print(f"{module:<26} import={imported:8.1f}ms main={ran:8.1f}ms total={imported + ran:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+import metrics
+
+DEFAULT_MAX_BYTES = 1024 ** 3
+DEFAULT_REFRESH_INTERVAL = 30.0
+CLIP_SUFFIX = ".mp3"
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(text: str, voice: str, model: str, instructions: str, speed: float) -> str:
+    """Content address of a TTS clip: sha256 of everything that changes the audio."""
+    payload = json.dumps([text, voice, model, instructions, speed], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ClipCache:
+    """Synthesized clips kept on disk under their content address.
+
+    Clips are plain files in ``directory`` (a local folder or a mounted
+    volume), so the cache survives restarts and can be shared by every
+    container mounting it. A hit refreshes the file's mtime; once the clips
+    take more than ``max_bytes``, the least recently used are deleted.
+    Callers get a copy of the clip, so eviction, even by another container,
+    never removes a file a podcast is still assembling.
+
+    On a shared volume that is not written through (a Modal volume), pass
+    ``persist`` to publish this container's new clips and ``refresh`` to see
+    those of the others; :meth:`persist` and :meth:`refresh` call them.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        persist: Optional[Callable[[], None]] = None,
+        refresh: Optional[Callable[[], None]] = None,
+        refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._persist = persist
+        self._refresh = refresh
+        self._refresh_interval = refresh_interval
+        self._refreshed_at = time.monotonic()
+        self._dirty = False
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._bytes = self._scan_size()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + CLIP_SUFFIX)
+
+    def _scan_size(self) -> int:
+        total = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(CLIP_SUFFIX):
+                    total += entry.stat().st_size
+        return total
+
+    def get(self, key: str, destination: str) -> bool:
+        """Copy clip ``key`` to ``destination``; False if it is not cached."""
+        path = self._path(key)
+        try:
+            shutil.copyfile(path, destination)
+            os.utime(path)
+            found = True
+        except FileNotFoundError:
+            found = False
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        metrics.TTS_CACHE_REQUESTS.inc(result="hit" if found else "miss")
+        return found
+
+    def put(self, key: str, source: str) -> None:
+        """Store a copy of the clip at ``source`` under ``key``."""
+        # Written under a temporary name and renamed, so readers never see
+        # half a clip
+        partial = os.path.join(self.directory, f".{key}.{uuid.uuid4().hex}.tmp")
+        shutil.copyfile(source, partial)
+        size = os.path.getsize(partial)
+        path = self._path(key)
+        with self._lock:
+            # Replacing a clip must not count its bytes twice
+            try:
+                size -= os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+            os.replace(partial, path)
+            self._bytes += size
+            self._dirty = True
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def persist(self) -> None:
+        """Publish the clips written since the last call, if any."""
+        if self._persist is None or not self._dirty:
+            return
+        self._dirty = False
+        try:
+            self._persist()
+        except Exception as e:
+            self._dirty = True
+            logger.warning("Could not persist the TTS clip cache: %s", e)
+
+    def refresh(self) -> None:
+        """Pick up clips written by other containers, at most once every
+        ``refresh_interval`` seconds."""
+        if self._refresh is None or time.monotonic() - self._refreshed_at < self._refresh_interval:
+            return
+        self._refreshed_at = time.monotonic()
+        try:
+            self._refresh()
+        except Exception as e:
+            # Fails while a file of the volume is open, e.g. another request
+            # copying a clip: the next refresh tries again
+            logger.warning("Could not refresh the TTS clip cache: %s", e)
+            return
+        size = self._scan_size()
+        with self._lock:
+            self._bytes = size
+
+    def _evict(self) -> None:
+        """Delete the least recently used clips until the cache fits ``max_bytes``."""
+        clips = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(CLIP_SUFFIX):
+                    stat = entry.stat()
+                    clips.append((stat.st_mtime, stat.st_size, entry.path))
+        clips.sort()
+        total = sum(size for _, size, _ in clips)
+        for _, size, path in clips:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            metrics.TTS_CACHE_EVICTIONS.inc()
+        self._bytes = total
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / requests, 3) if requests else 0.0,
+            "bytes": self._bytes,
+        }
+
+    def record_stats(self) -> None:
+        """Copy :meth:`stats` into the metrics gauges, before a scrape."""
+        stats = self.stats()
+        metrics.TTS_CACHE_BYTES.set(stats["bytes"])
+        metrics.TTS_CACHE_HIT_RATIO.set(stats["hit_rate"])
+
+
+_cache: Optional[ClipCache] = None
+_cache_loaded = False
+_cache_lock = threading.Lock()
+
+
+def _cache_from_env(**hooks: Any) -> Optional[ClipCache]:
+    directory = os.environ.get("TTS_CACHE_DIR", "tts_cache")
+    max_bytes = int(float(os.environ.get("TTS_CACHE_MAX_MB", DEFAULT_MAX_BYTES / 1024 ** 2)) * 1024 ** 2)
+    if not directory or max_bytes <= 0:
+        return None
+    return ClipCache(directory, max_bytes=max_bytes, **hooks)
+
+
+def get_cache() -> Optional[ClipCache]:
+    """Return the process-wide clip cache configured from ``TTS_CACHE_DIR``
+    and ``TTS_CACHE_MAX_MB``, or None when it is turned off (``TTS_CACHE_MAX_MB=0``)."""
+    global _cache, _cache_loaded
+    if not _cache_loaded:
+        with _cache_lock:
+            if not _cache_loaded:
+                _cache = _cache_from_env()
+                _cache_loaded = True
+    return _cache
+
+
+def configure(
+    persist: Optional[Callable[[], None]] = None, refresh: Optional[Callable[[], None]] = None
+) -> Optional[ClipCache]:
+    """Build the process-wide clip cache from the environment, with the
+    ``persist``/``refresh`` hooks of the volume it lives on."""
+    cache = _cache_from_env(persist=persist, refresh=refresh)
+    set_cache(cache)
+    return cache
+
+
+def set_cache(cache: Optional[ClipCache]) -> None:
+    """Replace the process-wide clip cache (None turns it off)."""
+    global _cache, _cache_loaded
+    with _cache_lock:
+        _cache = cache
+        _cache_loaded = True
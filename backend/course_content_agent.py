@@ -1,34 +1,66 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import logging
+import queue
 import sys
-from typing import List
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Iterator, List
 
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage
-from langgraph.graph import MessageGraph
+import agent_registry
+import logging_config
+import metrics
+import prompting
+import singleflight
+import structured_output
+from agent_registry import DEFAULT_MODEL
+from schemas import CourseContent
 
-from flashcards_agent import generate_flashcards
-from quizzes_agent import generate_quiz
+from flashcards_agent import agenerate_flashcards, generate_flashcards
+from pipeline import Stage, arun_pipeline, run_pipeline
+from quizzes_agent import agenerate_quiz, generate_quiz
 
+# langchain/langgraph are only imported when a graph is built
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+    from langgraph.graph import MessageGraph
 
-def build_graph() -> MessageGraph:
+logger = logging.getLogger(__name__)
+
+
+_flights = singleflight.group("course_content")
+
+
+def build_graph(llm: ChatOpenAI | None = None) -> MessageGraph:
     """Builds a simple LangGraph that generates course outlines."""
-    llm = ChatOpenAI(model="gpt-4")
+    from langchain_core.runnables import RunnableLambda
+    from langgraph.graph import MessageGraph
+
+    llm = llm or agent_registry.get_llm(DEFAULT_MODEL)
+    llm = structured_output.bind_schema(llm, CourseContent)
 
     def generate(messages: List) -> List:
         return [llm.invoke(messages)]
 
+    async def agenerate(messages: List) -> List:
+        return [await llm.ainvoke(messages)]
+
     builder = MessageGraph()
-    builder.add_node("generator", generate)
+    builder.add_node("generator", RunnableLambda(generate, afunc=agenerate))
     builder.set_entry_point("generator")
     builder.set_finish_point("generator")
     return builder.compile()
 
 
-def generate_course_content(topic: str) -> dict:
-    """Generate course content for the given topic and return it as a dict."""
-    prompt = (
+def get_graph(model: str = DEFAULT_MODEL, **llm_params: Any) -> MessageGraph:
+    """Return the process-wide compiled graph for the given model settings."""
+    return agent_registry.get_graph("course_content", build_graph, model, **llm_params)
+
+
+def _build_prompt(topic: str) -> str:
+    return (
         "Crie um curso sobre "
         f"{topic} com diversos módulos numerados iniciando em 1 e diversas aulas em cada modulo.\n"
         "Responda SOMENTE em JSON válido, usando aspas duplas, no formato: {\n  \"modules\": [\n"
@@ -36,37 +68,246 @@ def generate_course_content(topic: str) -> dict:
         "Não inclua nenhuma explicação ou texto extra."
     )
 
-    graph = build_graph()
-    messages = [HumanMessage(content=prompt)]
-    result = graph.invoke(messages)
-    response = result[-1].content
 
+def _flight_key(topic: str) -> str:
+    return singleflight.make_key(singleflight.normalize_text(topic), DEFAULT_MODEL)
+
+
+def _parse_response(response: str) -> dict:
     try:
-        return json.loads(response)
-    except json.JSONDecodeError:
-        print("Erro ao decodificar JSON. Resposta recebida do modelo:")
-        print(response)
+        return structured_output.parse_response(response, CourseContent)
+    except ValueError:
+        logger.error("Erro ao decodificar JSON. Resposta recebida do modelo: %s", response)
+        metrics.ERRORS.inc(component="agent_parse")
         raise
 
 
+def generate_course_content(
+    topic: str,
+    bypass_cache: bool = False,
+    on_item: Callable[[dict], None] | None = None,
+) -> dict:
+    """Generate course content for the given topic and return it as a dict.
+
+    ``on_item`` receives each module as soon as the model has streamed it.
+    Concurrent calls for the same topic (ignoring case and spacing) share a
+    single model call.
+    """
+    prompt = prompting.fit_prompt(_build_prompt, topic)
+
+    cache, key = agent_registry.cache_entry(prompt)
+    if not bypass_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            agent_registry.replay_items(cached, "modules", on_item)
+            return cached
+
+    ran = []
+
+    def compute() -> dict:
+        ran.append(True)
+        response = agent_registry.complete(get_graph(), prompt, "modules", on_item)
+        course_content = _parse_response(response)
+        cache.set(key, course_content)
+        return course_content
+
+    course_content = _flights.do(_flight_key(topic), compute)
+    if not ran:
+        agent_registry.replay_items(course_content, "modules", on_item)
+    return course_content
+
+
+async def agenerate_course_content(
+    topic: str,
+    bypass_cache: bool = False,
+    on_item: Callable[[dict], None] | None = None,
+) -> dict:
+    """Async :func:`generate_course_content`, built on ``ainvoke``."""
+    prompt = prompting.fit_prompt(_build_prompt, topic)
+
+    cache, key = agent_registry.cache_entry(prompt)
+    if not bypass_cache:
+        cached = await cache.aget(key)
+        if cached is not None:
+            agent_registry.replay_items(cached, "modules", on_item)
+            return cached
+
+    ran = []
+
+    async def compute() -> dict:
+        ran.append(True)
+        response = await agent_registry.acomplete(get_graph(), prompt, "modules", on_item)
+        # A resposta pode precisar de reparo, que faz chamadas síncronas
+        course_content = await asyncio.to_thread(_parse_response, response)
+        await cache.aset(key, course_content)
+        return course_content
+
+    course_content = await _flights.ado(_flight_key(topic), compute)
+    if not ran:
+        agent_registry.replay_items(course_content, "modules", on_item)
+    return course_content
+
+
+def _package_stages(
+    topic: str,
+    bypass_cache: bool = False,
+    modules_per_shard: int | None = None,
+    on_shard: Callable[[str, int, dict], None] | None = None,
+    on_item: Callable[[str, dict], None] | None = None,
+    use_async: bool = False,
+) -> List[Stage]:
+    """Course content first, then flashcards and quiz side by side.
+
+    With ``use_async`` the stages return coroutines for :func:`arun_pipeline`.
+    """
+    if use_async:
+        course, flashcards, quiz = agenerate_course_content, agenerate_flashcards, agenerate_quiz
+    else:
+        course, flashcards, quiz = generate_course_content, generate_flashcards, generate_quiz
+
+    def shard_callback(stage: str):
+        if on_shard is None:
+            return None
+        return lambda index, result: on_shard(stage, index, result)
+
+    def item_callback(stage: str):
+        if on_item is None:
+            return None
+        return lambda item: on_item(stage, item)
+
+    def quiz_stage(inputs: dict) -> Any:
+        return quiz(
+            prompting.compact_json(inputs["course_content"]),
+            bypass_cache=bypass_cache,
+            modules_per_shard=modules_per_shard,
+            on_shard=shard_callback("quiz"),
+            on_item=item_callback("quiz"),
+        )
+
+    return [
+        Stage(
+            "course_content",
+            lambda _: course(
+                topic, bypass_cache=bypass_cache, on_item=item_callback("course_content")
+            ),
+        ),
+        Stage(
+            "flashcards",
+            lambda inputs: flashcards(
+                inputs["course_content"],
+                bypass_cache=bypass_cache,
+                modules_per_shard=modules_per_shard,
+                on_shard=shard_callback("flashcards"),
+                on_item=item_callback("flashcards"),
+            ),
+            depends_on=("course_content",),
+        ),
+        Stage("quiz", quiz_stage, depends_on=("course_content",)),
+    ]
+
+
+def build_course_package(
+    topic: str,
+    bypass_cache: bool = False,
+    modules_per_shard: int | None = None,
+    on_complete: Callable[[str, Any], None] | None = None,
+) -> dict:
+    """Generate course content, then flashcards and quiz concurrently.
+
+    Flashcards and quiz only depend on the course content, so the package
+    takes roughly course + max(flashcards, quiz). Stage durations in seconds
+    are returned under ``timings``. ``modules_per_shard`` is forwarded to
+    both generators; ``on_complete(stage, result)`` is called as each of the
+    three stages finishes.
+    """
+    results, timings = run_pipeline(
+        _package_stages(topic, bypass_cache, modules_per_shard), on_complete=on_complete
+    )
+
+    return {
+        "course_content": results["course_content"],
+        "flashcards": results["flashcards"],
+        "quiz": results["quiz"],
+        "timings": timings,
+    }
+
+
+async def abuild_course_package(
+    topic: str,
+    bypass_cache: bool = False,
+    modules_per_shard: int | None = None,
+    on_complete: Callable[[str, Any], None] | None = None,
+) -> dict:
+    """Async :func:`build_course_package`; stages run as tasks on the event loop."""
+    results, timings = await arun_pipeline(
+        _package_stages(topic, bypass_cache, modules_per_shard, use_async=True),
+        on_complete=on_complete,
+    )
+
+    return {
+        "course_content": results["course_content"],
+        "flashcards": results["flashcards"],
+        "quiz": results["quiz"],
+        "timings": timings,
+    }
+
+
+def stream_course_package(
+    topic: str, bypass_cache: bool = False, modules_per_shard: int | None = None
+) -> Iterator[dict]:
+    """Yield the course package piece by piece as each part is ready.
+
+    Events are ``course_content``, ``flashcards`` and ``quiz``, each preceded
+    by ``<stage>_item`` events for the modules, flashcards and questions as
+    the model streams them (``<stage>_shard`` in sharded mode), followed by
+    ``done`` with the stage timings, or ``error`` if a stage failed. Every
+    event carries the seconds ``elapsed`` since the request started.
+    """
+    events: "queue.Queue[dict | None]" = queue.Queue()
+    started = time.perf_counter()
+
+    def emit(event: str, **payload: Any) -> None:
+        elapsed = round(time.perf_counter() - started, 3)
+        events.put({"event": event, "elapsed": elapsed, **payload})
+
+    stages = _package_stages(
+        topic,
+        bypass_cache,
+        modules_per_shard,
+        on_shard=lambda stage, index, result: emit(f"{stage}_shard", shard=index, data=result),
+        on_item=lambda stage, item: emit(f"{stage}_item", data=item),
+    )
+
+    def run() -> None:
+        try:
+            _, timings = run_pipeline(stages, on_complete=lambda name, result: emit(name, data=result))
+            emit("done", timings=timings)
+        except Exception as e:
+            emit("error", error=str(e))
+        finally:
+            events.put(None)
+
+    threading.Thread(target=run, daemon=True).start()
+    while (event := events.get()) is not None:
+        yield event
+
+
 def generate_course_package(
     topic: str,
     course_file: str = "course_content.json",
     flashcards_file: str = "flashcards.json",
     quiz_file: str = "quiz.json",
+    bypass_cache: bool = False,
+    modules_per_shard: int | None = None,
 ) -> dict:
     """Generate course content, flashcards and quiz and save them to files."""
 
-    course_content = generate_course_content(topic)
-    flashcards = generate_flashcards(course_content)
-    content_json = json.dumps(course_content, ensure_ascii=False, indent=2)
-    quiz = generate_quiz(content_json)
-
-    package = {
-        "course_content": course_content,
-        "flashcards": flashcards,
-        "quiz": quiz,
-    }
+    package = build_course_package(
+        topic, bypass_cache=bypass_cache, modules_per_shard=modules_per_shard
+    )
+    course_content = package["course_content"]
+    flashcards = package["flashcards"]
+    quiz = package["quiz"]
 
     with open(course_file, "w", encoding="utf-8") as f:
         json.dump(course_content, f, ensure_ascii=False, indent=2)
@@ -81,6 +322,7 @@ def generate_course_package(
 
 
 def main() -> None:
+    logging_config.configure()
     if len(sys.argv) < 2:
         print("Usage: python course_content_agent.py 'Course topic'")
         raise SystemExit(1)
@@ -1,85 +1,214 @@
 from __future__ import annotations
 
+import asyncio
 import json
-import re
+import logging
 import sys
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, List
 
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage
-from langgraph.graph.message import MessageGraph
+import agent_registry
+import logging_config
+import metrics
+import prompting
+import sharding
+import structured_output
+import tracing
+from agent_registry import DEFAULT_MODEL
+from schemas import FlashcardSet
 
+# langchain/langgraph are only imported when a graph is built
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+    from langgraph.graph.message import MessageGraph
 
+logger = logging.getLogger(__name__)
 
-def build_graph() -> MessageGraph:
+
+def build_graph(llm: ChatOpenAI | None = None) -> MessageGraph:
     """Builds a LangGraph that generates flashcards."""
-    llm = ChatOpenAI(model="gpt-4")
+    from langchain_core.runnables import RunnableLambda
+    from langgraph.graph.message import MessageGraph
+
+    llm = llm or agent_registry.get_llm(DEFAULT_MODEL)
+    llm = structured_output.bind_schema(llm, FlashcardSet)
 
     def generate(messages: List) -> List:
         return [llm.invoke(messages)]
 
+    async def agenerate(messages: List) -> List:
+        return [await llm.ainvoke(messages)]
+
     builder = MessageGraph()
-    builder.add_node("generator", generate)
+    builder.add_node("generator", RunnableLambda(generate, afunc=agenerate))
     builder.set_entry_point("generator")
     builder.set_finish_point("generator")
     return builder.compile()
 
 
-def generate_flashcards(course_content: dict) -> dict:
-    """Generate flashcards based on the given course content."""
-    content_json = json.dumps(course_content, ensure_ascii=False, indent=2)
+def get_graph(model: str = DEFAULT_MODEL, **llm_params: Any) -> MessageGraph:
+    """Return the process-wide compiled graph for the given model settings."""
+    return agent_registry.get_graph("flashcards", build_graph, model, **llm_params)
 
-    prompt = (
+
+def _build_prompt(content_json: str) -> str:
+    return (
         f"Com base no seguinte conteúdo de curso:\n{content_json}\n"
         "Gere flashcards para cada módulo e aula. "
         "Responda em JSON no formato: {\n  \"flashcards\": [\n"
         "    {\"question\": \"...\", \"answer\": \"...\"}, ...]\n}"
     )
 
-    graph = build_graph()
-    messages = [HumanMessage(content=prompt)]
-    result = graph.invoke(messages)
-    response = result[-1].content
-
-    # Extrai apenas o JSON da resposta
-    match = re.search(r"\{[\s\S]*\}", response)
-    if match:
-        response = match.group(0)
 
-    # Troca aspas simples por duplas
-    response = response.replace("'", '"')
-
-    # Escapa aspas duplas internas em valores de propriedades
-    def escape_inner_quotes(match):
-        value = match.group(0)
-        # Remove a aspa inicial e final, escapa as internas
-        return '"' + value[1:-1].replace('"', r'\"') + '"'
+def _parse_response(response: str) -> dict:
+    try:
+        return structured_output.parse_response(response, FlashcardSet)
+    except ValueError:
+        logger.error("Erro ao decodificar JSON. Resposta recebida do modelo: %s", response)
+        metrics.ERRORS.inc(component="agent_parse")
+        raise
 
-    # Regex para encontrar valores de string JSON
-    response = re.sub(r'"([^"]*"(?:[^"]*"[^"]*")*)"', escape_inner_quotes, response)
 
+def generate_flashcards(
+    course_content: dict,
+    bypass_cache: bool = False,
+    modules_per_shard: int | None = None,
+    max_concurrency: int = sharding.DEFAULT_MAX_CONCURRENCY,
+    on_shard: sharding.ShardCallback | None = None,
+    on_item: Callable[[dict], None] | None = None,
+) -> dict:
+    """Generate flashcards based on the given course content.
+
+    With ``modules_per_shard`` larger courses are split into shards of that
+    many modules, generated concurrently and merged in module order. Courses
+    too large for the input token budget are sharded even without it.
+    ``on_item`` receives each flashcard as soon as the model has streamed it;
+    in sharded mode use ``on_shard`` instead.
+    """
+    modules_per_shard = modules_per_shard or prompting.shard_size(course_content, _build_prompt)
+    if modules_per_shard and len(course_content.get("modules") or []) > modules_per_shard:
+        return sharding.generate_sharded(
+            sharding.split_modules(course_content, modules_per_shard),
+            lambda shard: generate_flashcards(shard, bypass_cache=bypass_cache),
+            "flashcards",
+            max_concurrency=max_concurrency,
+            on_shard=on_shard,
+        )
+
+    prompt = prompting.fit_prompt(_build_prompt, prompting.compact_json(course_content))
+
+    cache, key = agent_registry.cache_entry(prompt)
+    if not bypass_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            agent_registry.replay_items(cached, "flashcards", on_item)
+            return cached
+
+    response = agent_registry.complete(get_graph(), prompt, "flashcards", on_item)
+
+    parsed = _parse_response(response)
+    cache.set(key, parsed)
+    return parsed
+
+
+async def agenerate_flashcards(
+    course_content: dict,
+    bypass_cache: bool = False,
+    modules_per_shard: int | None = None,
+    max_concurrency: int = sharding.DEFAULT_MAX_CONCURRENCY,
+    on_shard: sharding.ShardCallback | None = None,
+    on_item: Callable[[dict], None] | None = None,
+) -> dict:
+    """Async :func:`generate_flashcards`: the model call goes through
+    ``ainvoke`` and shards run as tasks instead of threads."""
+    modules_per_shard = modules_per_shard or prompting.shard_size(course_content, _build_prompt)
+    if modules_per_shard and len(course_content.get("modules") or []) > modules_per_shard:
+        return await sharding.agenerate_sharded(
+            sharding.split_modules(course_content, modules_per_shard),
+            lambda shard: agenerate_flashcards(shard, bypass_cache=bypass_cache),
+            "flashcards",
+            max_concurrency=max_concurrency,
+            on_shard=on_shard,
+        )
+
+    prompt = prompting.fit_prompt(_build_prompt, prompting.compact_json(course_content))
+
+    cache, key = agent_registry.cache_entry(prompt)
+    if not bypass_cache:
+        cached = await cache.aget(key)
+        if cached is not None:
+            agent_registry.replay_items(cached, "flashcards", on_item)
+            return cached
+
+    response = await agent_registry.acomplete(get_graph(), prompt, "flashcards", on_item)
+
+    # A resposta pode precisar de reparo, que faz chamadas síncronas
+    parsed = await asyncio.to_thread(_parse_response, response)
+    await cache.aset(key, parsed)
+    return parsed
+
+
+def _batch_item(generate: Callable[[], dict]) -> Dict[str, Any]:
     try:
-        return json.loads(response)
-    except json.JSONDecodeError:
-        print("Erro ao decodificar JSON. Resposta recebida do modelo:")
-        print(response)
-        raise
+        return {"flashcards": generate()}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def generate_flashcards_batch(
+    course_contents: List[dict],
+    bypass_cache: bool = False,
+    max_concurrency: int = sharding.DEFAULT_MAX_CONCURRENCY,
+) -> List[Dict[str, Any]]:
+    """Generate flashcards for many courses or lessons in one call.
+
+    Items run concurrently, at most ``max_concurrency`` at a time. Results
+    come back in input order, ``{"flashcards": ...}`` for each success and
+    ``{"error": "..."}`` for each failure, so one bad item does not fail the
+    batch.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(course_contents)))) as executor:
+        return list(executor.map(
+            tracing.bind(lambda course_content: _batch_item(
+                lambda: generate_flashcards(course_content, bypass_cache=bypass_cache)
+            )),
+            course_contents,
+        ))
+
+
+async def agenerate_flashcards_batch(
+    course_contents: List[dict],
+    bypass_cache: bool = False,
+    max_concurrency: int = sharding.DEFAULT_MAX_CONCURRENCY,
+) -> List[Dict[str, Any]]:
+    """Async :func:`generate_flashcards_batch`, bounded by a semaphore."""
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(course_content: dict) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                return {"flashcards": await agenerate_flashcards(course_content, bypass_cache=bypass_cache)}
+            except Exception as e:
+                return {"error": str(e)}
+
+    return list(await asyncio.gather(*(run(course_content) for course_content in course_contents)))
 
 
 def main() -> None:
+    logging_config.configure()
     if len(sys.argv) < 2:
         print("Usage: python flashcards_agent.py 'Course topic'")
         raise SystemExit(1)
     topic = sys.argv[1]
 
-    from .course_content_agent import generate_course_content
+    from course_content_agent import generate_course_content
 
     # Generate course content first and then flashcards
     course_content = generate_course_content(topic)
     try:
         cards = generate_flashcards(course_content)
         print(json.dumps(cards, indent=2, ensure_ascii=False))
-    except json.JSONDecodeError as exc:
+    except ValueError as exc:
         # If the model returns invalid JSON, show the raw error
         print(str(exc))
 
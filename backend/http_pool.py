@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import os
+import threading
+from importlib.util import find_spec
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+import metrics
+
+# httpx comes with openai; it is only imported once a client is needed
+if TYPE_CHECKING:
+    import httpx
+
+MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "30"))
+CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))
+# Long completions and TTS clips take a while to come back
+READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "120"))
+
+# HTTP/2 multiplexes concurrent calls over one connection; it needs the h2
+# package (pip install "httpx[http2]"). HTTP2=0 turns it off.
+HTTP2 = os.environ.get("HTTP2", "1") != "0" and find_spec("h2") is not None
+
+_lock = threading.Lock()
+_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def _options() -> Dict[str, Any]:
+    import httpx
+
+    return {
+        "limits": httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+        "http2": HTTP2,
+    }
+
+
+# httpcore reports every new TCP connection through the "trace" extension;
+# requests that do not open one reused a pooled connection
+
+def _trace_sync(event: str, info: dict) -> None:
+    if event == "connection.connect_tcp.complete":
+        metrics.HTTP_CONNECTIONS_OPENED.inc(client="sync")
+
+
+async def _trace_async(event: str, info: dict) -> None:
+    if event == "connection.connect_tcp.complete":
+        metrics.HTTP_CONNECTIONS_OPENED.inc(client="async")
+
+
+def _on_request_sync(request: httpx.Request) -> None:
+    metrics.HTTP_REQUESTS.inc(client="sync")
+    request.extensions["trace"] = _trace_sync
+
+
+async def _on_request_async(request: httpx.Request) -> None:
+    metrics.HTTP_REQUESTS.inc(client="async")
+    request.extensions["trace"] = _trace_async
+
+
+def get_client() -> httpx.Client:
+    """Return the process-wide HTTP client every sync OpenAI call shares,
+    so concurrent calls reuse kept-alive connections instead of each SDK
+    client opening its own."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                import httpx
+
+                _client = httpx.Client(event_hooks={"request": [_on_request_sync]}, **_options())
+    return _client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Async :func:`get_client`. Its connections belong to the event loop
+    that opens them, which is the single serving loop of a container."""
+    global _async_client
+    if _async_client is None:
+        with _lock:
+            if _async_client is None:
+                import httpx
+
+                _async_client = httpx.AsyncClient(event_hooks={"request": [_on_request_async]}, **_options())
+    return _async_client
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    """Requests, connections opened and the share of requests that reused a
+    pooled connection, per client."""
+    result = {}
+    for client in ("sync", "async"):
+        requests = metrics.HTTP_REQUESTS.value(client=client)
+        opened = metrics.HTTP_CONNECTIONS_OPENED.value(client=client)
+        reuse = 1 - opened / requests if requests else 0.0
+        result[client] = {"requests": requests, "connections_opened": opened, "reuse_ratio": round(reuse, 3)}
+    return result
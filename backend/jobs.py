@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+ProgressCallback = Callable[[float], None]
+Dispatch = Callable[[str, str, dict], None]
+
+
+@dataclass
+class Job:
+    """A long-running generation, tracked from submission to result."""
+
+    id: str
+    kind: str
+    status: str = QUEUED
+    progress: int = 0
+    idempotency_key: Optional[str] = None
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def summary(self) -> Dict[str, Any]:
+        """Everything but the result, for cheap status polling."""
+        data = self.to_dict()
+        data.pop("result")
+        return data
+
+
+class JobStore(ABC):
+    """Base class for job backends.
+
+    ``create`` is where idempotency is enforced: a key that already belongs
+    to a queued, running or finished job returns that job instead of a new
+    one. Only failed jobs can be replaced, so a client may retry after a
+    failure with the same key.
+    """
+
+    @abstractmethod
+    def create(self, kind: str, idempotency_key: Optional[str] = None) -> Tuple[Job, bool]:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        ...
+
+    @abstractmethod
+    def update(self, job_id: str, **fields: Any) -> None:
+        ...
+
+
+def _scoped(kind: str, idempotency_key: str) -> str:
+    return f"{kind}:{idempotency_key}"
+
+
+class MemoryJobStore(JobStore):
+    """In-process store, for local runs and a single container."""
+
+    def __init__(self):
+        self._jobs: Dict[str, Job] = {}
+        self._keys: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def create(self, kind: str, idempotency_key: Optional[str] = None) -> Tuple[Job, bool]:
+        with self._lock:
+            if idempotency_key:
+                existing = self._jobs.get(self._keys.get(_scoped(kind, idempotency_key), ""))
+                if existing is not None and existing.status != FAILED:
+                    return Job(**existing.to_dict()), False
+
+            job = Job(id=uuid.uuid4().hex, kind=kind, idempotency_key=idempotency_key)
+            self._jobs[job.id] = job
+            if idempotency_key:
+                self._keys[_scoped(kind, idempotency_key)] = job.id
+            return Job(**job.to_dict()), True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return Job(**job.to_dict()) if job is not None else None
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.updated_at = time.time()
+
+
+class ModalJobStore(JobStore):
+    """Store shared by every container, kept in a named ``modal.Dict``."""
+
+    def __init__(self, name: str = "edu-one-jobs"):
+        import modal
+
+        self._dict = modal.Dict.from_name(name, create_if_missing=True)
+
+    def create(self, kind: str, idempotency_key: Optional[str] = None) -> Tuple[Job, bool]:
+        job = Job(id=uuid.uuid4().hex, kind=kind, idempotency_key=idempotency_key)
+        self._dict.put(f"job:{job.id}", job.to_dict())
+        if not idempotency_key:
+            return job, True
+
+        key = f"key:{_scoped(kind, idempotency_key)}"
+        if self._dict.put(key, job.id, skip_if_exists=True):
+            return job, True
+
+        existing = self.get(self._dict.get(key))
+        if existing is not None and existing.status != FAILED:
+            self._dict.pop(f"job:{job.id}")
+            return existing, False
+        self._dict.put(key, job.id)
+        return job, True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        data = self._dict.get(f"job:{job_id}")
+        return Job(**data) if data is not None else None
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        # Only the worker running the job writes to it, so there is no race
+        data = self._dict.get(f"job:{job_id}")
+        data.update(fields, updated_at=time.time())
+        self._dict.put(f"job:{job_id}", data)
+
+
+def _run_course_package(job_id: str, payload: dict, progress: ProgressCallback, output_dir: Optional[str]) -> dict:
+    from course_content_agent import build_course_package
+
+    finished = []
+
+    def on_complete(name: str, _: Any) -> None:
+        finished.append(name)
+        progress(len(finished) / 3)
+
+    return build_course_package(
+        payload["topic"],
+        bypass_cache=payload.get("bypass_cache", False),
+        modules_per_shard=payload.get("modules_per_shard"),
+        on_complete=on_complete,
+    )
+
+
+def _run_podcast(job_id: str, payload: dict, progress: ProgressCallback, output_dir: Optional[str]) -> dict:
+    from podcast import ToneType, get_service
+
+    service = get_service()
+    path = service.generate_podcast(
+        content=payload["content"],
+        title=payload["title"],
+        target_audience=payload.get("target_audience", "Público geral"),
+        format_style=payload.get("format_style", "Conversa informal entre dois apresentadores"),
+        tone=ToneType.EDUCATIONAL,
+        on_progress=progress,
+    )
+    if output_dir:
+        # The temporary file only exists in this container. Named after the
+        # job, since podcasts with the same title share a file name
+        os.makedirs(output_dir, exist_ok=True)
+        copied = shutil.copy(path, os.path.join(output_dir, f"{job_id}.mp3"))
+        service.release_podcast(path)
+        path = copied
+    return {"audio_path": path}
+
+
+RUNNERS: Dict[str, Callable[[str, dict, ProgressCallback, Optional[str]], Any]] = {
+    "course_package": _run_course_package,
+    "podcast": _run_podcast,
+}
+
+
+def run(
+    job_id: str,
+    kind: str,
+    payload: dict,
+    output_dir: Optional[str] = None,
+    persist: Optional[Callable[[], None]] = None,
+) -> None:
+    """Execute a submitted job and record its progress and outcome.
+
+    Files the job produces are written under ``output_dir``; ``persist`` is
+    called before the job is marked as succeeded, so they are visible by the
+    time a client sees the result.
+    """
+    store = get_store()
+    store.update(job_id, status=RUNNING)
+
+    def progress(fraction: float) -> None:
+        store.update(job_id, progress=round(min(max(fraction, 0.0), 1.0) * 100))
+
+    try:
+        result = RUNNERS[kind](job_id, payload, progress, output_dir)
+        if persist is not None:
+            persist()
+    except Exception as e:
+        logger.exception("Job %s (%s) falhou", job_id, kind)
+        metrics.ERRORS.inc(component="job")
+        store.update(job_id, status=FAILED, error=str(e))
+        return
+    store.update(job_id, status=SUCCEEDED, progress=100, result=result)
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _dispatch_locally(job_id: str, kind: str, payload: dict) -> None:
+    global _executor
+    with _store_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=int(os.environ.get("JOB_WORKERS", "4")))
+    _executor.submit(run, job_id, kind, payload)
+
+
+def submit(
+    kind: str,
+    payload: dict,
+    idempotency_key: Optional[str] = None,
+    dispatch: Optional[Dispatch] = None,
+) -> Tuple[Job, bool]:
+    """Queue a job and return it with whether it was newly created.
+
+    A retried submit with the same ``idempotency_key`` returns the job that is
+    already running instead of starting a duplicate. ``dispatch(job_id, kind,
+    payload)`` starts the work; by default it runs on a local thread pool.
+    """
+    if kind not in RUNNERS:
+        raise ValueError(f"Unknown job kind {kind!r}; expected one of {sorted(RUNNERS)}")
+
+    store = get_store()
+    job, created = store.create(kind, idempotency_key)
+    if created:
+        try:
+            (dispatch or _dispatch_locally)(job.id, kind, payload)
+        except Exception as e:
+            store.update(job.id, status=FAILED, error=str(e))
+            raise
+    return job, created
+
+
+_store: Optional[JobStore] = None
+_store_lock = threading.Lock()
+
+
+def _store_from_env() -> JobStore:
+    backend = os.environ.get("JOB_STORE_BACKEND", "memory").lower()
+    if backend == "modal":
+        return ModalJobStore(os.environ.get("JOB_STORE_NAME", "edu-one-jobs"))
+    return MemoryJobStore()
+
+
+def get_store() -> JobStore:
+    """Return the process-wide job store configured from ``JOB_STORE_*``."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = _store_from_env()
+    return _store
+
+
+def set_store(store: JobStore) -> None:
+    """Replace the process-wide job store."""
+    global _store
+    with _store_lock:
+        _store = store
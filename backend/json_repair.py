@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import json
+from typing import Any, List, Optional
+
+_CLOSERS = {"{": "}", "[": "]"}
+_STRUCTURAL = ",:}]"
+_VALID_ESCAPES = '"\\/bfnrtu'
+_LITERALS = {
+    "true": "true",
+    "false": "false",
+    "null": "null",
+    "True": "true",
+    "False": "false",
+    "None": "null",
+}
+
+
+def _closes_string(text: str, i: int) -> bool:
+    """Whether the quote at ``i`` ends a string: only if the next non-blank
+    character is structural (or the text ends), otherwise it is content."""
+    j = i + 1
+    n = len(text)
+    while j < n and text[j] in " \t\r\n":
+        j += 1
+    return j >= n or text[j] in _STRUCTURAL
+
+
+def _copy_string(text: str, i: int, out: List[str]) -> tuple[int, bool]:
+    """Copy the string starting at ``text[i]`` to ``out`` as a valid
+    double-quoted JSON string. Returns the index after it and whether it was
+    terminated before the end of the text."""
+    quote = text[i]
+    n = len(text)
+    out.append('"')
+    i += 1
+    while i < n:
+        ch = text[i]
+        if ch == "\\" and i + 1 < n:
+            nxt = text[i + 1]
+            if nxt == "'":
+                out.append("'")
+            elif nxt in _VALID_ESCAPES:
+                out.append(ch + nxt)
+            else:
+                out.append("\\\\" + nxt)
+            i += 2
+            continue
+        if ch == quote:
+            if _closes_string(text, i):
+                out.append('"')
+                return i + 1, True
+            out.append('\\"' if quote == '"' else "'")
+        elif ch == '"':
+            out.append('\\"')
+        elif ch == "\n":
+            out.append("\\n")
+        elif ch == "\r":
+            out.append("\\r")
+        elif ch == "\t":
+            out.append("\\t")
+        elif ch < " ":
+            out.append(f"\\u{ord(ch):04x}")
+        else:
+            out.append(ch)
+        i += 1
+    out.append('"')
+    return i, False
+
+
+def _strip_trailing_comma(out: List[str]) -> None:
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+def repair_json(text: str) -> str:
+    """Turn almost-JSON model output into valid JSON in a single pass.
+
+    Extracts the first top-level object or array and fixes what models
+    commonly get wrong: single-quoted strings, unescaped quotes and raw
+    newlines inside strings, trailing commas, Python literals, unquoted keys,
+    mismatched closers and output truncated mid-document (rolled back to the
+    last complete element). Apostrophes inside double-quoted strings are
+    left alone. Every character is visited a bounded number of times, so the
+    runtime is linear in the input size.
+    """
+    starts = [pos for pos in (text.find("{"), text.find("[")) if pos != -1]
+    if not starts:
+        return text
+
+    out: List[str] = []
+    stack: List[str] = []
+    # (len(out), len(stack)) at the last comma, to recover from truncation
+    checkpoint: Optional[tuple[int, int]] = None
+    i = min(starts)
+    n = len(text)
+    truncated = True
+
+    while i < n:
+        ch = text[i]
+        if ch in "\"'":
+            i, terminated = _copy_string(text, i, out)
+            if not terminated:
+                break
+            continue
+        if ch in "{[":
+            stack.append(_CLOSERS[ch])
+            out.append(ch)
+        elif ch in "}]":
+            _strip_trailing_comma(out)
+            out.append(stack.pop())
+            if checkpoint is not None and checkpoint[1] > len(stack):
+                checkpoint = None
+            if not stack:
+                truncated = False
+                break
+        elif ch == ",":
+            out.append(ch)
+            checkpoint = (len(out) - 1, len(stack))
+        elif ch.isalpha() or ch == "_":
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            out.append(_LITERALS.get(word) or json.dumps(word))
+            i = j
+            continue
+        elif ch.isdigit() or ch == "-":
+            j = i + 1
+            while j < n and (text[j].isdigit() or text[j] in ".eE+-"):
+                j += 1
+            out.append(text[i:j])
+            i = j
+            continue
+        elif ch.isspace() or ch == ":":
+            out.append(ch)
+        i += 1
+
+    if truncated:
+        if checkpoint is not None:
+            del out[checkpoint[0]:]
+            del stack[checkpoint[1]:]
+        _strip_trailing_comma(out)
+        if out and out[-1].rstrip().endswith(":"):
+            out.append("null")
+        while stack:
+            out.append(stack.pop())
+
+    return "".join(out)
+
+
+def loads_lenient(text: str) -> Any:
+    """``json.loads`` that falls back to :func:`repair_json` on bad input.
+
+    Raises ``json.JSONDecodeError`` if even the repaired text is invalid.
+    """
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return json.loads(repair_json(text))
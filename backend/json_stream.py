@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Iterable, Iterator, List, Optional
+
+from json_repair import loads_lenient
+
+
+class ArrayItemParser:
+    """Incrementally extract the objects of one array from streamed JSON.
+
+    Feed the model output chunk by chunk; every object inside the top-level
+    ``array_key`` array (``{"modules": [{...}, {...}]}``) is returned as soon
+    as its closing brace arrives. Text before the first ``{`` (code fences,
+    preambles) is ignored. Each character is looked at once, so the cost is
+    linear in the size of the output no matter how it is chunked.
+
+    With ``raw`` the items are returned as their source text, unparsed.
+    """
+
+    def __init__(self, array_key: str, raw: bool = False):
+        self.array_key = array_key
+        self.raw = raw
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string: Optional[List[str]] = None
+        self._last_string: Optional[str] = None
+        self._key: Optional[str] = None
+        self._in_target = False
+        self._item: Optional[List[str]] = None
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Consume ``chunk`` and return the items completed by it."""
+        items = []
+        for ch in chunk:
+            if self._item is not None:
+                self._item.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._string is not None:
+                        self._last_string = "".join(self._string)
+                        self._string = None
+                    continue
+                if self._string is not None:
+                    self._string.append(ch)
+                continue
+
+            if ch == '"':
+                if self._depth == 0:
+                    continue
+                self._in_string = True
+                # Only keys of the top-level object need to be remembered
+                self._string = [] if self._depth == 1 else None
+            elif ch in "{[":
+                if self._depth == 1 and ch == "[":
+                    self._in_target = self._key == self.array_key
+                elif self._depth == 2 and ch == "{" and self._in_target:
+                    self._item = ["{"]
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:
+                    continue
+                self._depth -= 1
+                if self._depth == 2 and self._item is not None:
+                    item = self._finish_item()
+                    if item is not None:
+                        items.append(item)
+                elif self._depth == 1:
+                    self._in_target = False
+            elif self._depth == 1 and ch == ":":
+                self._key = self._last_string
+            elif self._depth == 1 and ch == ",":
+                self._key = None
+        return items
+
+    def _finish_item(self) -> Optional[Any]:
+        text = "".join(self._item)
+        self._item = None
+        if self.raw:
+            return text
+        try:
+            return loads_lenient(text)
+        except json.JSONDecodeError:
+            # Left for the full-document parse at the end of the stream
+            return None
+
+
+def iter_array_items(chunks: Iterable[str], array_key: str) -> Iterator[Any]:
+    """Yield each object of ``array_key`` from an iterable of text chunks."""
+    parser = ArrayItemParser(array_key)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
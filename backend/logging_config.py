@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+import logging
+import os
+from typing import Optional
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+def configure(level: Optional[str] = None) -> None:
+    """Send the backend's logs to stderr at ``level`` (default ``LOG_LEVEL``
+    or INFO). Does nothing if logging was already configured."""
+    level = (level or os.environ.get("LOG_LEVEL", "INFO")).upper()
+    logging.basicConfig(level=level, format=LOG_FORMAT)
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Seconds: from a cache hit up to a multi-minute podcast
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric(ABC):
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        ...
+
+    def render(self) -> str:
+        lines = [
+            f"# TYPE {self.name} {self.type}",
+            f"# HELP {self.name} {_escape(self.documentation)}",
+        ]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, exposed as ``<name>_total``."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}_total{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(_Metric):
+    """Current value of something that goes up and down."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over cumulative ``le`` buckets."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: count per bucket (non-cumulative, +Inf last), sum
+        self._values: Dict[LabelValues, Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the ``with`` block, in seconds, even if it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            counts, _ = self._values.get(self._key(labels)) or ([0], 0.0)
+            return sum(counts)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                labels = _format_labels(self.label_names + ("le",), key + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        return lines
+
+
+_lock = threading.Lock()
+_metrics: Dict[str, _Metric] = {}
+
+
+def _register(metric: _Metric) -> _Metric:
+    with _lock:
+        existing = _metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric) or existing.label_names != metric.label_names:
+                raise ValueError(f"Metric {metric.name} already registered differently")
+            return existing
+        _metrics[metric.name] = metric
+        return metric
+
+
+def counter(name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+    """Return the process-wide counter ``name``, creating it on first use."""
+    return _register(Counter(name, documentation, labels))
+
+
+def gauge(name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+    """Return the process-wide gauge ``name``, creating it on first use."""
+    return _register(Gauge(name, documentation, labels))
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labels: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS,
+) -> Histogram:
+    """Return the process-wide histogram ``name``, creating it on first use."""
+    return _register(Histogram(name, documentation, labels, buckets))
+
+
+def render() -> str:
+    """Every metric of this process in the OpenMetrics text format."""
+    with _lock:
+        metrics = sorted(_metrics.values(), key=lambda metric: metric.name)
+    return "".join(metric.render() + "\n" for metric in metrics) + "# EOF\n"
+
+
+# Shared by the agents, the course pipeline and the podcast generator
+LLM_CALL_SECONDS = histogram("llm_call_seconds", "Duration of each agent LLM call", ("agent",))
+LLM_TOKENS = counter("llm_tokens", "Tokens sent to and received from the models", ("agent", "direction"))
+PIPELINE_STAGE_SECONDS = histogram(
+    "pipeline_stage_seconds", "Duration of each course package stage", ("stage",)
+)
+PODCAST_STAGE_SECONDS = histogram(
+    "podcast_stage_seconds", "Duration of each podcast generation stage", ("stage",)
+)
+TTS_SEGMENT_SECONDS = histogram("tts_segment_seconds", "Duration of the TTS call of one segment")
+CACHE_REQUESTS = counter("response_cache_requests", "Response cache lookups", ("result",))
+CACHE_ENTRIES = gauge("response_cache_entries", "Responses held by the response cache")
+CACHE_HIT_RATIO = gauge("response_cache_hit_ratio", "Share of response cache lookups that were hits")
+COALESCED_CALLS = counter(
+    "singleflight_calls", "Calls per coalescing group, as leader or coalesced", ("group", "role")
+)
+RATE_LIMITER_WAIT_SECONDS = histogram(
+    "rate_limiter_wait_seconds", "Time calls waited for the OpenAI rate limiter", ("limiter",)
+)
+RATE_LIMITED = counter("rate_limited", "Calls rejected by OpenAI with a 429", ("limiter",))
+CIRCUIT_OPENED = counter("circuit_opened", "Times a circuit breaker opened", ("breaker",))
+RETRIES = counter("retries", "Retried attempts", ("operation",))
+ERRORS = counter("errors", "Failures, by component", ("component",))
+TTS_CACHE_REQUESTS = counter("tts_cache_requests", "TTS clip cache lookups", ("result",))
+TTS_CACHE_EVICTIONS = counter("tts_cache_evictions", "TTS clips evicted from the clip cache")
+TTS_CACHE_BYTES = gauge("tts_cache_bytes", "Bytes of the clips in the TTS clip cache")
+TTS_CACHE_HIT_RATIO = gauge("tts_cache_hit_ratio", "Share of TTS clip cache lookups that were hits")
+HTTP_REQUESTS = counter("http_requests", "Requests sent through the shared HTTP clients", ("client",))
+HTTP_CONNECTIONS_OPENED = counter(
+    "http_connections_opened", "New connections opened by the shared HTTP clients", ("client",)
+)
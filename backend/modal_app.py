@@ -1,13 +1,18 @@
+import logging
 import os
 
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 
 import modal
 from pydantic import BaseModel
-from typing import Dict, Any
-from fastapi.responses import FileResponse
+from typing import Dict, Any, List, Optional
+from fastapi import Header
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 
-from podcast import PodcastGenerator, ToneType
+import jobs
+import logging_config
+import metrics
 # deployed urls:
 # ├── 🔨 Created web function generate_course_content =>
 # │   https://davisuga-chief--edu-one-generate-course-content.modal.run
@@ -16,6 +21,12 @@ from podcast import PodcastGenerator, ToneType
 # ├── 🔨 Created web function generate_quiz => https://davisuga-chief--edu-one-generate-quiz.modal.run
 # ├── 🔨 Created web function generate_course_package =>
 # │   https://davisuga-chief--edu-one-generate-course-package.modal.run
+
+# The load_probe endpoint only exists in deployments made with LOAD_PROBE=1,
+# so production does not expose an unauthenticated endpoint that sleeps. The
+# flag is baked into the image so containers define the same methods
+LOAD_PROBE = os.environ.get("LOAD_PROBE", "0") == "1"
+
 image = modal.Image.debian_slim(python_version="3.13").apt_install("ffmpeg").pip_install(
     "fastapi[standard]",
     "langgraph",
@@ -27,79 +38,262 @@ image = modal.Image.debian_slim(python_version="3.13").apt_install("ffmpeg").pip
     "openai",
     "pydantic",
     "audio-utils"
-).add_local_dir(".", "/root")
+).env({"LOAD_PROBE": "1" if LOAD_PROBE else "0"}).add_local_dir(".", "/root")
 
 app = modal.App(name="edu_one", image=image)
 
+# Leveled logs instead of prints; LOG_LEVEL=DEBUG shows every TTS segment
+logging_config.configure()
+logger = logging.getLogger(__name__)
+
+# Endpoints are async and spend almost all their time waiting on OpenAI, so one
+# container can serve many requests at once instead of one container per call.
+MAX_CONCURRENT_INPUTS = int(os.environ.get("MAX_CONCURRENT_INPUTS", "50"))
+
+# Limits for generate_flashcards_batch: items per request and how many of
+# them are generated at the same time inside the container
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", "100"))
+MAX_BATCH_CONCURRENCY = int(os.environ.get("MAX_BATCH_CONCURRENCY", "8"))
+
+# Long generations run as jobs: the store is shared by every container and
+# podcast audio is written to a volume so any container can serve it.
+JOBS_DIR = "/jobs"
+job_volume = modal.Volume.from_name("edu-one-job-results", create_if_missing=True)
+if not modal.is_local():
+    jobs.set_store(jobs.ModalJobStore("edu-one-jobs"))
+
+# Synthesized TTS clips are cached on a volume shared by every container that
+# generates podcasts, so repeated lines are never synthesized twice.
+TTS_CACHE_DIR = "/tts-cache"
+tts_cache_volume = modal.Volume.from_name("edu-one-tts-cache", create_if_missing=True)
+if not modal.is_local():
+    os.environ.setdefault("TTS_CACHE_DIR", TTS_CACHE_DIR)
+
+def _use_tts_cache_volume():
+    """Point the clip cache at the volume: new clips are committed after each
+    podcast and clips of other containers are picked up by reloading it."""
+    import clip_cache
+    clip_cache.configure(persist=tts_cache_volume.commit, refresh=tts_cache_volume.reload)
+
+def _container_stats() -> Dict[str, Any]:
+    """State kept per process by the modules making OpenAI calls, so it is
+    only meaningful in the containers of ``Agents`` and ``Podcast``."""
+    import http_pool
+    import rate_limiter
+    import resilience
+    import singleflight
+    return {
+        "coalescing": singleflight.stats(),
+        "rate_limits": rate_limiter.stats(),
+        "circuits": resilience.stats(),
+        "http": http_pool.stats(),
+    }
+
 # Request/Response models
 class CourseRequest(BaseModel):
     topic: str
+    bypass_cache: bool = False
 
 class CourseResponse(BaseModel):
     modules: list
 
 class FlashcardsRequest(BaseModel):
     course_content: Dict[str, Any]
+    bypass_cache: bool = False
+    modules_per_shard: Optional[int] = None
 
 class FlashcardsResponse(BaseModel):
     flashcards: list
 
+class FlashcardsBatchItem(BaseModel):
+    id: Optional[str] = None
+    course_content: Dict[str, Any]
+
+class FlashcardsBatchRequest(BaseModel):
+    items: List[FlashcardsBatchItem]
+    bypass_cache: bool = False
+    max_concurrency: Optional[int] = None
+
 class QuizRequest(BaseModel):
     content_json: str
+    bypass_cache: bool = False
+    modules_per_shard: Optional[int] = None
 
 class QuizResponse(BaseModel):
     questions: list
 
 class CoursePackageRequest(BaseModel):
     topic: str
+    bypass_cache: bool = False
+    modules_per_shard: Optional[int] = None
 
 class CoursePackageResponse(BaseModel):
     course_content: Dict[str, Any]
     flashcards: Dict[str, Any]
     quiz: Dict[str, Any]
+    timings: Dict[str, float]
 
 class PodcastRequest(BaseModel):
     topic: str
 
+class JobRequest(BaseModel):
+    kind: str  # "course_package" or "podcast"
+    payload: Dict[str, Any]
+    idempotency_key: Optional[str] = None
+
 @app.function()
 @modal.fastapi_endpoint(docs=True)
 def hello():
     return {"message": "Hello from EduOne API!"}
 
-@app.function()
-@modal.fastapi_endpoint(method="POST", docs=True)
-def generate_course_content(request: CourseRequest):
-    """Generate course content for a given topic."""
-    try:
-        from course_content_agent import generate_course_content
-        course_content = generate_course_content(request.topic)
-        return {"course_content": course_content}
-    except Exception as e:
-        return {"error": str(e)}
+@app.cls()
+@modal.concurrent(max_inputs=MAX_CONCURRENT_INPUTS)
+class Agents:
+    """The course, flashcard and quiz endpoints.
 
-@app.function()
-@modal.fastapi_endpoint(method="POST", docs=True)
-def generate_flashcards(request: FlashcardsRequest):
-    """Generate flashcards based on course content."""
-    try:
-        from flashcards_agent import generate_flashcards
-        flashcards = generate_flashcards(request.course_content)
-        return {"flashcards": flashcards}
-    except Exception as e:
-        return {"error": str(e)}
+    Only their containers compile the agent graphs and load the tokenizer,
+    once at boot, so the first request reuses the same clients and graphs
+    as every request after it and other endpoints boot without them.
+    """
 
-@app.function()
-@modal.fastapi_endpoint(method="POST", docs=True)
-def generate_quiz(request: QuizRequest):
-    """Generate a quiz based on course content JSON."""
-    try:
-        from quizzes_agent import generate_quiz
-        quiz = generate_quiz(request.content_json)
-        return {"quiz": quiz}
-    except Exception as e:
-        return {"error": str(e)}
+    @modal.enter()
+    def start(self):
+        try:
+            import agent_registry
+            agent_registry.warm_up()
+        except Exception as e:
+            logger.warning("Failed to warm up agents: %s", e)
+
+    # Labels keep the URLs of the former function endpoints
+    @modal.fastapi_endpoint(method="POST", docs=True, label="edu-one-generate-course-content")
+    async def generate_course_content(self, request: CourseRequest):
+        """Generate course content for a given topic."""
+        try:
+            from course_content_agent import agenerate_course_content
+            course_content = await agenerate_course_content(request.topic, bypass_cache=request.bypass_cache)
+            return {"course_content": course_content}
+        except Exception as e:
+            return {"error": str(e)}
+
+    @modal.fastapi_endpoint(method="POST", docs=True, label="edu-one-generate-flashcards")
+    async def generate_flashcards(self, request: FlashcardsRequest):
+        """Generate flashcards based on course content."""
+        try:
+            from flashcards_agent import agenerate_flashcards
+            flashcards = await agenerate_flashcards(
+                request.course_content,
+                bypass_cache=request.bypass_cache,
+                modules_per_shard=request.modules_per_shard,
+            )
+            return {"flashcards": flashcards}
+        except Exception as e:
+            return {"error": str(e)}
+
+    @modal.fastapi_endpoint(method="POST", docs=True, label="edu-one-generate-flashcards-batch")
+    async def generate_flashcards_batch(self, request: FlashcardsBatchRequest):
+        """Generate flashcards for many lessons in one request.
+
+        Items are processed concurrently (at most ``max_concurrency`` at a time)
+        and ``results`` follows the order of ``items``: each entry has the item
+        ``id`` and either ``flashcards`` or ``error``.
+        """
+        if len(request.items) > MAX_BATCH_SIZE:
+            return {"error": f"Batch too large: {len(request.items)} items, maximum is {MAX_BATCH_SIZE}"}
+
+        from flashcards_agent import agenerate_flashcards_batch
+        results = await agenerate_flashcards_batch(
+            [item.course_content for item in request.items],
+            bypass_cache=request.bypass_cache,
+            max_concurrency=min(request.max_concurrency or MAX_BATCH_CONCURRENCY, MAX_BATCH_CONCURRENCY),
+        )
+        return {
+            "results": [{"id": item.id, **result} for item, result in zip(request.items, results)],
+            "succeeded": sum("error" not in result for result in results),
+            "failed": sum("error" in result for result in results),
+        }
+
+    @modal.fastapi_endpoint(method="POST", docs=True, label="edu-one-generate-quiz")
+    async def generate_quiz(self, request: QuizRequest):
+        """Generate a quiz based on course content JSON."""
+        try:
+            from quizzes_agent import agenerate_quiz
+            quiz = await agenerate_quiz(
+                request.content_json,
+                bypass_cache=request.bypass_cache,
+                modules_per_shard=request.modules_per_shard,
+            )
+            return {"quiz": quiz}
+        except Exception as e:
+            return {"error": str(e)}
+
+    @modal.fastapi_endpoint(method="POST", docs=True, label="edu-one-generate-course-package")
+    async def generate_course_package(self, request: CoursePackageRequest):
+        """Generate a complete course package with content, flashcards, and quiz."""
+        try:
+            from course_content_agent import abuild_course_package
+
+            # Flashcards and quiz run concurrently once the course content exists
+            package = await abuild_course_package(
+                request.topic,
+                bypass_cache=request.bypass_cache,
+                modules_per_shard=request.modules_per_shard,
+            )
+
+            return package
+        except Exception as e:
+            return {"error": str(e)}
+
+    @modal.fastapi_endpoint(method="POST", docs=True, label="edu-one-generate-course-package-stream")
+    async def generate_course_package_stream(self, request: CoursePackageRequest):
+        """Stream the course package as NDJSON, one event per line.
+
+        Modules, flashcards and questions arrive as ``<stage>_item`` events while
+        the model is still writing, ``course_content`` as soon as it is parsed,
+        then flashcards and quiz (or their shards) as each completes, and
+        finally ``done``.
+        """
+        import json
+        from course_content_agent import stream_course_package
+
+        def ndjson():
+            for event in stream_course_package(
+                request.topic,
+                bypass_cache=request.bypass_cache,
+                modules_per_shard=request.modules_per_shard,
+            ):
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    # Agent metrics only exist in the containers of this class; the label
+    # keeps the URL of the former function endpoint
+    @modal.fastapi_endpoint(method="GET", docs=True, label="edu-one-metrics")
+    def agent_metrics(self):
+        """OpenMetrics exposition (LLM call latencies, tokens, cache hits and
+        size, pipeline stages, coalesced calls, retries, errors) of this agent
+        container. Every container keeps its own counters, so scrape each one."""
+        import response_cache
+        response_cache.get_cache().record_stats()
+        return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+    if LOAD_PROBE:
+        # Served by the agent containers, so a load test sees the same
+        # concurrency and scaling as the async agent endpoints
+        @modal.fastapi_endpoint(method="GET", docs=True, label="edu-one-load-probe")
+        async def load_probe(self, seconds: float = 2.0):
+            """Wait ``seconds`` like an LLM call would and report which
+            container served the request. Used by ``benchmarks/load_test.py``."""
+            import asyncio
+            await asyncio.sleep(min(max(seconds, 0.0), 30.0))
+            return {"container": os.environ.get("MODAL_TASK_ID", "local")}
+
+    @modal.fastapi_endpoint(method="GET", docs=True, label="edu-one-agents-stats")
+    def agent_stats(self):
+        """How many calls this agent container coalesced, the state of its
+        OpenAI rate limiters and circuit breakers and how often its HTTP
+        connections were reused."""
+        return _container_stats()
 
-generator = PodcastGenerator()
 @dataclass
 class PodcastGeneratorReq:
     content: str
@@ -107,48 +301,129 @@ class PodcastGeneratorReq:
     target_audience: str = "Alunos "
     format_style: str = "Conversa educacional entre especialista e mediador"
 
-@app.function()
-@modal.fastapi_endpoint(method="POST", docs=True)
-def generate_podcast(request: PodcastGeneratorReq):
-    p= generator.generate_podcast(
-        content=request.content,
-        title=request.title,
-        target_audience=request.target_audience,
-        format_style=request.format_style,
-        tone=ToneType.EDUCATIONAL,
-    )
-    return FileResponse(path=p)
+@app.cls(volumes={TTS_CACHE_DIR: tts_cache_volume})
+@modal.concurrent(max_inputs=MAX_CONCURRENT_INPUTS)
+class Podcast:
+    """The podcast pipeline, loaded only by the containers serving it.
 
-@app.function()
-@modal.fastapi_endpoint(method="POST", docs=True)
-def generate_course_package(request: CoursePackageRequest):
-    """Generate a complete course package with content, flashcards, and quiz."""
-    try:
-        from course_content_agent import generate_course_content
-        from flashcards_agent import generate_flashcards
-        from quizzes_agent import generate_quiz
-        import json
+    Other endpoints never import openai's TTS stack or build the generator,
+    and a missing API key fails this endpoint instead of every container.
+    """
 
-        # Generate course content
-        course_content = generate_course_content(request.topic)
+    @modal.enter()
+    def start(self):
+        from podcast import get_service
+        _use_tts_cache_volume()
+        self.service = get_service()
+        self.service.start()
 
-        # Generate flashcards
-        flashcards = generate_flashcards(course_content)
+    # The label keeps the URL of the former function endpoint
+    @modal.fastapi_endpoint(method="POST", docs=True, label="edu-one-generate-podcast")
+    async def generate_podcast(self, request: PodcastGeneratorReq):
+        from podcast import ToneType
+        p= await self.service.agenerate_podcast(
+            content=request.content,
+            title=request.title,
+            target_audience=request.target_audience,
+            format_style=request.format_style,
+            tone=ToneType.EDUCATIONAL,
+        )
+        # The generation directory is deleted once the file has been sent
+        return FileResponse(path=p, background=BackgroundTask(self.service.release_podcast, p))
 
-        # Generate quiz
-        content_json = json.dumps(course_content, ensure_ascii=False, indent=2)
-        quiz = generate_quiz(content_json)
+    @modal.fastapi_endpoint(method="POST", docs=True, label="edu-one-stream-podcast")
+    async def stream_podcast(self, request: PodcastGeneratorReq):
+        """Stream the podcast mp3 in script order while it is generated, so
+        playback can start with the first segment instead of the whole file."""
+        from podcast import ToneType
+        chunks = self.service.astream_podcast(
+            content=request.content,
+            title=request.title,
+            target_audience=request.target_audience,
+            format_style=request.format_style,
+            tone=ToneType.EDUCATIONAL,
+        )
+        return StreamingResponse(chunks, media_type="audio/mpeg")
 
-        package = {
-            "course_content": course_content,
-            "flashcards": flashcards,
-            "quiz": quiz
-        }
+    # Podcast metrics only exist in the containers of this class
+    @modal.fastapi_endpoint(method="GET", docs=True, label="edu-one-podcast-metrics")
+    def podcast_metrics(self):
+        """OpenMetrics exposition of this podcast container, with the hit rate
+        and size of the TTS clip cache."""
+        import clip_cache
+        cache = clip_cache.get_cache()
+        if cache is not None:
+            cache.record_stats()
+        return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+    @modal.fastapi_endpoint(method="GET", docs=True, label="edu-one-podcast-stats")
+    def podcast_stats(self):
+        """How many calls this podcast container coalesced, the state of its
+        OpenAI rate limiters and circuit breakers and how often its HTTP
+        connections were reused."""
+        return _container_stats()
+
+def _job_payload(kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate a job payload against the request model of its endpoint."""
+    if kind == "course_package":
+        return CoursePackageRequest(**payload).model_dump()
+    if kind == "podcast":
+        return asdict(PodcastGeneratorReq(**payload))
+    raise ValueError(f"Unknown job kind: {kind}")
+
+@app.function(volumes={JOBS_DIR: job_volume, TTS_CACHE_DIR: tts_cache_volume}, timeout=60 * 60)
+def run_job(job_id: str, kind: str, payload: Dict[str, Any]):
+    """Worker behind ``submit_job``."""
+    if kind == "podcast":
+        _use_tts_cache_volume()
+    jobs.run(job_id, kind, payload, output_dir=JOBS_DIR, persist=job_volume.commit)
 
-        return package
+@app.function()
+@modal.concurrent(max_inputs=MAX_CONCURRENT_INPUTS)
+@modal.fastapi_endpoint(method="POST", docs=True)
+def submit_job(request: JobRequest, idempotency_key: Optional[str] = Header(None)):
+    """Start a course package or podcast generation and return its job.
+
+    Send the same ``Idempotency-Key`` header (or ``idempotency_key`` field)
+    when retrying: the existing job is returned instead of starting another.
+    Poll ``job_status`` for progress and fetch ``job_result`` when done.
+    """
+    try:
+        job, created = jobs.submit(
+            request.kind,
+            _job_payload(request.kind, request.payload),
+            idempotency_key=idempotency_key or request.idempotency_key,
+            dispatch=lambda job_id, kind, payload: run_job.spawn(job_id, kind, payload),
+        )
+        return {"job": job.summary(), "created": created}
     except Exception as e:
         return {"error": str(e)}
 
+@app.function()
+@modal.concurrent(max_inputs=MAX_CONCURRENT_INPUTS)
+@modal.fastapi_endpoint(method="GET", docs=True)
+def job_status(job_id: str):
+    """Status and progress percentage of a job."""
+    job = jobs.get_store().get(job_id)
+    if job is None:
+        return {"error": f"Job {job_id} not found"}
+    return {"job": job.summary()}
+
+@app.function(volumes={JOBS_DIR: job_volume})
+@modal.concurrent(max_inputs=MAX_CONCURRENT_INPUTS)
+@modal.fastapi_endpoint(method="GET", docs=True)
+def job_result(job_id: str):
+    """Result of a finished job: the package JSON or the podcast audio."""
+    job = jobs.get_store().get(job_id)
+    if job is None:
+        return {"error": f"Job {job_id} not found"}
+    if job.status != jobs.SUCCEEDED:
+        return {"job": job.summary()}
+    if job.kind == "podcast":
+        job_volume.reload()
+        return FileResponse(path=job.result["audio_path"])
+    return job.result
+
 @app.function()
 @modal.fastapi_endpoint(method="GET", docs=True)
 def health():
@@ -0,0 +1,225 @@
+"""Frame-level MP3 concatenation, without decoding or re-encoding.
+
+An MP3 stream is a sequence of self-contained frames, so clips that share
+MPEG version, sample rate and channel mode can be joined by copying their
+frames one after the other. Silence is made of frames whose side information
+is all zeros: they carry no main data and decode to digital silence, so no
+encoder is needed to produce them.
+
+Only MPEG Layer III (every MP3 the TTS returns) is supported. ID3 tags and
+the Xing/Info/VBRI header frame of each clip are dropped, since they
+describe the clip and not the joined stream.
+"""
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Index 0 is "free format" and 15 is invalid: neither is accepted
+_BITRATES = {
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),  # MPEG-1
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),  # MPEG-2
+    0: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),  # MPEG-2.5
+}
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+_MONO = 3
+
+
+class Mp3FormatError(ValueError):
+    """The data is not Layer III MP3, or clips do not share a format."""
+
+
+@dataclass(frozen=True)
+class FrameFormat:
+    """What frames must share to be played back as one stream."""
+
+    version: int
+    sample_rate_index: int
+    channel_mode: int
+    bitrate_index: int
+
+    @property
+    def sample_rate(self) -> int:
+        return _SAMPLE_RATES[self.version][self.sample_rate_index]
+
+    @property
+    def samples_per_frame(self) -> int:
+        return 1152 if self.version == 3 else 576
+
+    @property
+    def side_info_size(self) -> int:
+        if self.version == 3:
+            return 17 if self.channel_mode == _MONO else 32
+        return 9 if self.channel_mode == _MONO else 17
+
+    def compatible(self, other: FrameFormat) -> bool:
+        """Bitrates may differ between frames; the rest may not."""
+        return (self.version, self.sample_rate_index, self.channel_mode == _MONO) == (
+            other.version, other.sample_rate_index, other.channel_mode == _MONO
+        )
+
+
+# Frame format and length (without padding) by the header bits they depend on
+_header_cache: Dict[Tuple[int, int, int], Optional[Tuple[FrameFormat, int]]] = {}
+
+
+def _parse_header(data: bytes, pos: int) -> Optional[Tuple[FrameFormat, int]]:
+    """Format and length of the frame starting at ``pos``, or None if no
+    valid Layer III header starts there."""
+    if pos + 4 > len(data) or data[pos] != 0xFF or data[pos + 1] & 0xE0 != 0xE0:
+        return None
+    b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+    key = (b1, b2 & 0xFC, b3 >> 6)
+    if key not in _header_cache:
+        _header_cache[key] = _decode_header(b1, b2, b3)
+    header = _header_cache[key]
+    if header is None:
+        return None
+    fmt, length = header
+    return fmt, length + ((b2 >> 1) & 1)
+
+
+def _decode_header(b1: int, b2: int, b3: int) -> Optional[Tuple[FrameFormat, int]]:
+    version = (b1 >> 3) & 3
+    layer = (b1 >> 1) & 3
+    bitrate_index = b2 >> 4
+    sample_rate_index = (b2 >> 2) & 3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    fmt = FrameFormat(version, sample_rate_index, b3 >> 6, bitrate_index)
+    return fmt, _frame_length(fmt)
+
+
+def _frame_length(fmt: FrameFormat, padding: int = 0) -> int:
+    bitrate = _BITRATES[fmt.version][fmt.bitrate_index] * 1000
+    coefficient = 144 if fmt.version == 3 else 72
+    return coefficient * bitrate // fmt.sample_rate + padding
+
+
+def _skip_id3v2(data: bytes) -> int:
+    if len(data) >= 10 and data[:3] == b"ID3":
+        size = 0
+        for byte in data[6:10]:
+            size = (size << 7) | (byte & 0x7F)
+        footer = 10 if data[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+
+def _is_info_frame(data: bytes, pos: int, fmt: FrameFormat) -> bool:
+    """Whether the frame at ``pos`` is a Xing/Info or VBRI header, not audio."""
+    crc = 0 if data[pos + 1] & 1 else 2
+    offset = pos + 4 + crc + fmt.side_info_size
+    return data[offset:offset + 4] in (b"Xing", b"Info") or data[pos + 36:pos + 40] == b"VBRI"
+
+
+def _frames(data: bytes) -> Iterator[Tuple[FrameFormat, int, int]]:
+    """Format, start and end of every audio frame in ``data``, in order.
+    Bytes between frames are skipped."""
+    pos = _skip_id3v2(data)
+    first = True
+    while pos < len(data):
+        header = _parse_header(data, pos)
+        if header is None:
+            if data[pos:pos + 3] == b"TAG" or data[pos:pos + 8] == b"APETAGEX":
+                return
+            pos += 1
+            continue
+        fmt, length = header
+        end = pos + length
+        if end > len(data):
+            return  # truncated last frame
+        if not (first and _is_info_frame(data, pos, fmt)):
+            first = False
+            yield fmt, pos, end
+        pos = end
+
+
+def parse(data: bytes) -> Tuple[FrameFormat, List[Tuple[int, int]], int]:
+    """Format of the first audio frame, the ``(start, end)`` spans of the
+    audio in ``data`` (consecutive frames merged into one span) and the
+    number of frames."""
+    spans: List[Tuple[int, int]] = []
+    first: Optional[FrameFormat] = None
+    count = 0
+    for fmt, start, end in _frames(data):
+        count += 1
+        if first is None:
+            first = fmt
+        elif fmt is not first and not fmt.compatible(first):
+            raise Mp3FormatError(f"frame at byte {start} changes the stream format")
+        if spans and spans[-1][1] == start:
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((start, end))
+    if first is None:
+        raise Mp3FormatError("no MPEG Layer III audio frames found")
+    return first, spans, count
+
+
+def probe(path: str) -> FrameFormat:
+    """Format of the MP3 file at ``path``, from its first audio frame."""
+    with open(path, "rb") as f:
+        data = f.read()
+    for fmt, _, _ in _frames(data):
+        return fmt
+    raise Mp3FormatError(f"{os.path.basename(path)}: no MPEG Layer III audio frames found")
+
+
+def silence(fmt: FrameFormat, duration_ms: float) -> bytes:
+    """Silent frames matching ``fmt``, as close to ``duration_ms`` as whole
+    frames allow."""
+    frames = round(duration_ms / 1000 * fmt.sample_rate / fmt.samples_per_frame)
+    header = bytes((
+        0xFF,
+        0xE0 | fmt.version << 3 | 1 << 1 | 1,  # Layer III, no CRC
+        fmt.bitrate_index << 4 | fmt.sample_rate_index << 2,
+        fmt.channel_mode << 6,
+    ))
+    frame = header + bytes(_frame_length(fmt) - len(header))
+    return frame * frames
+
+
+def concatenate(paths: Sequence[str], output_path: str, gap_ms: float = 0) -> float:
+    """Join the MP3 files in ``paths`` into ``output_path`` with ``gap_ms``
+    of silence between them, copying their frames. Returns the duration in
+    seconds.
+
+    Raises :class:`Mp3FormatError` if a file is not MP3 or the files do not
+    share version, sample rate and channel mode; nothing is written then.
+    Clips are read one at a time, so memory stays at the size of one clip.
+    """
+    if not paths:
+        raise Mp3FormatError("nothing to concatenate")
+
+    # Checked up front so an incompatible clip does not leave half a file
+    formats = [probe(path) for path in paths]
+    reference = formats[0]
+    for path, fmt in zip(paths, formats):
+        if not fmt.compatible(reference):
+            raise Mp3FormatError(f"{os.path.basename(path)} does not match the format of the first clip")
+
+    gap = silence(reference, gap_ms) if gap_ms > 0 else b""
+    gap_frames = len(gap) // _frame_length(reference) if gap else 0
+    frames = 0
+    partial = output_path + ".partial"
+    try:
+        with open(partial, "wb") as out:
+            for i, path in enumerate(paths):
+                if i and gap:
+                    out.write(gap)
+                    frames += gap_frames
+                with open(path, "rb") as f:
+                    data = f.read()
+                _, spans, count = parse(data)
+                view = memoryview(data)
+                for start, end in spans:
+                    out.write(view[start:end])
+                frames += count
+        os.replace(partial, output_path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return frames * reference.samples_per_frame / reference.sample_rate
@@ -8,17 +8,166 @@ import os
 import json
 
 
-from typing import Dict, List, Any, Optional, Tuple
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Any, Optional, Set, Tuple
 from dataclasses import dataclass
 from enum import Enum
 from dotenv import load_dotenv
-import openai
+import logging
+import shutil
 import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+import contextvars
+
+import clip_cache
+import http_pool
+import metrics
+import mp3_frames
+import rate_limiter
+import resilience
+import singleflight
+import tracing
+from json_repair import loads_lenient
+from json_stream import ArrayItemParser
 
 
 # Carrega variáveis de ambiente
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+_tracer = tracing.get_tracer(__name__)
+
+# Com o pipeline ligado o roteiro chega em streaming e cada segmento vai para
+# o TTS assim que fica completo, em vez de esperar o roteiro inteiro
+PIPELINE_SCRIPT_TTS = os.environ.get("PODCAST_PIPELINE", "1") != "0"
+
+
+def _chat_tokens(request: Dict[str, Any]) -> int:
+    """Estimativa de tokens de uma chamada de chat, para o rate limiter"""
+    prompt = "".join(message["content"] for message in request["messages"])
+    return rate_limiter.estimate_tokens(prompt) + request.get("max_tokens", rate_limiter.OUTPUT_TOKENS_ESTIMATE)
+
+
+def _record_usage(permit: rate_limiter.Permit, response) -> None:
+    usage = getattr(response, "usage", None)
+    if usage is not None and getattr(usage, "total_tokens", None):
+        permit.record_usage(usage.total_tokens)
+
+
+def _chat(client, request: Dict[str, Any]):
+    """Chamada de chat passando pelo rate limiter e pela política de retry compartilhados"""
+
+    def attempt():
+        with rate_limiter.get_limiter("chat").limit(_chat_tokens(request)) as permit:
+            response = client.chat.completions.create(**request)
+            _record_usage(permit, response)
+        return response
+
+    return resilience.call(attempt, "podcast.chat", upstream="chat")
+
+
+async def _achat(async_client, request: Dict[str, Any]):
+    """Versão assíncrona de _chat"""
+
+    async def attempt():
+        async with rate_limiter.get_limiter("chat").alimit(_chat_tokens(request)) as permit:
+            response = await async_client.chat.completions.create(**request)
+            _record_usage(permit, response)
+        return response
+
+    return await resilience.acall(attempt, "podcast.chat", upstream="chat")
+
+
+def _stream_retryable(emitted: List[Any]) -> Callable[[BaseException], bool]:
+    """Um streaming só é repetido enquanto nenhum item foi entregue, para não duplicar itens"""
+    return lambda error: not emitted and resilience.is_retryable(error)
+
+
+# JSON que nem o reparo salva ou sem os campos esperados: o modelo (gpt-4,
+# sem modo JSON) às vezes erra o formato, e outra amostra não é garantia
+_MALFORMED_RESPONSE = (ValueError, KeyError, TypeError)
+
+
+def _raise_unless_recoverable(error: Exception) -> None:
+    """Conteúdo padrão só substitui respostas malformadas e falhas
+    transitórias que esgotaram as tentativas. Erro de autenticação,
+    requisição inválida ou circuito aberto sobem para quem chamou, em vez de
+    virar um podcast genérico entregue como sucesso"""
+    if isinstance(error, _MALFORMED_RESPONSE):
+        return
+    if not resilience.is_retryable(error):
+        raise error
+
+
+def _stream_request(request: Dict[str, Any]) -> Dict[str, Any]:
+    return {**request, "stream": True, "stream_options": {"include_usage": True}}
+
+
+def _feed_chunk(chunk, permit: rate_limiter.Permit, parser: ArrayItemParser, parts: List[str], emit) -> None:
+    """Processa um pedaço do streaming: registra o uso e entrega os itens completos"""
+    _record_usage(permit, chunk)
+    if not chunk.choices:
+        return
+    text = chunk.choices[0].delta.content
+    if text:
+        parts.append(text)
+        for item in parser.feed(text):
+            emit(item)
+
+
+def _chat_stream(client, request: Dict[str, Any], array_key: str, on_item: Callable[[Any], None]) -> str:
+    """Chamada de chat em streaming: cada objeto do array array_key vai para
+    on_item assim que o modelo termina de escrevê-lo. Devolve o texto completo."""
+
+    emitted: List[Any] = []
+
+    def emit(item: Any) -> None:
+        emitted.append(item)
+        on_item(item)
+
+    def attempt() -> str:
+        parser = ArrayItemParser(array_key)
+        parts: List[str] = []
+        with rate_limiter.get_limiter("chat").limit(_chat_tokens(request)) as permit:
+            for chunk in client.chat.completions.create(**_stream_request(request)):
+                _feed_chunk(chunk, permit, parser, parts, emit)
+        return "".join(parts)
+
+    return resilience.call(attempt, "podcast.chat", upstream="chat", retryable=_stream_retryable(emitted))
+
+
+async def _achat_stream(async_client, request: Dict[str, Any], array_key: str, on_item: Callable[[Any], None]) -> str:
+    """Versão assíncrona de _chat_stream"""
+
+    emitted: List[Any] = []
+
+    def emit(item: Any) -> None:
+        emitted.append(item)
+        on_item(item)
+
+    async def attempt() -> str:
+        parser = ArrayItemParser(array_key)
+        parts: List[str] = []
+        async with rate_limiter.get_limiter("chat").alimit(_chat_tokens(request)) as permit:
+            async for chunk in await async_client.chat.completions.create(**_stream_request(request)):
+                _feed_chunk(chunk, permit, parser, parts, emit)
+        return "".join(parts)
+
+    return await resilience.acall(attempt, "podcast.chat", upstream="chat", retryable=_stream_retryable(emitted))
+
+
+def _speech(client, request: Dict[str, Any]):
+    """Chamada de TTS passando pelo rate limiter compartilhado (uma tentativa)"""
+    with rate_limiter.get_limiter("tts").limit(rate_limiter.estimate_tokens(request["input"])):
+        return client.audio.speech.create(**request)
+
+
+async def _aspeech(async_client, request: Dict[str, Any]):
+    """Versão assíncrona de _speech"""
+    async with rate_limiter.get_limiter("tts").alimit(rate_limiter.estimate_tokens(request["input"])):
+        return await async_client.audio.speech.create(**request)
+
 class VoiceType(Enum):
     """Tipos de voz disponíveis - 11 vozes da OpenAI
 
@@ -81,12 +230,41 @@ class PodcastConfig:
 class ContentAnalyzer:
     """Analisa conteúdo e extrai informações relevantes"""
 
-    def __init__(self, openai_client):
+    def __init__(self, openai_client, async_client=None):
         self.client = openai_client
+        self.async_client = async_client
 
     def analyze_content(self, content: str) -> Dict[str, Any]:
         """Analisa o conteúdo e extrai tópicos, tom e estrutura"""
 
+        try:
+            response = _chat(self.client, self._request(content))
+
+            return loads_lenient(response.choices[0].message.content)
+
+        except Exception as e:
+            logger.error("Erro na análise: %s", e)
+            metrics.ERRORS.inc(component="podcast_analysis")
+            _raise_unless_recoverable(e)
+            return self._default_analysis()
+
+    async def aanalyze_content(self, content: str) -> Dict[str, Any]:
+        """Versão assíncrona de analyze_content"""
+
+        try:
+            response = await _achat(self.async_client, self._request(content))
+
+            return loads_lenient(response.choices[0].message.content)
+
+        except Exception as e:
+            logger.error("Erro na análise: %s", e)
+            metrics.ERRORS.inc(component="podcast_analysis")
+            _raise_unless_recoverable(e)
+            return self._default_analysis()
+
+    def _request(self, content: str) -> Dict[str, Any]:
+        """Monta os parâmetros da chamada de análise"""
+
         analysis_prompt = f"""
         Analise o seguinte conteúdo e forneça uma estrutura detalhada para um podcast EM PORTUGUÊS BRASILEIRO:
 
@@ -110,32 +288,29 @@ class ContentAnalyzer:
         Responda APENAS com JSON válido em português brasileiro.
         """
 
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "Você é um especialista em análise de conteúdo e produção de podcasts. Analise o conteúdo fornecido e retorne apenas JSON válido."},
-                    {"role": "user", "content": analysis_prompt}
-                ],
-                temperature=0.7
-            )
-
-            return json.loads(response.choices[0].message.content)
+        return {
+            "model": "gpt-4",
+            "messages": [
+                {"role": "system", "content": "Você é um especialista em análise de conteúdo e produção de podcasts. Analise o conteúdo fornecido e retorne apenas JSON válido."},
+                {"role": "user", "content": analysis_prompt}
+            ],
+            "temperature": 0.7
+        }
 
-        except Exception as e:
-            print(f"❌ Erro na análise: {e}")
-            return {
-                "topic": "Tópico não identificado",
-                "key_points": ["Ponto principal"],
-                "target_audience": "Público geral",
-                "recommended_tone": "casual",
-                "complexity_level": 3,
-                "estimated_duration": 2,
-                "discussion_angles": ["Visão geral"],
-                "questions_to_explore": ["Como isso funciona?"],
-                "examples_and_stories": ["Exemplo prático"],
-                "actionable_insights": ["Dica prática"]
-            }
+    def _default_analysis(self) -> Dict[str, Any]:
+        """Análise padrão caso haja erro"""
+        return {
+            "topic": "Tópico não identificado",
+            "key_points": ["Ponto principal"],
+            "target_audience": "Público geral",
+            "recommended_tone": "casual",
+            "complexity_level": 3,
+            "estimated_duration": 2,
+            "discussion_angles": ["Visão geral"],
+            "questions_to_explore": ["Como isso funciona?"],
+            "examples_and_stories": ["Exemplo prático"],
+            "actionable_insights": ["Dica prática"]
+        }
 
 class PersonaGenerator:
     """Gerador de personas para o podcast"""
@@ -164,14 +339,14 @@ class PersonaGenerator:
         # Pega o primeiro nome e normaliza
         first_name = name.split()[0].lower().strip()
 
-        print(f"🔍 Detectando gênero para: '{name}' (primeiro nome: '{first_name}')")
+        logger.debug("Detectando gênero para: '%s' (primeiro nome: '%s')", name, first_name)
 
         # Verifica se é masculino
         if first_name in masculine_names:
             # Alterna entre as vozes masculinas disponíveis
             masculine_voices = [VoiceType.ECHO, VoiceType.ONYX, VoiceType.ASH, VoiceType.BALLAD]
             selected_voice = masculine_voices[hash(name) % len(masculine_voices)]
-            print(f"✅ Nome masculino detectado → {selected_voice.value}")
+            logger.debug("Nome masculino detectado → %s", selected_voice.value)
             return selected_voice
 
         # Verifica se é feminino
@@ -179,25 +354,25 @@ class PersonaGenerator:
             # Alterna entre as vozes femininas disponíveis
             feminine_voices = [VoiceType.FABLE, VoiceType.NOVA, VoiceType.SHIMMER, VoiceType.ALLOY, VoiceType.CORAL, VoiceType.SAGE]
             selected_voice = feminine_voices[hash(name) % len(feminine_voices)]
-            print(f"✅ Nome feminino detectado → {selected_voice.value}")
+            logger.debug("Nome feminino detectado → %s", selected_voice.value)
             return selected_voice
 
         # Fallback: tenta detectar por terminação comum
         if first_name.endswith(('o', 'os', 'ro', 'do', 'to')):
-            print(f"📝 Detectado como masculino pela terminação → echo")
+            logger.debug("Detectado como masculino pela terminação → echo")
             return VoiceType.ECHO  # Masculino
         elif first_name.endswith(('a', 'as', 'na', 'da', 'ta')):
-            print(f"📝 Detectado como feminino pela terminação → fable")
+            logger.debug("Detectado como feminino pela terminação → fable")
             return VoiceType.FABLE  # Feminino
 
         # Fallback final: usa voz feminina mais neutra (contralto)
-        print(f"⚠️ Fallback para voz neutra → alloy")
+        logger.warning("Fallback para voz neutra → alloy")
         return VoiceType.ALLOY
 
     def generate_personas(self, content_analysis: Dict[str, Any], config: PodcastConfig) -> Tuple[Persona, Persona]:
         """Gera duas personas complementares para o podcast - versão hardcoded para garantir consistência"""
 
-        print("🎤 Usando personas hardcoded para garantir consistência de gênero/voz")
+        logger.debug("Usando personas hardcoded para garantir consistência de gênero/voz")
 
         # Personas fixas com gênero/voz corretos
         persona1 = Persona(
@@ -222,14 +397,14 @@ class PersonaGenerator:
             background="Comunicador brasileiro experiente"
         )
 
-        print(f"🎤 Persona 1: {persona1.name} (feminina) → {persona1.voice.value}")
-        print(f"🎤 Persona 2: {persona2.name} (masculino) → {persona2.voice.value}")
+        logger.debug("Persona 1: %s (feminina) → %s", persona1.name, persona1.voice.value)
+        logger.debug("Persona 2: %s (masculino) → %s", persona2.name, persona2.voice.value)
 
         return persona1, persona2
 
     def _get_default_personas(self, config: PodcastConfig) -> Tuple[Persona, Persona]:
         """Personas padrão caso haja erro - com consistência de gênero"""
-        print("🎤 Usando personas padrão")
+        logger.debug("Usando personas padrão")
 
         persona1 = Persona(
             name="Ana Paula",
@@ -258,8 +433,9 @@ class PersonaGenerator:
 class UnifiedScriptGenerator:
     """Gerador de roteiro unificado - um único agente responsável por todo o roteiro"""
 
-    def __init__(self, openai_client):
+    def __init__(self, openai_client, async_client=None):
         self.client = openai_client
+        self.async_client = async_client
 
     def generate_complete_script(
         self,
@@ -270,6 +446,136 @@ class UnifiedScriptGenerator:
     ) -> List[PodcastSegment]:
         """Gera o roteiro completo do podcast com um único agente"""
 
+        try:
+            response = _chat(self.client, self._request(content_analysis, persona1, persona2, config))
+
+            return self._parse_segments(response.choices[0].message.content)
+
+        except Exception as e:
+            logger.error("Erro na geração do roteiro: %s", e)
+            metrics.ERRORS.inc(component="podcast_script")
+            _raise_unless_recoverable(e)
+            return self._get_default_script(persona1, persona2, config)
+
+    async def agenerate_complete_script(
+        self,
+        content_analysis: Dict[str, Any],
+        persona1: Persona,
+        persona2: Persona,
+        config: PodcastConfig
+    ) -> List[PodcastSegment]:
+        """Versão assíncrona de generate_complete_script"""
+
+        try:
+            response = await _achat(self.async_client, self._request(content_analysis, persona1, persona2, config))
+
+            return self._parse_segments(response.choices[0].message.content)
+
+        except Exception as e:
+            logger.error("Erro na geração do roteiro: %s", e)
+            metrics.ERRORS.inc(component="podcast_script")
+            _raise_unless_recoverable(e)
+            return self._get_default_script(persona1, persona2, config)
+
+    def stream_complete_script(
+        self,
+        content_analysis: Dict[str, Any],
+        persona1: Persona,
+        persona2: Persona,
+        config: PodcastConfig,
+        on_segment: Callable[[PodcastSegment], None]
+    ) -> List[PodcastSegment]:
+        """Gera o roteiro em streaming: cada segmento vai para on_segment assim
+        que o modelo termina de escrevê-lo, antes do roteiro ficar pronto"""
+
+        segments: List[PodcastSegment] = []
+        emit = self._collecting(segments, on_segment)
+
+        try:
+            content = _chat_stream(
+                self.client, self._request(content_analysis, persona1, persona2, config), "segments", emit
+            )
+            if not segments:
+                # Nenhum segmento saiu do streaming: usa o documento inteiro
+                for segment in self._parse_segments(content):
+                    emit(segment)
+
+        except Exception as e:
+            self._stream_failed(e, segments, emit, persona1, persona2, config)
+
+        return segments
+
+    async def astream_complete_script(
+        self,
+        content_analysis: Dict[str, Any],
+        persona1: Persona,
+        persona2: Persona,
+        config: PodcastConfig,
+        on_segment: Callable[[PodcastSegment], None]
+    ) -> List[PodcastSegment]:
+        """Versão assíncrona de stream_complete_script"""
+
+        segments: List[PodcastSegment] = []
+        emit = self._collecting(segments, on_segment)
+
+        try:
+            content = await _achat_stream(
+                self.async_client, self._request(content_analysis, persona1, persona2, config), "segments", emit
+            )
+            if not segments:
+                for segment in self._parse_segments(content):
+                    emit(segment)
+
+        except Exception as e:
+            self._stream_failed(e, segments, emit, persona1, persona2, config)
+
+        return segments
+
+    def _collecting(
+        self, segments: List[PodcastSegment], on_segment: Callable[[PodcastSegment], None]
+    ) -> Callable[[Any], None]:
+        """Converte cada item do streaming em segmento, guarda e repassa"""
+
+        def emit(item: Any) -> None:
+            if not isinstance(item, PodcastSegment):
+                try:
+                    item = self._to_segment(item)
+                except (KeyError, TypeError) as e:
+                    logger.warning("Segmento inválido ignorado: %s", e)
+                    return
+            segments.append(item)
+            on_segment(item)
+
+        return emit
+
+    def _stream_failed(
+        self,
+        error: Exception,
+        segments: List[PodcastSegment],
+        emit: Callable[[Any], None],
+        persona1: Persona,
+        persona2: Persona,
+        config: PodcastConfig
+    ) -> None:
+        logger.error("Erro na geração do roteiro: %s", error)
+        metrics.ERRORS.inc(component="podcast_script")
+        _raise_unless_recoverable(error)
+        # Segmentos já enviados ao TTS ficam: o podcast sai mais curto
+        if segments:
+            logger.warning("Roteiro interrompido após %s segmentos", len(segments))
+            return
+        for segment in self._get_default_script(persona1, persona2, config):
+            emit(segment)
+
+    def _request(
+        self,
+        content_analysis: Dict[str, Any],
+        persona1: Persona,
+        persona2: Persona,
+        config: PodcastConfig
+    ) -> Dict[str, Any]:
+        """Monta os parâmetros da chamada de geração do roteiro"""
+
         # Calcula número ideal de segmentos baseado na duração
         duration_minutes = config.duration_minutes
         if duration_minutes <= 1:
@@ -330,46 +636,36 @@ class UnifiedScriptGenerator:
         RESPONDA APENAS COM JSON VÁLIDO EM PORTUGUÊS BRASILEIRO.
         """
 
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "Você é um roteirista especializado em podcasts brasileiros. Crie conversas naturais e envolventes SEMPRE em português brasileiro. Mantenha consistência de idioma do início ao fim."},
-                    {"role": "user", "content": script_prompt}
-                ],
-                temperature=0.7,
-                max_tokens=4000
-            )
+        return {
+            "model": "gpt-4",
+            "messages": [
+                {"role": "system", "content": "Você é um roteirista especializado em podcasts brasileiros. Crie conversas naturais e envolventes SEMPRE em português brasileiro. Mantenha consistência de idioma do início ao fim."},
+                {"role": "user", "content": script_prompt}
+            ],
+            "temperature": 0.7,
+            "max_tokens": 4000
+        }
 
-            script_data = json.loads(response.choices[0].message.content)
+    def _parse_segments(self, content: str) -> List[PodcastSegment]:
+        """Converte a resposta do modelo em segmentos"""
 
-            # Converte para objetos PodcastSegment com validação de idioma
-            segments = []
-            for segment_data in script_data['segments']:
-                text = segment_data['text']
+        script_data = loads_lenient(content)
 
-                # Validação básica de idioma (verifica se tem muito inglês)
-                if self._validate_portuguese_text(text):
-                    segment = PodcastSegment(
-                        speaker=segment_data['speaker'],
-                        text=text
-                    )
-                    segments.append(segment)
-                else:
-                    print(f"⚠️ Segmento com possível problema de idioma detectado: {text[:50]}...")
-                    # Corrige o texto para português
-                    corrected_text = self._ensure_portuguese(text, segment_data['speaker'])
-                    segment = PodcastSegment(
-                        speaker=segment_data['speaker'],
-                        text=corrected_text
-                    )
-                    segments.append(segment)
+        # Converte para objetos PodcastSegment com validação de idioma
+        return [self._to_segment(segment_data) for segment_data in script_data['segments']]
 
-            return segments
+    def _to_segment(self, segment_data: Dict[str, Any]) -> PodcastSegment:
+        """Converte um item do roteiro em segmento, corrigindo o idioma se preciso"""
 
-        except Exception as e:
-            print(f"❌ Erro na geração do roteiro: {e}")
-            return self._get_default_script(persona1, persona2, config)
+        text = segment_data['text']
+
+        # Validação básica de idioma (verifica se tem muito inglês)
+        if not self._validate_portuguese_text(text):
+            logger.warning("Segmento com possível problema de idioma detectado: %s...", text[:50])
+            # Corrige o texto para português
+            text = self._ensure_portuguese(text, segment_data['speaker'])
+
+        return PodcastSegment(speaker=segment_data['speaker'], text=text)
 
     def _validate_portuguese_text(self, text: str) -> bool:
         """Validação básica se o texto está em português"""
@@ -421,80 +717,249 @@ class UnifiedScriptGenerator:
             )
         ]
 
+class EmptyAudioError(Exception):
+    """A API de TTS respondeu sem áudio; vale tentar de novo"""
+
+
+def _retryable_tts(error: BaseException) -> bool:
+    return resilience.is_retryable(error) or isinstance(error, EmptyAudioError)
+
+
+# Diretório de trabalho da geração em andamento. O gerador é compartilhado
+# pelos pedidos de um container: cada geração tem o seu diretório, para que
+# pedidos simultâneos não escrevam, leiam nem apaguem os arquivos uns dos outros
+_workdir: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("podcast_workdir", default=None)
+
+
+@contextmanager
+def _request_workdir(base: str) -> Iterator[str]:
+    """Cria o diretório de trabalho de uma geração dentro de base; as tarefas
+    e threads iniciadas no bloco herdam o contexto e escrevem nele"""
+    path = tempfile.mkdtemp(prefix="request_", dir=base)
+    token = _workdir.set(path)
+    try:
+        yield path
+    finally:
+        _workdir.reset(token)
+
+
+def _current_workdir(default: str) -> str:
+    return _workdir.get() or default
+
+
+class _Deliveries:
+    """Diretórios de trabalho dos podcasts já entregues
+
+    Pedidos coalescidos recebem o mesmo arquivo, então o diretório da geração
+    só é apagado quando o último pedido que o recebeu o libera. Cada pedido
+    é contado antes de entrar na geração e os diretórios ficam associados à
+    chave da geração, não ao caminho devolvido
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._holders: Dict[str, int] = {}
+        self._workdirs: Dict[str, Set[str]] = {}
+        self._keys: Dict[str, str] = {}
+
+    def hold(self, key: str) -> None:
+        with self._lock:
+            self._holders[key] = self._holders.get(key, 0) + 1
+
+    def attach(self, key: str, workdir: str) -> None:
+        with self._lock:
+            self._workdirs.setdefault(key, set()).add(workdir)
+            self._keys[workdir] = key
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._holders[key] -= 1
+            if self._holders[key] > 0:
+                return
+            del self._holders[key]
+            workdirs = self._workdirs.pop(key, set())
+            for workdir in workdirs:
+                self._keys.pop(workdir, None)
+        for workdir in workdirs:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def release_path(self, path: str) -> None:
+        with self._lock:
+            key = self._keys.get(os.path.dirname(path))
+        if key is not None:
+            self.release(key)
+
+
+_deliveries = _Deliveries()
+
+
+def _refresh_clips() -> None:
+    """Antes de uma geração: vê os clipes que outros containers sintetizaram"""
+    cache = clip_cache.get_cache()
+    if cache is not None:
+        cache.refresh()
+
+
+def _persist_clips() -> None:
+    """Depois de uma geração: publica os clipes novos para os outros containers"""
+    cache = clip_cache.get_cache()
+    if cache is not None:
+        cache.persist()
+
+
 class AudioGenerator:
     """Gera áudio para cada segmento do podcast"""
 
-    def __init__(self, openai_client):
+    def __init__(self, openai_client, async_client=None):
         self.client = openai_client
+        self.async_client = async_client
         self.temp_dir = tempfile.mkdtemp()
 
     def generate_audio_for_segment(self, segment: PodcastSegment, persona: Persona) -> str:
         """Gera áudio para um segmento específico"""
 
-        import time
+        request = self._speech_request(segment, persona)
+        key = self._clip_key(request)
+        cached = self._cached_audio(key, request, segment, persona)
+        if cached:
+            return cached
+
+        def attempt() -> str:
+            response = _speech(self.client, request)
+            return self._save_audio(response, request, key, segment, persona)
+
+        try:
+            return resilience.call(attempt, "podcast.tts", upstream="tts", retryable=_retryable_tts)
+        except Exception as e:
+            logger.error("Falha definitiva no TTS: %s", e)
+            metrics.ERRORS.inc(component="tts")
+            return self._fallback_audio(segment)
+
+    async def agenerate_audio_for_segment(self, segment: PodcastSegment, persona: Persona) -> str:
+        """Versão assíncrona de generate_audio_for_segment"""
+
+        import asyncio
+
+        request = self._speech_request(segment, persona)
+        key = self._clip_key(request)
+        cached = await asyncio.to_thread(self._cached_audio, key, request, segment, persona)
+        if cached:
+            return cached
+
+        async def attempt() -> str:
+            response = await _aspeech(self.async_client, request)
+            # Salvar e medir a duração decodifica o mp3: fica fora do event loop
+            return await asyncio.to_thread(self._save_audio, response, request, key, segment, persona)
+
+        try:
+            return await resilience.acall(attempt, "podcast.tts", upstream="tts", retryable=_retryable_tts)
+        except Exception as e:
+            logger.error("Falha definitiva no TTS: %s", e)
+            metrics.ERRORS.inc(component="tts")
+            return self._fallback_audio(segment)
+
+    def _speech_request(self, segment: PodcastSegment, persona: Persona) -> Dict[str, Any]:
+        """Monta os parâmetros da chamada de TTS"""
+
+        # Trunca texto se muito longo (limite da API)
+        text = segment.text[:4000] if len(segment.text) > 4000 else segment.text
+
+        # Gera áudio usando OpenAI TTS mais recente com instruções de idioma
+        logger.debug("Gerando voz %s para: %s...", persona.voice.value, text[:50])
+
+        # Instruções específicas para português brasileiro
+        voice_instructions = f"""
+        Fale em português brasileiro natural e fluente.
+        Use sotaque brasileiro típico.
+        Mantenha {persona.speaking_style}.
+        Evite sotaque estrangeiro.
+        """
+
+        return {
+            "model": "gpt-4o-mini-tts",  # Modelo mais recente
+            "voice": persona.voice.value,
+            "input": text,
+            "instructions": voice_instructions.strip(),
+            "speed": 1.0,
+            "timeout": 60  # 60 segundos timeout
+        }
+
+    @staticmethod
+    def _clip_key(request: Dict[str, Any]) -> str:
+        """Endereço do clipe no cache: tudo que muda o áudio gerado"""
+        return clip_cache.make_key(
+            request["input"], request["voice"], request["model"], request["instructions"], request["speed"]
+        )
+
+    def _audio_path(self, text: str, persona: Persona) -> str:
         import hashlib
 
-        max_retries = 3
-        retry_delay = 2
+        # Cria nome único para arquivo
+        text_hash = hashlib.md5(text.encode()).hexdigest()[:8]
+        return os.path.join(_current_workdir(self.temp_dir), f"segment_{text_hash}_{persona.voice.value}.mp3")
 
-        for attempt in range(max_retries):
-            try:
-                # Trunca texto se muito longo (limite da API)
-                text = segment.text[:4000] if len(segment.text) > 4000 else segment.text
-
-                # Gera áudio usando OpenAI TTS mais recente com instruções de idioma
-                print(f"    🎤 Gerando voz {persona.voice.value} para: {text[:50]}...")
-
-                # Instruções específicas para português brasileiro
-                voice_instructions = f"""
-                Fale em português brasileiro natural e fluente.
-                Use sotaque brasileiro típico.
-                Mantenha {persona.speaking_style}.
-                Evite sotaque estrangeiro.
-                """
-
-                response = self.client.audio.speech.create(
-                    model="gpt-4o-mini-tts",  # Modelo mais recente
-                    voice=persona.voice.value,
-                    input=text,
-                    instructions=voice_instructions.strip(),
-                    speed=1.0,
-                    timeout=60  # 60 segundos timeout
-                )
+    def _cached_audio(
+        self, key: str, request: Dict[str, Any], segment: PodcastSegment, persona: Persona
+    ) -> Optional[str]:
+        """Usa o clipe do cache, se já foi sintetizado, sem chamar o TTS"""
 
-                # Cria nome único para arquivo
-                text_hash = hashlib.md5(text.encode()).hexdigest()[:8]
-                audio_path = os.path.join(self.temp_dir, f"segment_{text_hash}_{persona.voice.value}.mp3")
+        cache = clip_cache.get_cache()
+        if cache is None:
+            return None
+        audio_path = self._audio_path(request["input"], persona)
+        try:
+            found = cache.get(key, audio_path)
+        except OSError as e:
+            logger.warning("Cache de TTS indisponível: %s", e)
+            return None
+        span = tracing.get_current_span()
+        if span is not None:
+            span.set_attribute("tts.cache_hit", found)
+        if not found:
+            return None
+
+        segment.audio_path = audio_path
+        segment.duration = self._get_audio_duration(audio_path)
+        logger.debug("Áudio do cache: %s (%.1fs)", os.path.basename(audio_path), segment.duration)
+        return audio_path
+
+    def _save_audio(
+        self, response, request: Dict[str, Any], key: str, segment: PodcastSegment, persona: Persona
+    ) -> str:
+        """Salva o áudio retornado pela API, guarda no cache e atualiza o segmento"""
+
+        audio_path = self._audio_path(request["input"], persona)
 
-                # Salva arquivo
-                response.stream_to_file(audio_path)
+        # Salva arquivo
+        response.write_to_file(audio_path)
 
-                # Verifica se arquivo foi criado
-                if not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0:
-                    raise Exception("Arquivo de áudio vazio ou não criado")
+        # Verifica se arquivo foi criado
+        if not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0:
+            raise EmptyAudioError("Arquivo de áudio vazio ou não criado")
 
-                # Atualiza informações do segmento
-                segment.audio_path = audio_path
-                segment.duration = self._get_audio_duration(audio_path)
+        # Uma falha do cache não perde o áudio já gerado
+        cache = clip_cache.get_cache()
+        if cache is not None:
+            try:
+                cache.put(key, audio_path)
+            except OSError as e:
+                logger.warning("Não foi possível guardar o clipe no cache: %s", e)
 
-                print(f"    ✅ Áudio salvo: {os.path.basename(audio_path)} ({segment.duration:.1f}s)")
-                return audio_path
+        # Atualiza informações do segmento
+        segment.audio_path = audio_path
+        segment.duration = self._get_audio_duration(audio_path)
 
-            except Exception as e:
-                print(f"    ⚠️ Tentativa {attempt + 1}/{max_retries} falhou: {e}")
+        logger.debug("Áudio salvo: %s (%.1fs)", os.path.basename(audio_path), segment.duration)
+        return audio_path
 
-                if attempt < max_retries - 1:
-                    print(f"    ⏳ Aguardando {retry_delay}s antes de tentar novamente...")
-                    time.sleep(retry_delay)
-                    retry_delay *= 2  # Backoff exponencial
-                else:
-                    print(f"    ❌ Falha definitiva após {max_retries} tentativas")
-                    # Cria arquivo vazio como fallback
-                    fallback_path = os.path.join(self.temp_dir, f"fallback_{hash(segment.text)}.txt")
-                    with open(fallback_path, 'w', encoding='utf-8') as f:
-                        f.write(f"ERRO: Não foi possível gerar áudio para:\n{segment.text}")
-                    segment.audio_path = fallback_path
-                    return fallback_path
+    def _fallback_audio(self, segment: PodcastSegment) -> str:
+        """Cria arquivo de texto como fallback quando o TTS falha"""
+
+        fallback_path = os.path.join(_current_workdir(self.temp_dir), f"fallback_{hash(segment.text)}.txt")
+        with open(fallback_path, 'w', encoding='utf-8') as f:
+            f.write(f"ERRO: Não foi possível gerar áudio para:\n{segment.text}")
+        segment.audio_path = fallback_path
+        return fallback_path
 
     def _get_audio_duration(self, audio_path: str) -> float:
         """Obtém duração do arquivo de áudio"""
@@ -515,14 +980,25 @@ class AudioGenerator:
             return max(1.0, min(estimated_duration, 60.0))  # entre 1 e 60 segundos
 
         except Exception as e:
-            print(f"⚠️  Erro ao calcular duração: {e}")
+            logger.warning("Erro ao calcular duração: %s", e)
             return 5.0
 
+# Silêncio entre segmentos, no arquivo montado e no streaming
+SEGMENT_GAP_MS = 800
+
+# Com o pool de TTS cheio, a cada quanto o limite do rate limiter é relido
+_SLOT_POLL_SECONDS = 0.05
+
+# Vinhetas da mixagem profissional, usadas com intro_music/outro_music
+INTRO_AUDIO_PATH = os.environ.get("PODCAST_INTRO_PATH")
+OUTRO_AUDIO_PATH = os.environ.get("PODCAST_OUTRO_PATH")
+
 class PodcastAssembler:
     """Monta o podcast final combinando todos os áudios"""
 
     def __init__(self):
         self.temp_dir = tempfile.mkdtemp()
+        self._gap: Optional[Tuple[mp3_frames.FrameFormat, bytes]] = None
 
         # Importa audio_utils se disponível
         try:
@@ -532,16 +1008,18 @@ class PodcastAssembler:
             self.audio_available = True
         except ImportError:
             self.audio_available = False
-            print("⚠️  audio_utils não disponível. Usando simulação.")
+            logger.warning("audio_utils não disponível. Usando simulação.")
 
     def assemble_podcast(self, segments: List[PodcastSegment], config: PodcastConfig) -> str:
         """Combina todos os segmentos em um podcast final"""
 
         try:
-            output_path = os.path.join(self.temp_dir, f"podcast_{config.title.replace(' ', '_')}.mp3")
+            output_path = os.path.join(
+                _current_workdir(self.temp_dir), f"podcast_{config.title.replace(' ', '_')}.mp3"
+            )
 
-            print(f"🎧 Montando podcast: {config.title}")
-            print(f"📁 Caminho de saída: {output_path}")
+            logger.info("Montando podcast: %s", config.title)
+            logger.info("Caminho de saída: %s", output_path)
 
             # Coleta arquivos de áudio válidos
             audio_files = []
@@ -550,7 +1028,7 @@ class PodcastAssembler:
                     audio_files.append(segment.audio_path)
 
             if not audio_files:
-                print("❌ Nenhum arquivo de áudio válido encontrado")
+                logger.error("Nenhum arquivo de áudio válido encontrado")
                 return self._create_fallback_file(output_path, segments)
 
             # Usa processador de áudio se disponível
@@ -559,15 +1037,34 @@ class PodcastAssembler:
                     audio_files,
                     output_path,
                     add_silence=True,
-                    silence_duration=800  # ms entre segmentos
+                    silence_duration=SEGMENT_GAP_MS
                 )
             else:
                 return self._create_fallback_file(output_path, segments)
 
         except Exception as e:
-            print(f"❌ Erro na montagem: {e}")
+            logger.error("Erro na montagem: %s", e)
+            metrics.ERRORS.inc(component="podcast_assembly")
             return self._create_fallback_file(output_path, segments)
 
+    def stream_clip(self, audio_path: str, after_gap: bool) -> bytes:
+        """Frames mp3 de um segmento para o streaming, precedidos do silêncio
+        entre segmentos no mesmo formato; as tags do clipe ficam de fora"""
+        with open(audio_path, "rb") as f:
+            data = f.read()
+        try:
+            fmt, spans, _ = mp3_frames.parse(data)
+        except mp3_frames.Mp3FormatError as e:
+            logger.warning("Clipe enviado sem tratamento: %s", e)
+            return data
+        view = memoryview(data)
+        frames = b"".join(view[start:end] for start, end in spans)
+        if not after_gap:
+            return frames
+        if self._gap is None or self._gap[0] != fmt:
+            self._gap = (fmt, mp3_frames.silence(fmt, SEGMENT_GAP_MS))
+        return self._gap[1] + frames
+
     def _create_fallback_file(self, output_path: str, segments: List[PodcastSegment]) -> str:
         """Cria arquivo de fallback quando não consegue concatenar"""
 
@@ -587,22 +1084,24 @@ class PodcastAssembler:
                 f.write("Para ouvir o podcast completo, instale as dependências de áudio:\n")
                 f.write("pip install pydub\n")
 
-            print(f"📄 Roteiro salvo em: {output_path}")
+            logger.info("Roteiro salvo em: %s", output_path)
             return output_path
 
         except Exception as e:
-            print(f"❌ Erro ao criar fallback: {e}")
+            logger.error("Erro ao criar fallback: %s", e)
             return ""
 
     def create_professional_mix(self, segments: List[PodcastSegment], config: PodcastConfig) -> str:
         """Cria mixagem profissional do podcast"""
 
         if not self.audio_available:
-            print("⚠️  Mixagem profissional requer audio_utils")
+            logger.warning("Mixagem profissional requer audio_utils")
             return self.assemble_podcast(segments, config)
 
         try:
-            output_path = os.path.join(self.temp_dir, f"podcast_pro_{config.title.replace(' ', '_')}.mp3")
+            output_path = os.path.join(
+                _current_workdir(self.temp_dir), f"podcast_pro_{config.title.replace(' ', '_')}.mp3"
+            )
 
             audio_files = [s.audio_path for s in segments if s.audio_path and os.path.exists(s.audio_path)]
 
@@ -612,13 +1111,40 @@ class PodcastAssembler:
             return self.mixer.create_professional_mix(
                 segments=audio_files,
                 output_path=output_path,
-                normalize_volume=True
+                normalize_volume=True,
+                intro_path=INTRO_AUDIO_PATH if config.intro_music else None,
+                outro_path=OUTRO_AUDIO_PATH if config.outro_music else None,
+                silence_duration=SEGMENT_GAP_MS
             )
 
         except Exception as e:
-            print(f"❌ Erro na mixagem profissional: {e}")
+            logger.error("Erro na mixagem profissional: %s", e)
             return self.assemble_podcast(segments, config)
 
+_podcast_flights = singleflight.group("podcast")
+
+
+@contextmanager
+def _stage(name: str):
+    """Mede uma etapa da geração: span de trace e histograma de duração"""
+    with _tracer.start_as_current_span(f"podcast.{name}"), metrics.PODCAST_STAGE_SECONDS.time(stage=name):
+        yield
+
+
+@contextmanager
+def _segment(index: int, segment: PodcastSegment, queued_since: float):
+    """Mede o TTS de um segmento, registrando quanto tempo ele esperou na fila"""
+    attributes = {
+        "segment.index": index,
+        "segment.speaker": segment.speaker,
+        "segment.chars": len(segment.text),
+        "segment.queued_seconds": round(time.perf_counter() - queued_since, 3),
+    }
+    with _tracer.start_as_current_span("podcast.tts.segment", attributes=attributes), \
+            metrics.TTS_SEGMENT_SECONDS.time():
+        yield
+
+
 class PodcastGenerator:
     """Classe principal para geração de podcasts"""
 
@@ -627,13 +1153,21 @@ class PodcastGenerator:
         if not self.api_key:
             raise ValueError("OpenAI API key é obrigatória")
 
-        self.client = openai.OpenAI(api_key=self.api_key)
+        # O SDK da OpenAI leva ~1s para importar: só quando o gerador é criado
+        import openai
+
+        # Os retries ficam com o módulo resilience, não com o SDK; as conexões
+        # vêm dos pools de http_pool, compartilhados com os agentes
+        self.client = openai.OpenAI(api_key=self.api_key, max_retries=0, http_client=http_pool.get_client())
+        self.async_client = openai.AsyncOpenAI(
+            api_key=self.api_key, max_retries=0, http_client=http_pool.get_async_client()
+        )
 
         # Componentes do sistema
-        self.content_analyzer = ContentAnalyzer(self.client)
+        self.content_analyzer = ContentAnalyzer(self.client, self.async_client)
         self.persona_generator = PersonaGenerator(self.client)
-        self.script_generator = UnifiedScriptGenerator(self.client)
-        self.audio_generator = AudioGenerator(self.client)
+        self.script_generator = UnifiedScriptGenerator(self.client, self.async_client)
+        self.audio_generator = AudioGenerator(self.client, self.async_client)
         self.podcast_assembler = PodcastAssembler()
 
     def generate_podcast(
@@ -643,7 +1177,8 @@ class PodcastGenerator:
         duration_minutes: int = 2,
         tone: ToneType = ToneType.CASUAL,
         target_audience: str = "Público geral",
-        format_style: str = "Conversa informal entre dois apresentadores"
+        format_style: str = "Conversa informal entre dois apresentadores",
+        on_progress: Optional[Callable[[float], None]] = None
     ) -> str:
         """
         Gera um podcast completo a partir do conteúdo fornecido
@@ -655,102 +1190,518 @@ class PodcastGenerator:
             tone: Tom da conversa
             target_audience: Público-alvo
             format_style: Estilo do formato
+            on_progress: Recebe a fração concluída (0 a 1) a cada etapa
+
+        Pedidos idênticos simultâneos compartilham a mesma geração; só o
+        primeiro recebe on_progress.
 
         Returns:
             Caminho para o arquivo de áudio do podcast
         """
 
-        print("🎙️ Iniciando geração de podcast...")
-        print("=" * 50)
+        key = self._flight_key(content, title, duration_minutes, tone, target_audience, format_style)
+        _deliveries.hold(key)
+        try:
+            with _tracer.start_as_current_span("podcast.generate", attributes={"podcast.title": title}):
+                path = _podcast_flights.do(key, lambda: self._generate_in_workdir(
+                    key, content, title, duration_minutes, tone, target_audience, format_style, on_progress
+                ))
+        except BaseException:
+            _deliveries.release(key)
+            raise
+        if not path:
+            _deliveries.release(key)
+        return path
+
+    def _generate_in_workdir(self, key: str, *args) -> str:
+        # O podcast final fica no diretório da geração e é devolvido ao
+        # chamador, que o libera com release_podcast depois de usá-lo
+        _refresh_clips()
+        try:
+            with _request_workdir(self.audio_generator.temp_dir) as workdir:
+                _deliveries.attach(key, workdir)
+                return self._generate_podcast(*args)
+        finally:
+            _persist_clips()
+
+    def release_podcast(self, path: str) -> None:
+        """Libera o arquivo devolvido por generate_podcast ou agenerate_podcast:
+        o diretório da geração é apagado quando todos os pedidos que o
+        receberam o liberam"""
+        _deliveries.release_path(path)
+
+    def _generate_podcast(
+        self,
+        content: str,
+        title: str,
+        duration_minutes: int,
+        tone: ToneType,
+        target_audience: str,
+        format_style: str,
+        on_progress: Optional[Callable[[float], None]]
+    ) -> str:
+        progress = on_progress or (lambda fraction: None)
+
+        logger.info("Iniciando geração de podcast...")
 
         # 1. Configuração
-        config = PodcastConfig(
-            title=title,
-            topic=content[:100] + "..." if len(content) > 100 else content,
-            duration_minutes=duration_minutes,
-            tone=tone,
-            target_audience=target_audience,
-            format_style=format_style
-        )
+        config = self._build_config(content, title, duration_minutes, tone, target_audience, format_style)
 
-        print(f"📝 Configuração: {config.title}")
+        logger.info("Configuração: %s", config.title)
 
         # 2. Análise de conteúdo
-        print("🔍 Analisando conteúdo...")
-        content_analysis = self.content_analyzer.analyze_content(content)
-        print(f"✅ Tópico identificado: {content_analysis['topic']}")
+        logger.info("Analisando conteúdo...")
+        with _stage("analysis"):
+            content_analysis = self.content_analyzer.analyze_content(content)
+        logger.info("Tópico identificado: %s", content_analysis['topic'])
+        progress(0.1)
 
         # 3. Geração de personas
-        print("👥 Gerando personas...")
-        persona1, persona2 = self.persona_generator.generate_personas(content_analysis, config)
-        print(f"✅ Personas: {persona1.name} ({persona1.role}) e {persona2.name} ({persona2.role})")
+        logger.info("Gerando personas...")
+        with _stage("personas"):
+            persona1, persona2 = self.persona_generator.generate_personas(content_analysis, config)
+        logger.info("Personas: %s (%s) e %s (%s)", persona1.name, persona1.role, persona2.name, persona2.role)
 
-        # 4. Geração do roteiro (agente unificado)
-        print("📝 Gerando roteiro...")
-        segments = self.script_generator.generate_complete_script(content_analysis, persona1, persona2, config)
-        print(f"✅ Roteiro gerado com {len(segments)} segmentos")
+        # 4 e 5. Roteiro e geração de áudio (parallelizada)
+        personas_map = {persona1.name: persona1, persona2.name: persona2}
+        if PIPELINE_SCRIPT_TTS:
+            # Cada segmento vai para o TTS assim que o modelo termina de escrevê-lo
+            logger.info("Gerando roteiro e áudio em pipeline...")
+            with self._tts_pool(personas_map, persona1, progress) as dispatch:
+                with _stage("script"):
+                    segments = self.script_generator.stream_complete_script(
+                        content_analysis, persona1, persona2, config, on_segment=dispatch
+                    )
+                logger.info("Roteiro gerado com %s segmentos", len(segments))
+                progress(0.3)
+        else:
+            logger.info("Gerando roteiro...")
+            with _stage("script"):
+                segments = self.script_generator.generate_complete_script(content_analysis, persona1, persona2, config)
+            logger.info("Roteiro gerado com %s segmentos", len(segments))
+            progress(0.3)
+
+            logger.info("Gerando áudio...")
+            with self._tts_pool(personas_map, persona1, progress) as dispatch:
+                for segment in segments:
+                    dispatch(segment)
+
+        logger.info("Geração de áudio concluída!")
+
+        # 6. Montagem final
+        logger.info("Montando podcast final...")
+        with _stage("assembly"):
+            final_path = self.podcast_assembler.assemble_podcast(segments, config)
+
+        logger.info(
+            "Podcast gerado com sucesso: %s (%s minutos, apresentadores %s e %s)",
+            final_path, duration_minutes, persona1.name, persona2.name
+        )
+
+        return final_path
+
+    async def agenerate_podcast(
+        self,
+        content: str,
+        title: str = "Podcast Gerado por IA",
+        duration_minutes: int = 2,
+        tone: ToneType = ToneType.CASUAL,
+        target_audience: str = "Público geral",
+        format_style: str = "Conversa informal entre dois apresentadores",
+        on_progress: Optional[Callable[[float], None]] = None
+    ) -> str:
+        """
+        Versão assíncrona de generate_podcast
+
+        As chamadas à API não bloqueiam o event loop, então um mesmo container
+        atende vários pedidos enquanto espera pelo modelo e pelo TTS.
+        """
+
+        key = self._flight_key(content, title, duration_minutes, tone, target_audience, format_style)
+        _deliveries.hold(key)
+        try:
+            with _tracer.start_as_current_span("podcast.generate", attributes={"podcast.title": title}):
+                path = await _podcast_flights.ado(key, lambda: self._agenerate_in_workdir(
+                    key, content, title, duration_minutes, tone, target_audience, format_style, on_progress
+                ))
+        except BaseException:
+            _deliveries.release(key)
+            raise
+        if not path:
+            _deliveries.release(key)
+        return path
+
+    async def _agenerate_in_workdir(self, key: str, *args) -> str:
+        import asyncio
+
+        await asyncio.to_thread(_refresh_clips)
+        try:
+            with _request_workdir(self.audio_generator.temp_dir) as workdir:
+                _deliveries.attach(key, workdir)
+                return await self._agenerate_podcast(*args)
+        finally:
+            await asyncio.to_thread(_persist_clips)
+
+    async def _agenerate_podcast(
+        self,
+        content: str,
+        title: str,
+        duration_minutes: int,
+        tone: ToneType,
+        target_audience: str,
+        format_style: str,
+        on_progress: Optional[Callable[[float], None]]
+    ) -> str:
+        import asyncio
+
+        progress = on_progress or (lambda fraction: None)
+
+        logger.info("Iniciando geração de podcast (async)...")
+
+        config = self._build_config(content, title, duration_minutes, tone, target_audience, format_style)
+        logger.info("Configuração: %s", config.title)
+
+        logger.info("Analisando conteúdo...")
+        with _stage("analysis"):
+            content_analysis = await self.content_analyzer.aanalyze_content(content)
+        logger.info("Tópico identificado: %s", content_analysis['topic'])
+        progress(0.1)
+
+        logger.info("Gerando personas...")
+        with _stage("personas"):
+            persona1, persona2 = self.persona_generator.generate_personas(content_analysis, config)
+        logger.info("Personas: %s (%s) e %s (%s)", persona1.name, persona1.role, persona2.name, persona2.role)
 
-        # 5. Geração de áudio (parallelizada)
-        print("🎵 Gerando áudio...")
         personas_map = {persona1.name: persona1, persona2.name: persona2}
+        if PIPELINE_SCRIPT_TTS:
+            logger.info("Gerando roteiro e áudio em pipeline...")
+            async with self._atts_pool(personas_map, persona1, progress) as dispatch:
+                with _stage("script"):
+                    segments = await self.script_generator.astream_complete_script(
+                        content_analysis, persona1, persona2, config, on_segment=dispatch
+                    )
+                logger.info("Roteiro gerado com %s segmentos", len(segments))
+                progress(0.3)
+        else:
+            logger.info("Gerando roteiro...")
+            with _stage("script"):
+                segments = await self.script_generator.agenerate_complete_script(
+                    content_analysis, persona1, persona2, config
+                )
+            logger.info("Roteiro gerado com %s segmentos", len(segments))
+            progress(0.3)
+
+            logger.info("Gerando áudio...")
+            async with self._atts_pool(personas_map, persona1, progress) as dispatch:
+                for segment in segments:
+                    dispatch(segment)
+        logger.info("Geração de áudio concluída!")
+
+        # A montagem usa pydub/ffmpeg e bloqueia: roda numa thread
+        logger.info("Montando podcast final...")
+        with _stage("assembly"):
+            final_path = await asyncio.to_thread(self.podcast_assembler.assemble_podcast, segments, config)
+
+        logger.info(
+            "Podcast gerado com sucesso: %s (apresentadores %s e %s)",
+            final_path, persona1.name, persona2.name
+        )
 
-        # Processa áudio em paralelo
-        from concurrent.futures import ThreadPoolExecutor, as_completed
-        import threading
+        return final_path
 
-        def generate_segment_audio(segment_data):
-            i, segment = segment_data
-            try:
-                print(f"  🔄 Iniciando segmento {i+1}/{len(segments)}: {segment.speaker}")
-                persona = personas_map.get(segment.speaker, persona1)
-                audio_path = self.audio_generator.generate_audio_for_segment(segment, persona)
-                print(f"  ✅ Concluído segmento {i+1}/{len(segments)}: {segment.speaker}")
-                return i, audio_path, None
-            except Exception as e:
-                print(f"  ❌ Erro no segmento {i+1}: {e}")
-                return i, None, str(e)
-
-        # Executa em paralelo (máximo 3 threads para não sobrecarregar a API)
-        max_workers = min(3, len(segments))
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submete todas as tarefas
-            futures = {executor.submit(generate_segment_audio, (i, segment)): i
-                      for i, segment in enumerate(segments)}
-
-            # Coleta resultados conforme completam
-            completed = 0
-            errors = []
-
-            for future in as_completed(futures):
-                completed += 1
+    @contextmanager
+    def _tts_pool(
+        self,
+        personas_map: Dict[str, Persona],
+        default_persona: Persona,
+        progress: Callable[[float], None]
+    ) -> Iterator[Callable[[PodcastSegment], "Future"]]:
+        """Etapa de TTS: devolve dispatch(segment), que põe o segmento na fila
+        do pool de threads (na ordem do roteiro) e devolve o Future do seu
+        áudio; ao sair do bloco espera todos os segmentos"""
+
+        from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+        with _stage("tts"):
+            futures = []
+
+            def generate_segment_audio(i: int, segment: PodcastSegment, queued_since: float) -> Optional[str]:
                 try:
-                    i, audio_path, error = future.result(timeout=120)  # 2 minutos timeout
-                    if error:
-                        errors.append(f"Segmento {i+1}: {error}")
-                    print(f"  📊 Progresso: {completed}/{len(segments)} segmentos processados")
+                    logger.debug("Iniciando segmento %s: %s", i+1, segment.speaker)
+                    persona = personas_map.get(segment.speaker, default_persona)
+                    with _segment(i, segment, queued_since):
+                        self.audio_generator.generate_audio_for_segment(segment, persona)
+                    logger.debug("Concluído segmento %s: %s", i+1, segment.speaker)
+                    return None
                 except Exception as e:
-                    errors.append(f"Erro de execução: {e}")
+                    logger.error("Erro no segmento %s: %s", i+1, e)
+                    return f"Segmento {i+1}: {e}"
+
+            # O limite atual do rate limiter de TTS (AIMD) decide quantos
+            # segmentos rodam ao mesmo tempo; o pool só tem threads para o teto
+            limiter = rate_limiter.get_limiter("tts")
+            slots = threading.Condition()
+            active = 0
+
+            def run_when_allowed(i: int, segment: PodcastSegment, queued_since: float) -> Optional[str]:
+                nonlocal active
+                with slots:
+                    while active >= limiter.concurrency_limit():
+                        slots.wait(_SLOT_POLL_SECONDS)
+                    active += 1
+                try:
+                    return generate_segment_audio(i, segment, queued_since)
+                finally:
+                    with slots:
+                        active -= 1
+                        slots.notify()
+
+            # Segmentos enviados durante o roteiro ficam sob o span do TTS
+            run_in_tts_span = tracing.bind(run_when_allowed)
+
+            with ThreadPoolExecutor(max_workers=limiter.max_concurrency) as executor:
+
+                def dispatch(segment: PodcastSegment) -> Future:
+                    future = executor.submit(run_in_tts_span, len(futures), segment, time.perf_counter())
+                    futures.append(future)
+                    return future
+
+                yield dispatch
+
+                # Coleta resultados conforme completam
+                errors = []
+                for completed, future in enumerate(as_completed(futures), 1):
+                    try:
+                        error = future.result(timeout=120)  # 2 minutos timeout
+                        if error:
+                            errors.append(error)
+                        logger.debug("Progresso: %s/%s segmentos processados", completed, len(futures))
+                        progress(0.3 + 0.6 * completed / len(futures))
+                    except Exception as e:
+                        errors.append(f"Erro de execução: {e}")
+
+                self._report_errors(errors)
+
+    @asynccontextmanager
+    async def _atts_pool(
+        self,
+        personas_map: Dict[str, Persona],
+        default_persona: Persona,
+        progress: Callable[[float], None]
+    ) -> AsyncIterator[Callable[[PodcastSegment], "asyncio.Future"]]:
+        """Versão assíncrona de _tts_pool
+
+        Os segmentos esperam numa fila de prioridade pelo índice: quando o
+        rate limiter reduz a vazão, o primeiro segmento ainda não gerado é
+        sempre o próximo, o que importa para quem ouve em streaming.
+        dispatch devolve um Future resolvido quando o áudio do segmento fica
+        pronto (com a mensagem de erro, se houve).
+        """
 
-            if errors:
-                print(f"  ⚠️ {len(errors)} erro(s) durante geração:")
-                for error in errors[:3]:  # Mostra apenas os 3 primeiros
-                    print(f"    - {error}")
-                if len(errors) > 3:
-                    print(f"    ... e mais {len(errors) - 3} erro(s)")
+        import asyncio
 
-        print("🎵 Geração de áudio concluída!")
+        with _stage("tts"):
+            queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+            futures: List[asyncio.Future] = []
 
-        # 6. Montagem final
-        print("🎧 Montando podcast final...")
-        final_path = self.podcast_assembler.assemble_podcast(segments, config)
+            async def generate_segment_audio(i: int, segment: PodcastSegment, queued_since: float) -> Optional[str]:
+                try:
+                    logger.debug("Iniciando segmento %s: %s", i+1, segment.speaker)
+                    persona = personas_map.get(segment.speaker, default_persona)
+                    with _segment(i, segment, queued_since):
+                        await asyncio.wait_for(
+                            self.audio_generator.agenerate_audio_for_segment(segment, persona),
+                            timeout=120,  # 2 minutos timeout
+                        )
+                    logger.debug("Concluído segmento %s: %s", i+1, segment.speaker)
+                    return None
+                except Exception as e:
+                    logger.error("Erro no segmento %s: %s", i+1, e)
+                    return f"Segmento {i+1}: {e}"
+
+            async def run(i: int, queued_since: float, segment: PodcastSegment, future: asyncio.Future) -> None:
+                error = await generate_segment_audio(i, segment, queued_since)
+                if not future.done():
+                    future.set_result(error)
+
+            limiter = rate_limiter.get_limiter("tts")
+            running: Set[asyncio.Task] = set()
+            slot_freed = asyncio.Event()
+
+            def finished(task: asyncio.Task) -> None:
+                running.discard(task)
+                slot_freed.set()
+
+            async def schedule() -> None:
+                while True:
+                    item = await queue.get()
+                    # O limite atual do rate limiter de TTS (AIMD), e não um
+                    # número fixo de workers, decide quantos segmentos rodam:
+                    # quando ele cai, os outros continuam na fila, em ordem
+                    while len(running) >= limiter.concurrency_limit():
+                        slot_freed.clear()
+                        try:
+                            await asyncio.wait_for(slot_freed.wait(), _SLOT_POLL_SECONDS)
+                        except asyncio.TimeoutError:
+                            pass  # o limite pode ter subido com chamadas de outros pedidos
+                    task = asyncio.create_task(run(*item))
+                    running.add(task)
+                    task.add_done_callback(finished)
+
+            # Segmentos enviados durante o roteiro ficam sob o span do TTS
+            context = contextvars.copy_context()
+            scheduler = asyncio.create_task(schedule(), context=context.copy())
+
+            def dispatch(segment: PodcastSegment) -> asyncio.Future:
+                future = asyncio.get_running_loop().create_future()
+                # O índice é único, então os segmentos nunca são comparados
+                queue.put_nowait((len(futures), time.perf_counter(), segment, future))
+                futures.append(future)
+                return future
 
-        print("=" * 50)
-        print(f"✅ Podcast gerado com sucesso!")
-        print(f"📁 Arquivo: {final_path}")
-        print(f"⏱️ Duração estimada: {duration_minutes} minutos")
-        print(f"👥 Apresentadores: {persona1.name} e {persona2.name}")
+            try:
+                yield dispatch
 
-        return final_path
+                errors = []
+                for completed, future in enumerate(asyncio.as_completed(futures), 1):
+                    error = await future
+                    if error:
+                        errors.append(error)
+                    progress(0.3 + 0.6 * completed / len(futures))
+                self._report_errors(errors)
+            finally:
+                scheduler.cancel()
+                for task in list(running):
+                    task.cancel()
+                # Quem ainda espera um segmento não gerado é liberado
+                for future in futures:
+                    future.cancel()
+
+    async def astream_podcast(
+        self,
+        content: str,
+        title: str = "Podcast Gerado por IA",
+        duration_minutes: int = 2,
+        tone: ToneType = ToneType.CASUAL,
+        target_audience: str = "Público geral",
+        format_style: str = "Conversa informal entre dois apresentadores"
+    ) -> AsyncIterator[bytes]:
+        """
+        Gera o podcast entregando o mp3 aos poucos, na ordem do roteiro
+
+        Cada segmento é enviado (com o silêncio antes dele) assim que ele e
+        todos os anteriores estão prontos, então o início pode ser ouvido
+        enquanto o resto ainda é gerado. Segmentos cujo TTS falhou são
+        pulados. Não há montagem final nem coalescência de pedidos iguais.
+        """
+
+        import asyncio
+
+        config = self._build_config(content, title, duration_minutes, tone, target_audience, format_style)
+
+        # (segmento, Future do áudio) na ordem do roteiro; None no fim
+        pending: asyncio.Queue = asyncio.Queue()
+        # Os clipes só servem a este streaming: o diretório é apagado no fim
+        workdirs: List[str] = []
+
+        # A geração roda numa task própria, com seus spans: o gerador só
+        # repassa os bytes e pode ser fechado a qualquer momento pelo cliente
+        async def produce() -> None:
+            await asyncio.to_thread(_refresh_clips)
+            try:
+                with _tracer.start_as_current_span("podcast.stream", attributes={"podcast.title": title}), \
+                        _request_workdir(self.audio_generator.temp_dir) as workdir:
+                    workdirs.append(workdir)
+                    with _stage("analysis"):
+                        content_analysis = await self.content_analyzer.aanalyze_content(content)
+                    with _stage("personas"):
+                        persona1, persona2 = self.persona_generator.generate_personas(content_analysis, config)
+                    personas_map = {persona1.name: persona1, persona2.name: persona2}
+
+                    async with self._atts_pool(personas_map, persona1, lambda fraction: None) as dispatch:
+
+                        def enqueue(segment: PodcastSegment) -> None:
+                            pending.put_nowait((segment, dispatch(segment)))
+
+                        with _stage("script"):
+                            if PIPELINE_SCRIPT_TTS:
+                                await self.script_generator.astream_complete_script(
+                                    content_analysis, persona1, persona2, config, on_segment=enqueue
+                                )
+                            else:
+                                segments = await self.script_generator.agenerate_complete_script(
+                                    content_analysis, persona1, persona2, config
+                                )
+                                for segment in segments:
+                                    enqueue(segment)
+            finally:
+                pending.put_nowait(None)
+                await asyncio.to_thread(_persist_clips)
+
+        producer = asyncio.create_task(produce())
+        try:
+            sent = 0
+            while (item := await pending.get()) is not None:
+                segment, audio = item
+                await asyncio.wait([audio])
+                if audio.cancelled():
+                    break
+                if not segment.audio_path or not segment.audio_path.endswith(".mp3"):
+                    logger.warning("Segmento sem áudio pulado no streaming: %s...", segment.text[:50])
+                    continue
+                yield await asyncio.to_thread(self.podcast_assembler.stream_clip, segment.audio_path, sent > 0)
+                sent += 1
+            await producer
+            logger.info("Podcast transmitido: %s (%s segmentos)", title, sent)
+        finally:
+            producer.cancel()
+            # A geração precisa parar antes de os clipes serem apagados
+            await asyncio.wait([producer])
+            for workdir in workdirs:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    def _flight_key(
+        self,
+        content: str,
+        title: str,
+        duration_minutes: int,
+        tone: ToneType,
+        target_audience: str,
+        format_style: str
+    ) -> str:
+        return singleflight.make_key(
+            singleflight.normalize_text(content),
+            singleflight.normalize_text(title),
+            duration_minutes,
+            ToneType(tone).value,
+            singleflight.normalize_text(target_audience),
+            singleflight.normalize_text(format_style),
+        )
+
+    def _build_config(
+        self,
+        content: str,
+        title: str,
+        duration_minutes: int,
+        tone: ToneType,
+        target_audience: str,
+        format_style: str
+    ) -> PodcastConfig:
+        return PodcastConfig(
+            title=title,
+            topic=content[:100] + "..." if len(content) > 100 else content,
+            duration_minutes=duration_minutes,
+            tone=tone,
+            target_audience=target_audience,
+            format_style=format_style
+        )
+
+    def _report_errors(self, errors: List[str]) -> None:
+        if errors:
+            # Mostra apenas os 3 primeiros
+            shown = "; ".join(errors[:3])
+            more = f" ... e mais {len(errors) - 3} erro(s)" if len(errors) > 3 else ""
+            logger.warning("%s erro(s) durante geração: %s%s", len(errors), shown, more)
 
     def preview_script(self, content: str, **kwargs) -> List[PodcastSegment]:
         """Gera apenas o roteiro para preview"""
@@ -772,9 +1723,65 @@ class PodcastGenerator:
 
         return segments
 
+class PodcastService:
+    """Ciclo de vida do PodcastGenerator
+
+    O gerador (clientes da OpenAI, diretórios temporários) só é criado no
+    primeiro uso, ou em start(), e depois reaproveitado. Assim quem importa
+    este módulo não paga pela inicialização nem falha sem a API key.
+    """
+
+    def __init__(self, api_key: Optional[str] = None):
+        self._api_key = api_key
+        self._generator: Optional[PodcastGenerator] = None
+        self._lock = threading.Lock()
+
+    @property
+    def generator(self) -> PodcastGenerator:
+        if self._generator is None:
+            with self._lock:
+                if self._generator is None:
+                    self._generator = PodcastGenerator(self._api_key)
+        return self._generator
+
+    def start(self) -> None:
+        """Inicializa o gerador antecipadamente (ex.: na subida do container)"""
+        self.generator
+
+    def generate_podcast(self, content: str, **kwargs) -> str:
+        return self.generator.generate_podcast(content, **kwargs)
+
+    async def agenerate_podcast(self, content: str, **kwargs) -> str:
+        return await self.generator.agenerate_podcast(content, **kwargs)
+
+    def astream_podcast(self, content: str, **kwargs) -> AsyncIterator[bytes]:
+        return self.generator.astream_podcast(content, **kwargs)
+
+    def release_podcast(self, path: str) -> None:
+        self.generator.release_podcast(path)
+
+
+_service: Optional[PodcastService] = None
+_service_lock = threading.Lock()
+
+
+def get_service() -> PodcastService:
+    """Serviço de podcast compartilhado pelo processo"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = PodcastService()
+    return _service
+
+
 def main():
     """Função principal para demonstração"""
 
+    import logging_config
+
+    logging_config.configure()
+
     # Verifica API key
     if not os.environ.get("OPENAI_API_KEY"):
         print("❌ OPENAI_API_KEY não configurada")
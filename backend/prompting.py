@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from agent_registry import DEFAULT_MODEL
+
+logger = logging.getLogger(__name__)
+
+MAX_INPUT_TOKENS = int(os.environ.get("MAX_INPUT_TOKENS", "6000"))
+
+# Used when the tokenizer files cannot be loaded (e.g. no network on first use)
+_CHARS_PER_TOKEN = 4
+
+_lock = threading.Lock()
+_encodings: Dict[str, Any] = {}
+
+
+def compact_json(value: Any) -> str:
+    """Serialize ``value`` for a prompt: no indentation, no padding."""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _encoding(model: str) -> Optional[Any]:
+    if model not in _encodings:
+        with _lock:
+            if model not in _encodings:
+                try:
+                    import tiktoken
+                    try:
+                        _encodings[model] = tiktoken.encoding_for_model(model)
+                    except KeyError:
+                        _encodings[model] = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    logger.warning("Tokenizer indisponível para %s, usando estimativa: %s", model, e)
+                    _encodings[model] = None
+    return _encodings[model]
+
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    """Number of tokens ``text`` costs as input to ``model``."""
+    encoding = _encoding(model)
+    if encoding is None:
+        return -(-len(text) // _CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str = DEFAULT_MODEL) -> str:
+    """Cut ``text`` down to at most ``max_tokens`` tokens."""
+    max_tokens = max(0, max_tokens)
+    encoding = _encoding(model)
+    if encoding is None:
+        return text[:max_tokens * _CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def fit_prompt(
+    build: Callable[[str], str],
+    content: str,
+    budget: int = MAX_INPUT_TOKENS,
+    model: str = DEFAULT_MODEL,
+) -> str:
+    """Return ``build(content)``, truncating ``content`` if the prompt would
+    exceed ``budget`` input tokens."""
+    prompt = build(content)
+    tokens = count_tokens(prompt, model)
+    if tokens <= budget:
+        return prompt
+
+    allowed = budget - count_tokens(build(""), model)
+    logger.warning("Prompt com %d tokens excede o limite de %d; conteúdo truncado", tokens, budget)
+    return build(truncate_tokens(content, allowed, model))
+
+
+def shard_size(
+    course_content: dict,
+    build: Callable[[str], str],
+    budget: int = MAX_INPUT_TOKENS,
+    model: str = DEFAULT_MODEL,
+) -> Optional[int]:
+    """Modules per shard needed for every prompt to fit in ``budget``.
+
+    Returns ``None`` when the whole course fits in one prompt. A single module
+    that is still too large is left for :func:`fit_prompt` to truncate.
+    """
+    modules = course_content.get("modules") or []
+    if len(modules) < 2 or count_tokens(build(compact_json(course_content)), model) <= budget:
+        return None
+
+    size = len(modules)
+    while size > 1:
+        size = -(-size // 2)
+        shards = [
+            {**course_content, "modules": modules[start:start + size]}
+            for start in range(0, len(modules), size)
+        ]
+        if all(count_tokens(build(compact_json(shard)), model) <= budget for shard in shards):
+            break
+    return size
+
+
+def warm_up(model: str = DEFAULT_MODEL) -> None:
+    """Load the tokenizer so the first request does not pay for it."""
+    _encoding(model)
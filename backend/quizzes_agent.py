@@ -1,67 +1,176 @@
 from __future__ import annotations
 
+import asyncio
 import json
-import re
+import logging
 import sys
-from typing import List
+from typing import TYPE_CHECKING, Any, Callable, List
 
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage
-from langgraph.graph.message import MessageGraph
+import agent_registry
+import logging_config
+import metrics
+import prompting
+import sharding
+import structured_output
+from agent_registry import DEFAULT_MODEL
+from schemas import Quiz
 
+# langchain/langgraph are only imported when a graph is built
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+    from langgraph.graph.message import MessageGraph
 
-def build_graph() -> MessageGraph:
+logger = logging.getLogger(__name__)
+
+
+def build_graph(llm: ChatOpenAI | None = None) -> MessageGraph:
     """Builds a LangGraph that generates quizzes."""
-    llm = ChatOpenAI(model="gpt-4")
+    from langchain_core.runnables import RunnableLambda
+    from langgraph.graph.message import MessageGraph
+
+    llm = llm or agent_registry.get_llm(DEFAULT_MODEL)
+    llm = structured_output.bind_schema(llm, Quiz)
 
     def generate(messages: List) -> List:
         return [llm.invoke(messages)]
 
+    async def agenerate(messages: List) -> List:
+        return [await llm.ainvoke(messages)]
+
     builder = MessageGraph()
-    builder.add_node("generator", generate)
+    builder.add_node("generator", RunnableLambda(generate, afunc=agenerate))
     builder.set_entry_point("generator")
     builder.set_finish_point("generator")
     return builder.compile()
 
 
-def generate_quiz(content_json: str) -> dict:
-    """Generate a quiz based on the given course content JSON string."""
-    prompt = (
+def get_graph(model: str = DEFAULT_MODEL, **llm_params: Any) -> MessageGraph:
+    """Return the process-wide compiled graph for the given model settings."""
+    return agent_registry.get_graph("quiz", build_graph, model, **llm_params)
+
+
+def _parse_course(content_json: str) -> dict | None:
+    """Return the course dict encoded in ``content_json``, if it is one."""
+    try:
+        course_content = json.loads(content_json)
+    except json.JSONDecodeError:
+        return None
+    return course_content if isinstance(course_content, dict) else None
+
+
+def _build_prompt(content_json: str) -> str:
+    return (
         f"Com base no seguinte conteúdo de curso:\n{content_json}\n"
         "Gere um quiz com perguntas de múltipla escolha para cada módulo. "
         "Responda em JSON no formato: {\n  \"questions\": [\n"
         "    {\"question\": \"...\", \"question_type\": \"multiple-choice\", \"options\": [\"...\", ...], \"correct_answer\": \"...\"}, ...]\n}"
     )
 
-    graph = build_graph()
-    messages = [HumanMessage(content=prompt)]
-    result = graph.invoke(messages)
-    response = result[-1].content
-
-    # Extrai apenas o JSON da resposta
-    match = re.search(r"\{[\s\S]*\}", response)
-    if match:
-        response = match.group(0)
-
-    # Troca aspas simples por duplas
-    response = response.replace("'", '"')
-
-    # Escapa aspas duplas internas em valores de propriedades
-    def escape_inner_quotes(match):
-        value = match.group(0)
-        return '"' + value[1:-1].replace('"', r'\"') + '"'
-
-    response = re.sub(r'"([^"]*"(?:[^"]*"[^"]*")*)"', escape_inner_quotes, response)
 
+def _parse_response(response: str) -> dict:
     try:
-        return json.loads(response)
-    except json.JSONDecodeError:
-        print("Erro ao decodificar JSON do quiz. Resposta recebida do modelo:")
-        print(response)
+        return structured_output.parse_response(response, Quiz)
+    except ValueError:
+        logger.error("Erro ao decodificar JSON do quiz. Resposta recebida do modelo: %s", response)
+        metrics.ERRORS.inc(component="agent_parse")
         raise
 
 
+def generate_quiz(
+    content_json: str,
+    bypass_cache: bool = False,
+    modules_per_shard: int | None = None,
+    max_concurrency: int = sharding.DEFAULT_MAX_CONCURRENCY,
+    on_shard: sharding.ShardCallback | None = None,
+    on_item: Callable[[dict], None] | None = None,
+) -> dict:
+    """Generate a quiz based on the given course content JSON string.
+
+    With ``modules_per_shard`` and a JSON course with more modules than that,
+    the course is split into shards generated concurrently and merged in
+    module order; courses too large for the input token budget are sharded
+    even without it. Free-form text content is sent in one prompt, truncated
+    if it does not fit.
+    ``on_item`` receives each question as soon as the model has streamed it;
+    in sharded mode use ``on_shard`` instead.
+    """
+    course_content = _parse_course(content_json)
+    if course_content is not None:
+        content_json = prompting.compact_json(course_content)
+        modules_per_shard = modules_per_shard or prompting.shard_size(course_content, _build_prompt)
+    modules = (course_content or {}).get("modules") or []
+    if modules_per_shard and len(modules) > modules_per_shard:
+        return sharding.generate_sharded(
+            sharding.split_modules(course_content, modules_per_shard),
+            lambda shard: generate_quiz(
+                prompting.compact_json(shard), bypass_cache=bypass_cache
+            ),
+            "questions",
+            max_concurrency=max_concurrency,
+            on_shard=on_shard,
+        )
+
+    prompt = prompting.fit_prompt(_build_prompt, content_json)
+
+    cache, key = agent_registry.cache_entry(prompt)
+    if not bypass_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            agent_registry.replay_items(cached, "questions", on_item)
+            return cached
+
+    response = agent_registry.complete(get_graph(), prompt, "questions", on_item)
+
+    parsed = _parse_response(response)
+    cache.set(key, parsed)
+    return parsed
+
+
+async def agenerate_quiz(
+    content_json: str,
+    bypass_cache: bool = False,
+    modules_per_shard: int | None = None,
+    max_concurrency: int = sharding.DEFAULT_MAX_CONCURRENCY,
+    on_shard: sharding.ShardCallback | None = None,
+    on_item: Callable[[dict], None] | None = None,
+) -> dict:
+    """Async :func:`generate_quiz`: the model call goes through ``ainvoke``
+    and shards run as tasks instead of threads."""
+    course_content = _parse_course(content_json)
+    if course_content is not None:
+        content_json = prompting.compact_json(course_content)
+        modules_per_shard = modules_per_shard or prompting.shard_size(course_content, _build_prompt)
+    modules = (course_content or {}).get("modules") or []
+    if modules_per_shard and len(modules) > modules_per_shard:
+        return await sharding.agenerate_sharded(
+            sharding.split_modules(course_content, modules_per_shard),
+            lambda shard: agenerate_quiz(
+                prompting.compact_json(shard), bypass_cache=bypass_cache
+            ),
+            "questions",
+            max_concurrency=max_concurrency,
+            on_shard=on_shard,
+        )
+
+    prompt = prompting.fit_prompt(_build_prompt, content_json)
+
+    cache, key = agent_registry.cache_entry(prompt)
+    if not bypass_cache:
+        cached = await cache.aget(key)
+        if cached is not None:
+            agent_registry.replay_items(cached, "questions", on_item)
+            return cached
+
+    response = await agent_registry.acomplete(get_graph(), prompt, "questions", on_item)
+
+    # A resposta pode precisar de reparo, que faz chamadas síncronas
+    parsed = await asyncio.to_thread(_parse_response, response)
+    await cache.aset(key, parsed)
+    return parsed
+
+
 def main() -> None:
+    logging_config.configure()
     if len(sys.argv) < 2:
         print("Usage: python quizzes_agent.py 'Course content text'")
         raise SystemExit(1)
@@ -70,7 +179,7 @@ def main() -> None:
     try:
         quiz = generate_quiz(content)
         print(json.dumps(quiz, indent=2, ensure_ascii=False))
-    except json.JSONDecodeError as exc:
+    except ValueError as exc:
         # If the model returns invalid JSON, show the error message
         print(str(exc))
 
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+import metrics
+import resilience
+import tracing
+
+# Tokens a chat completion is assumed to produce before its usage is known
+OUTPUT_TOKENS_ESTIMATE = int(os.environ.get("OUTPUT_TOKENS_ESTIMATE", "1000"))
+
+# The buckets hold this many seconds of quota, so a burst cannot spend a
+# whole minute's worth at once
+BURST_SECONDS = 10
+
+# How often a caller blocked on concurrency checks again
+_POLL_INTERVAL = 0.05
+
+# Pause after a 429 that does not say how long to wait
+_DEFAULT_RETRY_AFTER = 1.0
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (4 characters per token), enough for rate limiting."""
+    return -(-len(text) // 4)
+
+
+class _Bucket:
+    """Token bucket refilled continuously at ``per_minute`` / 60 per second."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * BURST_SECONDS)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self, amount: float) -> float:
+        """Seconds until ``amount`` is available (requests larger than the
+        bucket go through once it is full)."""
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float) -> None:
+        self.level = min(self.capacity, self.level - amount)
+
+
+class Permit:
+    """A slot granted by :class:`RateLimiter`, held while the call runs."""
+
+    def __init__(self, limiter: RateLimiter, tokens: int):
+        self.limiter = limiter
+        self.tokens = tokens
+        self.started = time.monotonic()
+
+    def record_usage(self, tokens: int) -> None:
+        """Correct the estimated tokens with what the call actually used."""
+        self.limiter._adjust(tokens - self.tokens)
+        self.tokens = tokens
+
+
+class RateLimiter:
+    """Process-wide limiter for one kind of OpenAI call.
+
+    Calls wait for quota in two token buckets (requests and tokens per
+    minute) and for a free slot under an adaptive concurrency limit. The
+    limit follows AIMD: it grows by one slot per window of successful calls
+    and is halved by a 429 (after which every caller pauses for the
+    ``Retry-After`` the API asked for) or by a call slower than
+    ``latency_target`` seconds. Calls started before a decrease do not
+    decrease it again, so a burst of 429s halves the limit once.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float,
+        tokens_per_minute: Optional[float] = None,
+        max_concurrency: int = 8,
+        min_concurrency: int = 1,
+        latency_target: Optional[float] = None,
+    ):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.latency_target = latency_target
+        self.concurrency = float(self.max_concurrency)
+        self.in_flight = 0
+        self.throttled = 0
+        self._requests = _Bucket(requests_per_minute)
+        self._tokens = _Bucket(tokens_per_minute) if tokens_per_minute else None
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, tokens: int) -> float:
+        """Take a slot and return 0, or return how long to wait before retrying."""
+        with self._lock:
+            now = time.monotonic()
+            self._requests.refill(now)
+            if self._tokens is not None:
+                self._tokens.refill(now)
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self.in_flight >= int(self.concurrency):
+                return _POLL_INTERVAL
+            wait = self._requests.wait(1)
+            if self._tokens is not None:
+                wait = max(wait, self._tokens.wait(tokens))
+            if wait > 0:
+                return wait
+            self._requests.take(1)
+            if self._tokens is not None:
+                self._tokens.take(tokens)
+            self.in_flight += 1
+            return 0.0
+
+    def _adjust(self, tokens: int) -> None:
+        if self._tokens is not None:
+            with self._lock:
+                self._tokens.take(tokens)
+
+    def _release(self, permit: Permit, error: Optional[BaseException]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.in_flight -= 1
+            rate_limited = error is not None and resilience.is_rate_limit_error(error)
+            slow = error is None and self.latency_target is not None and now - permit.started > self.latency_target
+            if rate_limited:
+                self.throttled += 1
+                pause = resilience.retry_after(error) or _DEFAULT_RETRY_AFTER
+                self._paused_until = max(self._paused_until, now + pause)
+                metrics.RATE_LIMITED.inc(limiter=self.name)
+            if rate_limited or slow:
+                if permit.started >= self._last_decrease:
+                    self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+                    self._last_decrease = now
+            elif error is None:
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+
+    def _waited(self, started: float) -> None:
+        waited = time.monotonic() - started
+        metrics.RATE_LIMITER_WAIT_SECONDS.observe(waited, limiter=self.name)
+        span = tracing.get_current_span()
+        if span is not None:
+            span.set_attribute(f"rate_limiter.{self.name}.wait_seconds", round(waited, 3))
+
+    @contextmanager
+    def limit(self, tokens: int = 0) -> Iterator[Permit]:
+        """Block until the call may start, then hold a slot for the ``with`` block."""
+        started = time.monotonic()
+        while (wait := self._try_acquire(tokens)) > 0:
+            time.sleep(wait)
+        self._waited(started)
+        permit = Permit(self, tokens)
+        try:
+            yield permit
+        except BaseException as e:
+            self._release(permit, e)
+            raise
+        self._release(permit, None)
+
+    @asynccontextmanager
+    async def alimit(self, tokens: int = 0) -> AsyncIterator[Permit]:
+        """Async :meth:`limit`: waiting does not block the event loop."""
+        started = time.monotonic()
+        while (wait := self._try_acquire(tokens)) > 0:
+            await asyncio.sleep(wait)
+        self._waited(started)
+        permit = Permit(self, tokens)
+        try:
+            yield permit
+        except BaseException as e:
+            self._release(permit, e)
+            raise
+        self._release(permit, None)
+
+    def concurrency_limit(self) -> int:
+        """Calls allowed at once right now, as AIMD has set the limit. Pools
+        that queue their own work size themselves by it, so a decrease also
+        holds back work that has not reached :meth:`limit` yet."""
+        with self._lock:
+            return int(self.concurrency)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "concurrency": round(self.concurrency, 2),
+                "in_flight": self.in_flight,
+                "throttled": self.throttled,
+            }
+
+
+def _optional_float(name: str, default: Optional[str]) -> Optional[float]:
+    value = os.environ.get(name, default)
+    return float(value) if value else None
+
+
+def _limiter_from_env(name: str) -> RateLimiter:
+    prefix = f"OPENAI_{name.upper()}"
+    defaults = {
+        "chat": ("500", "300000", "16", None),
+        "tts": ("500", "100000", "8", "30"),
+    }
+    rpm, tpm, concurrency, latency = defaults.get(name, defaults["chat"])
+    return RateLimiter(
+        name,
+        requests_per_minute=float(os.environ.get(f"{prefix}_RPM", rpm)),
+        tokens_per_minute=_optional_float(f"{prefix}_TPM", tpm),
+        max_concurrency=int(os.environ.get(f"{prefix}_MAX_CONCURRENCY", concurrency)),
+        latency_target=_optional_float(f"{prefix}_LATENCY_TARGET", latency),
+    )
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str) -> RateLimiter:
+    """Return the process-wide limiter ``name`` (``chat`` or ``tts``),
+    configured from ``OPENAI_<NAME>_RPM``, ``_TPM``, ``_MAX_CONCURRENCY`` and
+    ``_LATENCY_TARGET``."""
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = _limiter_from_env(name)
+        return _limiters[name]
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    """Current concurrency limit, calls in flight and 429s of every limiter."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
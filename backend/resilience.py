@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+_tracer = tracing.get_tracer(__name__)
+
+# Statuses worth retrying: timeouts, conflicts, throttling and server errors
+_RETRYABLE_STATUSES = {408, 409, 429}
+# Transport errors of the openai SDK and httpx, matched by name so neither
+# has to be imported here
+_RETRYABLE_NAMES = {
+    "APIConnectionError",
+    "APITimeoutError",
+    "ConnectError",
+    "ConnectTimeout",
+    "ReadError",
+    "ReadTimeout",
+    "RemoteProtocolError",
+    "WriteTimeout",
+    "PoolTimeout",
+}
+
+Retryable = Callable[[BaseException], bool]
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that keeps failing."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether ``error`` is transient: throttling, a timeout, a dropped
+    connection or a server error. Bad requests, auth errors and bad model
+    output are fatal: trying again cannot fix them."""
+    if isinstance(error, CircuitOpenError):
+        return False
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status in _RETRYABLE_STATUSES or status >= 500
+    if isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    return type(error).__name__ in _RETRYABLE_NAMES
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Whether ``error`` is OpenAI's 429, raised directly or through langchain."""
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the server asked to wait before retrying, if it said."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        value = headers.get("retry-after-ms")
+        if value is not None:
+            return float(value) / 1000
+        value = headers.get("retry-after")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Exponential backoff with full jitter, never shorter than Retry-After."""
+
+    max_attempts: int = int(os.environ.get("RETRY_MAX_ATTEMPTS", "3"))
+    base_delay: float = float(os.environ.get("RETRY_BASE_DELAY", "1.0"))
+    max_delay: float = float(os.environ.get("RETRY_MAX_DELAY", "30.0"))
+
+    def delay(self, attempt: int, error: BaseException) -> float:
+        """Seconds to wait after failed ``attempt`` (1-based)."""
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        return max(backoff, min(retry_after(error) or 0.0, self.max_delay))
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+
+class CircuitBreaker:
+    """Fail fast while an upstream is down.
+
+    ``failure_threshold`` transient failures in a row open the circuit: calls
+    raise :class:`CircuitOpenError` at once for ``recovery_timeout`` seconds.
+    Then a single probe call goes through; its success closes the circuit,
+    its failure opens it again. 429s do not count: a throttling upstream is
+    up, and the rate limiter handles it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.recovery_timeout:
+                return "half-open"
+            return "open"
+
+    def before_call(self) -> bool:
+        """Raise :class:`CircuitOpenError` if the call may not go through;
+        otherwise return whether it is the half-open probe."""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if time.monotonic() - self._opened_at < self.recovery_timeout or self._probing:
+                raise CircuitOpenError(f"Circuit {self.name!r} open: upstream failing, not calling it")
+            self._probing = True
+            return True
+
+    def abort_probe(self) -> None:
+        """The probe was cancelled before the upstream answered: count it as
+        failed, so the circuit opens again instead of waiting for a probe
+        that will never finish."""
+        with self._lock:
+            if self._probing:
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self, error: BaseException) -> None:
+        if not is_retryable(error) or is_rate_limit_error(error):
+            # The upstream answered, so it is up
+            self.record_success()
+            return
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    logger.error("Circuito %s aberto após %d falhas: %s", self.name, self.failures, error)
+                    metrics.CIRCUIT_OPENED.inc(breaker=self.name)
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self.failures}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Return the process-wide circuit breaker of upstream ``name`` (``chat``
+    or ``tts``), configured from ``CIRCUIT_FAILURE_THRESHOLD`` and
+    ``CIRCUIT_RECOVERY_TIMEOUT``."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", "5")),
+                recovery_timeout=float(os.environ.get("CIRCUIT_RECOVERY_TIMEOUT", "30")),
+            )
+        return _breakers[name]
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    """State of every circuit breaker, for monitoring."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
+
+
+def _should_retry(
+    operation: str, attempt: int, policy: RetryPolicy, error: Exception, retryable: Optional[Retryable]
+) -> bool:
+    if attempt >= policy.max_attempts or not (retryable or is_retryable)(error):
+        return False
+    logger.warning("%s: tentativa %d/%d falhou: %s", operation, attempt, policy.max_attempts, error)
+    metrics.RETRIES.inc(operation=operation)
+    return True
+
+
+def call(
+    fn: Callable[[], Any],
+    operation: str,
+    upstream: Optional[str] = None,
+    policy: RetryPolicy = DEFAULT_POLICY,
+    retryable: Optional[Retryable] = None,
+) -> Any:
+    """Run ``fn`` with retries and, for calls to ``upstream``, its circuit breaker.
+
+    Only errors ``retryable`` (default :func:`is_retryable`) accepts are
+    retried; the last error is re-raised. Each attempt is a trace span named
+    ``<operation>.attempt``.
+    """
+    breaker = get_breaker(upstream) if upstream else None
+    attempt = 0
+    while True:
+        attempt += 1
+        probe = False
+        try:
+            with _tracer.start_as_current_span(f"{operation}.attempt", attributes={"attempt": attempt}):
+                if breaker is not None:
+                    probe = breaker.before_call()
+                result = fn()
+        except Exception as e:
+            if breaker is not None and not isinstance(e, CircuitOpenError):
+                breaker.record_failure(e)
+            if not _should_retry(operation, attempt, policy, e, retryable):
+                raise
+            time.sleep(policy.delay(attempt, e))
+            continue
+        except BaseException:
+            # Cancellation or interpreter exit: a probe must not stay in flight
+            if probe:
+                breaker.abort_probe()
+            raise
+        if breaker is not None:
+            breaker.record_success()
+        return result
+
+
+async def acall(
+    fn: Callable[[], Awaitable[Any]],
+    operation: str,
+    upstream: Optional[str] = None,
+    policy: RetryPolicy = DEFAULT_POLICY,
+    retryable: Optional[Retryable] = None,
+) -> Any:
+    """Async :func:`call`; ``fn`` returns a new awaitable per attempt."""
+    breaker = get_breaker(upstream) if upstream else None
+    attempt = 0
+    while True:
+        attempt += 1
+        probe = False
+        try:
+            with _tracer.start_as_current_span(f"{operation}.attempt", attributes={"attempt": attempt}):
+                if breaker is not None:
+                    probe = breaker.before_call()
+                result = await fn()
+        except Exception as e:
+            if breaker is not None and not isinstance(e, CircuitOpenError):
+                breaker.record_failure(e)
+            if not _should_retry(operation, attempt, policy, e, retryable):
+                raise
+            await asyncio.sleep(policy.delay(attempt, e))
+            continue
+        except BaseException:
+            # Cancelled (wait_for timeout, client gone): a probe must not
+            # stay in flight
+            if probe:
+                breaker.abort_probe()
+            raise
+        if breaker is not None:
+            breaker.record_success()
+        return result
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from typing import List
+
+from pydantic import BaseModel
+
+
+class Module(BaseModel):
+    title: str
+    lessons: List[str]
+
+
+class CourseContent(BaseModel):
+    modules: List[Module]
+
+
+class Flashcard(BaseModel):
+    question: str
+    answer: str
+
+
+class FlashcardSet(BaseModel):
+    flashcards: List[Flashcard]
+
+
+class QuizQuestion(BaseModel):
+    question: str
+    question_type: str
+    options: List[str]
+    correct_answer: str
+
+
+class Quiz(BaseModel):
+    questions: List[QuizQuestion]
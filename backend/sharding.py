@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import metrics
+import resilience
+import tracing
+
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_SHARD_RETRIES = 2
+
+logger = logging.getLogger(__name__)
+
+
+def split_modules(course_content: dict, modules_per_shard: int) -> List[dict]:
+    """Split ``course_content["modules"]`` into course dicts of at most
+    ``modules_per_shard`` modules each, keeping every other top-level key."""
+    if modules_per_shard < 1:
+        raise ValueError("modules_per_shard must be at least 1")
+    modules = course_content.get("modules") or []
+    return [
+        {**course_content, "modules": modules[start:start + modules_per_shard]}
+        for start in range(0, len(modules), modules_per_shard)
+    ]
+
+
+ShardCallback = Callable[[int, dict], None]
+
+
+def _policy(retries: int) -> resilience.RetryPolicy:
+    return resilience.RetryPolicy(max_attempts=retries + 1)
+
+
+def _retry_shard(error: BaseException) -> bool:
+    """Only bad model output is worth another shard attempt: a new sample
+    may parse, while API errors were already retried by the call itself."""
+    return isinstance(error, ValueError)
+
+
+def _run_shard(
+    generate: Callable[[dict], dict],
+    index: int,
+    shard: dict,
+    retries: int,
+    on_shard: Optional[ShardCallback],
+) -> Tuple[dict | None, Exception | None]:
+    try:
+        result = resilience.call(
+            lambda: generate(shard), "shard", policy=_policy(retries), retryable=_retry_shard
+        )
+        if on_shard is not None:
+            on_shard(index, result)
+        return result, None
+    except Exception as e:
+        logger.warning("Shard %d falhou: %s", index, e)
+        metrics.ERRORS.inc(component="shard")
+        return None, e
+
+
+def generate_sharded(
+    shards: List[dict],
+    generate: Callable[[dict], dict],
+    items_key: str,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    retries: int = DEFAULT_SHARD_RETRIES,
+    on_shard: Optional[ShardCallback] = None,
+) -> Dict[str, Any]:
+    """Run ``generate`` on every shard concurrently and merge the results.
+
+    ``items_key`` lists are concatenated in shard (module) order, so the
+    output does not depend on which shard finished first. Each shard is
+    retried on its own when the model output is unusable; shards that still
+    fail are reported under ``failed_shards`` and only a failure of every
+    shard raises.
+    ``on_shard(index, result)`` is called as soon as each shard succeeds.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(shards)))) as executor:
+        outcomes = list(executor.map(
+            tracing.bind(lambda item: _run_shard(generate, item[0], item[1], retries, on_shard)),
+            enumerate(shards),
+        ))
+
+    return _merge(shards, outcomes, items_key)
+
+
+async def _arun_shard(
+    agenerate: Callable[[dict], Awaitable[dict]],
+    index: int,
+    shard: dict,
+    retries: int,
+    on_shard: Optional[ShardCallback],
+) -> Tuple[dict | None, Exception | None]:
+    try:
+        result = await resilience.acall(
+            lambda: agenerate(shard), "shard", policy=_policy(retries), retryable=_retry_shard
+        )
+        if on_shard is not None:
+            on_shard(index, result)
+        return result, None
+    except Exception as e:
+        logger.warning("Shard %d falhou: %s", index, e)
+        metrics.ERRORS.inc(component="shard")
+        return None, e
+
+
+async def agenerate_sharded(
+    shards: List[dict],
+    agenerate: Callable[[dict], Awaitable[dict]],
+    items_key: str,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    retries: int = DEFAULT_SHARD_RETRIES,
+    on_shard: Optional[ShardCallback] = None,
+) -> Dict[str, Any]:
+    """Async :func:`generate_sharded`, bounded by a semaphore instead of a
+    thread pool."""
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(index: int, shard: dict) -> Tuple[dict | None, Exception | None]:
+        async with semaphore:
+            return await _arun_shard(agenerate, index, shard, retries, on_shard)
+
+    outcomes = await asyncio.gather(*(run(index, shard) for index, shard in enumerate(shards)))
+    return _merge(shards, list(outcomes), items_key)
+
+
+def _merge(
+    shards: List[dict], outcomes: List[Tuple[dict | None, Exception | None]], items_key: str
+) -> Dict[str, Any]:
+    merged: Dict[str, Any] = {items_key: []}
+    failed = []
+    for index, (shard, (result, error)) in enumerate(zip(shards, outcomes)):
+        if error is not None:
+            failed.append({
+                "shard": index,
+                "modules": [
+                    module.get("title") if isinstance(module, dict) else module
+                    for module in shard["modules"]
+                ],
+                "error": str(error),
+            })
+            continue
+        merged[items_key].extend(result.get(items_key, []))
+
+    if shards and len(failed) == len(shards):
+        raise outcomes[-1][1]
+    if failed:
+        merged["failed_shards"] = failed
+    return merged
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+import metrics
+
+
+def normalize_text(text: str) -> str:
+    """Case- and whitespace-insensitive form of a free-text parameter."""
+    return " ".join(text.split()).casefold()
+
+
+def make_key(*parts: Any) -> str:
+    """Key identifying a request by its (already normalized) parameters."""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that would compute the same thing.
+
+    The first caller for a key runs the computation; callers arriving while
+    it is in flight wait for it and receive a copy of its result (or its
+    exception) instead of starting their own. Nothing is kept once the call
+    finishes: this is deduplication of in-flight work, not a cache.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._futures: Dict[str, Future] = {}
+        self._tasks: Dict[Tuple[int, str], asyncio.Task] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run ``fn`` unless an identical call is already running in a thread."""
+        with self._lock:
+            self.calls += 1
+            future = self._futures.get(key)
+            leader = future is None
+            if leader:
+                future = self._futures[key] = Future()
+            else:
+                self.coalesced += 1
+        metrics.COALESCED_CALLS.inc(group=self.name, role="leader" if leader else "coalesced")
+
+        if not leader:
+            return copy.deepcopy(future.result())
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._futures[key]
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async :meth:`do` for calls on the same event loop."""
+        loop_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            self.calls += 1
+            task = self._tasks.get(loop_key)
+            leader = task is None
+            if leader:
+                task = self._tasks[loop_key] = asyncio.ensure_future(fn())
+                task.add_done_callback(lambda _: self._forget(loop_key))
+            else:
+                self.coalesced += 1
+        metrics.COALESCED_CALLS.inc(group=self.name, role="leader" if leader else "coalesced")
+
+        # Shielded so a cancelled caller does not cancel the shared call
+        result = await asyncio.shield(task)
+        return result if leader else copy.deepcopy(result)
+
+    def _forget(self, loop_key: Tuple[int, str]) -> None:
+        with self._lock:
+            self._tasks.pop(loop_key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            in_flight = len(self._futures) + len(self._tasks)
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": in_flight}
+
+
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+
+def group(name: str) -> SingleFlight:
+    """Return the process-wide coalescing group ``name``."""
+    with _groups_lock:
+        if name not in _groups:
+            _groups[name] = SingleFlight(name)
+        return _groups[name]
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    """Calls and coalesced calls of every group, for monitoring."""
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {flight.name: flight.stats() for flight in groups}
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from typing import Any, Dict, List, Tuple, Type
+
+from pydantic import BaseModel
+
+import agent_registry
+import metrics
+from json_repair import loads_lenient
+from json_stream import ArrayItemParser
+
+REPAIR_MODEL = os.environ.get("REPAIR_MODEL", "gpt-4o-mini")
+MAX_REPAIR_ATTEMPTS = 2
+MAX_REPAIRED_FRAGMENTS = 5
+
+logger = logging.getLogger(__name__)
+
+# Model families that accept response_format={"type": "json_schema"}
+_JSON_SCHEMA_PREFIXES = ("gpt-4o", "gpt-4.1", "gpt-5", "o1", "o3", "o4")
+# Older models that only accept response_format={"type": "json_object"}
+_JSON_OBJECT_PREFIXES = ("gpt-4-turbo", "gpt-4-1106", "gpt-4-0125", "gpt-3.5-turbo")
+
+
+def _strict_schema(schema: Any) -> Any:
+    """Make a Pydantic JSON schema acceptable for OpenAI strict mode: every
+    object closed to extra keys and every property required."""
+    if isinstance(schema, dict):
+        schema = {key: _strict_schema(value) for key, value in schema.items()}
+        if schema.get("type") == "object" and "properties" in schema:
+            schema["additionalProperties"] = False
+            schema["required"] = list(schema["properties"])
+        return schema
+    if isinstance(schema, list):
+        return [_strict_schema(value) for value in schema]
+    return schema
+
+
+def response_format(schema: Type[BaseModel], model: str) -> Dict[str, Any] | None:
+    """The strongest ``response_format`` ``model`` supports for ``schema``."""
+    if model.startswith(_JSON_SCHEMA_PREFIXES):
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": schema.__name__,
+                "schema": _strict_schema(schema.model_json_schema()),
+                "strict": True,
+            },
+        }
+    if model.startswith(_JSON_OBJECT_PREFIXES):
+        return {"type": "json_object"}
+    return None
+
+
+def bind_schema(llm: Any, schema: Type[BaseModel]) -> Any:
+    """Constrain ``llm`` to emit ``schema`` when the model supports it."""
+    model = getattr(llm, "model_name", "")
+    fmt = response_format(schema, model)
+    if fmt is None:
+        logger.warning("%s não aceita response_format: %s só é validado depois da geração", model, schema.__name__)
+        return llm
+    return llm.bind(response_format=fmt)
+
+
+def _items_field(schema: Type[BaseModel]) -> Tuple[str, Type[BaseModel]]:
+    """Name and item model of the single list field of ``schema``."""
+    name, field = next(iter(schema.model_fields.items()))
+    return name, field.annotation.__args__[0]
+
+
+def _repair_graph(item_model: Type[BaseModel]) -> Any:
+    """Process-wide graph sending one message to ``REPAIR_MODEL``, bound to
+    ``item_model`` when the model supports it."""
+
+    def build(llm: Any) -> Any:
+        from langchain_core.runnables import RunnableLambda
+
+        bound = bind_schema(llm, item_model)
+        return RunnableLambda(lambda messages: [bound.invoke(messages)])
+
+    return agent_registry.get_graph(f"repair_{item_model.__name__}", build, REPAIR_MODEL)
+
+
+def _repair_fragment(fragment: str, item_model: Type[BaseModel], error: str) -> Dict[str, Any]:
+    """Ask a small model to fix one broken item; only the fragment is sent.
+
+    The call goes through :func:`agent_registry.complete`, so it shares the
+    ``chat`` rate limiter, retries and circuit breaker of the agents.
+    """
+    prompt = (
+        "O fragmento JSON abaixo deveria ser um objeto com o schema:\n"
+        f"{json.dumps(item_model.model_json_schema(), ensure_ascii=False)}\n"
+        f"Erro encontrado: {error}\n"
+        f"Fragmento:\n{fragment}\n"
+        "Responda SOMENTE com o objeto JSON corrigido, mantendo o conteúdo original."
+    )
+    response = agent_registry.complete(_repair_graph(item_model), prompt)
+    return item_model.model_validate(loads_lenient(response)).model_dump()
+
+
+def _parse_fragment(fragment: str, item_model: Type[BaseModel], budget: List[int]) -> Dict[str, Any] | None:
+    try:
+        return item_model.model_validate(loads_lenient(fragment)).model_dump()
+    except ValueError as e:
+        error = str(e)
+    if budget[0] <= 0:
+        return None
+    budget[0] -= 1
+    for attempt in range(MAX_REPAIR_ATTEMPTS):
+        metrics.RETRIES.inc(operation="repair")
+        try:
+            return _repair_fragment(fragment, item_model, error)
+        except ValueError as e:
+            error = str(e)
+            logger.warning("Reparo do fragmento falhou (tentativa %d/%d): %s", attempt + 1, MAX_REPAIR_ATTEMPTS, e)
+        except Exception as e:
+            # API errors were already retried by the call itself
+            logger.warning("Reparo do fragmento falhou: %s", e)
+            return None
+    return None
+
+
+def parse_response(response: str, schema: Type[BaseModel]) -> Dict[str, Any]:
+    """Parse and validate a model response against ``schema``.
+
+    Well-formed responses cost nothing extra. Otherwise the response is split
+    into its list items: valid ones are kept, and at most
+    ``MAX_REPAIRED_FRAGMENTS`` broken ones are sent, alone, to a cheap repair
+    model (``MAX_REPAIR_ATTEMPTS`` tries each) instead of regenerating the
+    whole document. Items that cannot be repaired are dropped. Raises
+    ``ValueError`` if nothing usable can be recovered.
+    """
+    try:
+        return schema.model_validate(loads_lenient(response)).model_dump()
+    except ValueError as e:
+        original_error = e
+
+    items_key, item_model = _items_field(schema)
+    fragments = ArrayItemParser(items_key, raw=True).feed(response)
+    if not fragments:
+        raise original_error
+
+    budget = [MAX_REPAIRED_FRAGMENTS]
+    items = []
+    for fragment in fragments:
+        item = _parse_fragment(fragment, item_model, budget)
+        if item is None:
+            logger.warning("Item descartado após reparo: %s...", fragment[:80])
+            metrics.ERRORS.inc(component="structured_output")
+            continue
+        items.append(item)
+
+    if not items:
+        raise original_error
+    return {items_key: items}
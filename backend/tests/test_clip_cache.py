@@ -0,0 +1,66 @@
+import os
+
+import metrics
+from clip_cache import ClipCache
+
+
+def write(path, size):
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    return str(path)
+
+
+def test_overwriting_a_clip_does_not_count_it_twice(tmp_path):
+    cache = ClipCache(str(tmp_path / "cache"), max_bytes=2500)
+    clip = write(tmp_path / "clip.mp3", 1000)
+    for _ in range(5):
+        cache.put("same", clip)
+    cache.put("other", clip)
+    assert cache.stats()["bytes"] == 2000
+    destination = str(tmp_path / "out.mp3")
+    assert cache.get("same", destination)
+    assert cache.get("other", destination)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ClipCache(str(tmp_path / "cache"), max_bytes=2500)
+    clip = write(tmp_path / "clip.mp3", 1000)
+    cache.put("a", clip)
+    cache.put("b", clip)
+    old = os.path.join(cache.directory, "a.mp3")
+    os.utime(old, (1, 1))
+    cache.put("c", clip)
+    destination = str(tmp_path / "out.mp3")
+    assert not cache.get("a", destination)
+    assert cache.get("b", destination) and cache.get("c", destination)
+
+
+def test_persist_only_after_writes_and_refresh_is_throttled(tmp_path):
+    calls = []
+    cache = ClipCache(
+        str(tmp_path / "cache"),
+        persist=lambda: calls.append("persist"),
+        refresh=lambda: calls.append("refresh"),
+        refresh_interval=3600,
+    )
+    cache.persist()
+    cache.put("a", write(tmp_path / "clip.mp3", 10))
+    cache.persist()
+    cache.persist()
+    cache.refresh()
+    assert calls == ["persist"]
+
+
+def test_stats_are_exported_as_gauges(tmp_path):
+    cache = ClipCache(str(tmp_path / "cache"))
+    cache.put("a", write(tmp_path / "clip.mp3", 1000))
+    destination = str(tmp_path / "out.mp3")
+    cache.get("a", destination)
+    cache.get("a", destination)
+    cache.get("a", destination)
+    cache.get("missing", destination)
+
+    cache.record_stats()
+    assert metrics.TTS_CACHE_BYTES.value() == 1000
+    assert metrics.TTS_CACHE_HIT_RATIO.value() == 0.75
+    assert "tts_cache_hit_ratio 0.75" in metrics.render()
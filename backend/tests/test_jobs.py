@@ -0,0 +1,92 @@
+import pytest
+
+import jobs
+
+
+@pytest.fixture(autouse=True)
+def store():
+    store = jobs.MemoryJobStore()
+    jobs.set_store(store)
+    yield store
+    jobs.set_store(None)
+
+
+def no_dispatch(job_id, kind, payload):
+    pass
+
+
+def test_same_idempotency_key_returns_the_same_job(store):
+    first, created = jobs.submit("podcast", {}, idempotency_key="k", dispatch=no_dispatch)
+    again, created_again = jobs.submit("podcast", {}, idempotency_key="k", dispatch=no_dispatch)
+    assert created and not created_again
+    assert again.id == first.id
+
+
+def test_keys_are_scoped_by_kind(store):
+    podcast, _ = jobs.submit("podcast", {}, idempotency_key="k", dispatch=no_dispatch)
+    package, created = jobs.submit("course_package", {}, idempotency_key="k", dispatch=no_dispatch)
+    assert created and package.id != podcast.id
+
+
+def test_finished_job_is_returned_for_its_key(store):
+    job, _ = jobs.submit("podcast", {}, idempotency_key="k", dispatch=no_dispatch)
+    store.update(job.id, status=jobs.SUCCEEDED, result={"audio_path": "a.mp3"})
+    again, created = jobs.submit("podcast", {}, idempotency_key="k", dispatch=no_dispatch)
+    assert not created and again.id == job.id
+
+
+def test_failed_job_is_replaced_on_resubmit(store):
+    failed, _ = jobs.submit("podcast", {}, idempotency_key="k", dispatch=no_dispatch)
+    store.update(failed.id, status=jobs.FAILED, error="boom")
+    retry, created = jobs.submit("podcast", {}, idempotency_key="k", dispatch=no_dispatch)
+    assert created and retry.id != failed.id
+    assert jobs.submit("podcast", {}, idempotency_key="k", dispatch=no_dispatch)[0].id == retry.id
+    assert store.get(failed.id).status == jobs.FAILED
+
+
+def test_dispatch_failure_marks_the_job_failed(store):
+    def broken(job_id, kind, payload):
+        raise RuntimeError("spawn failed")
+
+    with pytest.raises(RuntimeError):
+        jobs.submit("podcast", {}, idempotency_key="k", dispatch=broken)
+
+    job = next(iter(store._jobs.values()))
+    assert job.status == jobs.FAILED
+    assert job.error == "spawn failed"
+    # The key is free again, so the client can retry
+    _, created = jobs.submit("podcast", {}, idempotency_key="k", dispatch=no_dispatch)
+    assert created
+
+
+def test_unknown_kind_is_rejected():
+    with pytest.raises(ValueError):
+        jobs.submit("video", {}, dispatch=no_dispatch)
+
+
+def test_run_records_progress_and_result(store, monkeypatch):
+    def runner(job_id, payload, progress, output_dir):
+        progress(0.5)
+        assert store.get(job_id).progress == 50
+        return {"ok": True}
+
+    monkeypatch.setitem(jobs.RUNNERS, "podcast", runner)
+    persisted = []
+    job, _ = jobs.submit("podcast", {}, dispatch=no_dispatch)
+    jobs.run(job.id, "podcast", {}, persist=lambda: persisted.append(True))
+
+    done = store.get(job.id)
+    assert (done.status, done.progress, done.result) == (jobs.SUCCEEDED, 100, {"ok": True})
+    assert persisted == [True]
+
+
+def test_run_records_failures(store, monkeypatch):
+    def runner(job_id, payload, progress, output_dir):
+        raise ValueError("bad payload")
+
+    monkeypatch.setitem(jobs.RUNNERS, "podcast", runner)
+    job, _ = jobs.submit("podcast", {}, dispatch=no_dispatch)
+    jobs.run(job.id, "podcast", {})
+
+    failed = store.get(job.id)
+    assert (failed.status, failed.error) == (jobs.FAILED, "bad payload")
@@ -0,0 +1,48 @@
+import json
+import time
+
+import pytest
+
+from json_repair import loads_lenient, repair_json
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"a": 1,}', {"a": 1}),
+    ("{'a': 'b'}", {"a": "b"}),
+    ('{"a": True, "b": None, "c": False}', {"a": True, "b": None, "c": False}),
+    ('{a: 1}', {"a": 1}),
+    ('{"a": "linha\nquebrada"}', {"a": "linha\nquebrada"}),
+    ('{"a": "ele disse "oi" e saiu"}', {"a": 'ele disse "oi" e saiu'}),
+    ('{"a": "d\'água"}', {"a": "d'água"}),
+    ('{"a": [1, 2}', {"a": [1, 2]}),
+    ('Resposta:\n```json\n{"a": 1}\n```', {"a": 1}),
+])
+def test_repairs_common_model_mistakes(text, expected):
+    assert json.loads(repair_json(text)) == expected
+
+
+def test_truncated_output_keeps_the_complete_elements():
+    text = '{"modules": [{"title": "M1"}, {"title": "M2"}, {"title": "M'
+    assert json.loads(repair_json(text)) == {"modules": [{"title": "M1"}, {"title": "M2"}]}
+
+
+def test_valid_json_is_left_alone():
+    text = json.dumps({"a": [1, 2.5, -3e2], "b": {"c": "x \\ y"}})
+    assert json.loads(repair_json(text)) == json.loads(text)
+
+
+def test_loads_lenient_raises_when_nothing_can_be_recovered():
+    with pytest.raises(json.JSONDecodeError):
+        loads_lenient("sem json aqui")
+
+
+def test_runtime_is_linear():
+    def elapsed(items):
+        text = "{'items': [" + ",".join("{'q': 'a \"b\" c',}" for _ in range(items)) + ",]}"
+        start = time.perf_counter()
+        assert len(json.loads(repair_json(text))["items"]) == items
+        return time.perf_counter() - start
+
+    small, large = elapsed(2000), elapsed(20000)
+    # Ten times the input: a quadratic repair would take ~100 times longer
+    assert large < small * 30
@@ -0,0 +1,47 @@
+import json
+
+from json_stream import ArrayItemParser, iter_array_items
+
+DOCUMENT = json.dumps({
+    "title": "Curso {com} [chaves]",
+    "modules": [
+        {"title": "Módulo 1", "lessons": ["a", "b"]},
+        {"title": 'Com "aspas" e \\ barra', "lessons": []},
+        {"title": "Aninhado", "meta": {"modules": [{"x": 1}]}},
+    ],
+    "other": [{"ignored": True}],
+}, ensure_ascii=False)
+
+
+def test_items_arrive_when_their_brace_closes():
+    parser = ArrayItemParser("modules")
+    first_end = DOCUMENT.index('"b"]}') + len('"b"]}')
+    assert parser.feed(DOCUMENT[:first_end - 1]) == []
+    assert parser.feed(DOCUMENT[first_end - 1:first_end]) == [{"title": "Módulo 1", "lessons": ["a", "b"]}]
+
+
+def test_result_does_not_depend_on_chunking():
+    expected = json.loads(DOCUMENT)["modules"]
+    for size in (1, 2, 7, 64, len(DOCUMENT)):
+        chunks = [DOCUMENT[i:i + size] for i in range(0, len(DOCUMENT), size)]
+        assert list(iter_array_items(chunks, "modules")) == expected
+
+
+def test_only_the_requested_top_level_array():
+    assert list(iter_array_items([DOCUMENT], "other")) == [{"ignored": True}]
+    assert list(iter_array_items([DOCUMENT], "missing")) == []
+
+
+def test_preamble_and_code_fences_are_ignored():
+    text = 'Aqui está: ```json\n{"questions": [{"q": 1}, {"q": 2}]}\n```'
+    assert list(iter_array_items([text], "questions")) == [{"q": 1}, {"q": 2}]
+
+
+def test_raw_returns_the_source_text():
+    text = '{"flashcards": [{"question": "a",}]}'
+    assert ArrayItemParser("flashcards", raw=True).feed(text) == ['{"question": "a",}']
+
+
+def test_almost_json_items_are_repaired():
+    text = "{\"flashcards\": [{'question': 'O que é?', 'answer': 'Isto',}]}"
+    assert ArrayItemParser("flashcards").feed(text) == [{"question": "O que é?", "answer": "Isto"}]
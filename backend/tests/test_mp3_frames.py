@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+import mp3_frames
+from mp3_frames import FrameFormat, Mp3FormatError, concatenate, parse, silence
+
+# MPEG-2, 24 kHz, mono, 64 kbps: what the TTS returns, 192-byte frames
+TTS = FrameFormat(2, 1, 3, 8)
+FRAME_SECONDS = 576 / 24000
+
+
+def id3_tag():
+    return b"ID3\x03\x00\x00\x00\x00\x00\x0a" + b"\x00" * 10
+
+
+def info_frame(fmt):
+    frame = bytearray(silence(fmt, 1000)[:mp3_frames._frame_length(fmt)])
+    offset = 4 + fmt.side_info_size
+    frame[offset:offset + 4] = b"Xing"
+    return bytes(frame)
+
+
+def write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def test_silence_is_whole_frames():
+    data = silence(TTS, 1000)
+    fmt, spans, count = parse(data)
+    assert fmt == TTS
+    assert count == round(1 / FRAME_SECONDS) == 42
+    assert spans == [(0, len(data))]
+    assert len(data) == 42 * 192
+
+
+def test_parse_skips_tags_and_the_info_frame():
+    audio = silence(TTS, 500)
+    data = id3_tag() + info_frame(TTS) + audio + b"TAG" + b"\x00" * 125
+    _, spans, count = parse(data)
+    assert count == len(audio) // 192
+    assert [data[start:end] for start, end in spans] == [audio]
+
+
+def test_parse_rejects_data_without_frames():
+    with pytest.raises(Mp3FormatError):
+        parse(b"\x00" * 1000)
+
+
+def test_concatenate_joins_frames_with_a_gap(tmp_path):
+    first = write(tmp_path / "a.mp3", id3_tag() + info_frame(TTS) + silence(TTS, 1000))
+    second = write(tmp_path / "b.mp3", silence(TTS, 500))
+    output = str(tmp_path / "out.mp3")
+
+    # 288 ms is exactly 12 frames
+    duration = concatenate([first, second], output, gap_ms=288)
+
+    with open(output, "rb") as f:
+        data = f.read()
+    _, spans, count = parse(data)
+    # Nothing but the audio frames of both clips and the gap in the output
+    assert count == 42 + 12 + 21
+    assert duration == pytest.approx(count * FRAME_SECONDS)
+    assert spans == [(0, len(data))]
+    assert not data.startswith(b"ID3") and b"Xing" not in data
+
+
+def test_bitrates_may_differ_between_clips(tmp_path):
+    first = write(tmp_path / "a.mp3", silence(TTS, 192))
+    second = write(tmp_path / "b.mp3", silence(FrameFormat(2, 1, 3, 12), 192))
+    assert concatenate([first, second], str(tmp_path / "out.mp3")) == pytest.approx(16 * FRAME_SECONDS)
+
+
+def test_incompatible_clips_write_nothing(tmp_path):
+    first = write(tmp_path / "a.mp3", silence(TTS, 200))
+    stereo = write(tmp_path / "b.mp3", silence(FrameFormat(2, 1, 0, 8), 200))
+    output = str(tmp_path / "out.mp3")
+
+    with pytest.raises(Mp3FormatError):
+        concatenate([first, stereo], output)
+    assert set(os.listdir(tmp_path)) == {"a.mp3", "b.mp3"}
+
+
+def test_invalid_clip_writes_nothing(tmp_path):
+    first = write(tmp_path / "a.mp3", silence(TTS, 200))
+    broken = write(tmp_path / "b.mp3", b"not an mp3")
+    output = str(tmp_path / "out.mp3")
+
+    with pytest.raises(Mp3FormatError):
+        concatenate([first, broken], output)
+    assert set(os.listdir(tmp_path)) == {"a.mp3", "b.mp3"}
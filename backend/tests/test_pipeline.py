@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from pipeline import Stage, arun_pipeline, run_pipeline
+
+
+def test_independent_stages_run_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def branch(name):
+        def run(inputs):
+            # Only passes if the other branch is running at the same time
+            barrier.wait()
+            return f"{name}({inputs['course']})"
+        return run
+
+    results, timings = run_pipeline([
+        Stage("course", lambda inputs: "c"),
+        Stage("flashcards", branch("f"), ("course",)),
+        Stage("quiz", branch("q"), ("course",)),
+    ])
+
+    assert results == {"course": "c", "flashcards": "f(c)", "quiz": "q(c)"}
+    assert set(timings) == {"course", "flashcards", "quiz", "total"}
+
+
+def test_on_complete_sees_each_stage():
+    finished = []
+    run_pipeline(
+        [Stage("a", lambda inputs: 1), Stage("b", lambda inputs: inputs["a"] + 1, ("a",))],
+        on_complete=lambda name, result: finished.append((name, result)),
+    )
+    assert finished == [("a", 1), ("b", 2)]
+
+
+def test_failure_propagates_without_waiting_and_cancels_pending_stages():
+    release = threading.Event()
+    started = []
+
+    def slow(inputs):
+        release.wait(5)
+
+    def fail(inputs):
+        raise RuntimeError("boom")
+
+    def never(inputs):
+        started.append("never")
+
+    begin = time.perf_counter()
+    with pytest.raises(RuntimeError, match="boom"):
+        run_pipeline(
+            [Stage("slow", slow), Stage("fail", fail), Stage("after", never, ("fail",))],
+            max_workers=2,
+        )
+    elapsed = time.perf_counter() - begin
+    release.set()
+
+    assert elapsed < 1
+    assert started == []
+
+
+def test_queued_stages_are_cancelled_when_one_fails():
+    release = threading.Event()
+    started = []
+
+    def fail(inputs):
+        time.sleep(0.05)
+        raise RuntimeError("boom")
+
+    def next_in_line(inputs):
+        # The worker may take it the moment the failing stage returns
+        started.append("next")
+        release.wait(5)
+
+    def queued(inputs):
+        started.append("queued")
+
+    with pytest.raises(RuntimeError):
+        run_pipeline(
+            [Stage("fail", fail), Stage("next", next_in_line), Stage("queued", queued)],
+            max_workers=1,
+        )
+    release.set()
+    time.sleep(0.05)
+    assert "queued" not in started
+
+
+def test_unknown_dependency_and_cycles_are_rejected():
+    with pytest.raises(ValueError):
+        run_pipeline([Stage("a", lambda inputs: 1, ("missing",))])
+    with pytest.raises(ValueError):
+        run_pipeline([Stage("a", lambda inputs: 1, ("b",)), Stage("b", lambda inputs: 1, ("a",))])
+
+
+def test_async_stages_run_concurrently_and_failures_cancel_the_rest():
+    cancelled = []
+
+    async def branch(inputs):
+        await asyncio.sleep(0.05)
+        return inputs["course"] + 1
+
+    async def main():
+        start = time.perf_counter()
+        results, _ = await arun_pipeline([
+            Stage("course", lambda inputs: asyncio.sleep(0, result=1)),
+            Stage("flashcards", branch, ("course",)),
+            Stage("quiz", branch, ("course",)),
+        ])
+        return results, time.perf_counter() - start
+
+    results, elapsed = asyncio.run(main())
+    assert results == {"course": 1, "flashcards": 2, "quiz": 2}
+    assert elapsed < 0.09
+
+    async def slow(inputs):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def fail(inputs):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(arun_pipeline([Stage("slow", slow), Stage("fail", fail)]))
+    assert cancelled == [True]
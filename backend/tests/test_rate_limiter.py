@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from rate_limiter import RateLimiter, estimate_tokens
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+    class response:
+        headers = {"retry-after-ms": "50"}
+
+
+@pytest.fixture
+def limiter():
+    return RateLimiter("test", requests_per_minute=60000, max_concurrency=8)
+
+
+def throttle(limiter):
+    with pytest.raises(RateLimitError):
+        with limiter.limit():
+            raise RateLimitError()
+
+
+def test_estimate_tokens_rounds_up():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcde") == 2
+
+
+def test_429_halves_the_limit_and_pauses_callers(limiter):
+    throttle(limiter)
+    assert limiter.stats() == {"concurrency": 4.0, "in_flight": 0, "throttled": 1}
+
+    started = time.monotonic()
+    with limiter.limit():
+        pass
+    assert time.monotonic() - started >= 0.04
+
+
+def test_burst_of_429s_halves_the_limit_once(limiter):
+    permits = [limiter.limit() for _ in range(3)]
+    for permit in permits:
+        permit.__enter__()
+    for permit in permits:
+        permit.__exit__(RateLimitError, RateLimitError(), None)
+    assert limiter.concurrency_limit() == 4
+
+
+def test_limit_never_drops_below_the_minimum():
+    limiter = RateLimiter("test", requests_per_minute=60000, max_concurrency=4, min_concurrency=2)
+    for _ in range(3):
+        throttle(limiter)
+        time.sleep(0.06)
+    assert limiter.concurrency_limit() == 2
+
+
+def test_successes_grow_the_limit_back(limiter):
+    throttle(limiter)
+    time.sleep(0.06)
+    # Each success adds 1/limit: about one slot per window of 4 calls
+    for _ in range(4):
+        with limiter.limit():
+            pass
+    assert limiter.concurrency_limit() == 4
+    with limiter.limit():
+        pass
+    assert limiter.concurrency_limit() == 5
+
+
+def test_slow_calls_halve_the_limit():
+    limiter = RateLimiter("test", requests_per_minute=60000, max_concurrency=8, latency_target=0.01)
+    with limiter.limit():
+        time.sleep(0.02)
+    assert limiter.concurrency_limit() == 4
+
+
+def test_other_errors_leave_the_limit_alone(limiter):
+    with pytest.raises(ValueError):
+        with limiter.limit():
+            raise ValueError()
+    assert limiter.stats() == {"concurrency": 8.0, "in_flight": 0, "throttled": 0}
+
+
+def test_concurrent_calls_stay_under_the_limit():
+    limiter = RateLimiter("test", requests_per_minute=60000, max_concurrency=3)
+    lock = threading.Lock()
+    active, peak = [0], [0]
+
+    def call():
+        with limiter.limit():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=call) for _ in range(9)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 3
+
+
+def test_async_calls_stay_under_the_limit():
+    limiter = RateLimiter("test", requests_per_minute=60000, max_concurrency=2)
+    active, peak = [0], [0]
+
+    async def call():
+        async with limiter.alimit():
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            await asyncio.sleep(0.02)
+            active[0] -= 1
+
+    async def main():
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    asyncio.run(main())
+    assert peak[0] == 2
+
+
+def test_request_bucket_spaces_out_calls():
+    # 600 per minute is 10 per second with a 100-request burst
+    limiter = RateLimiter("test", requests_per_minute=600)
+    for _ in range(100):
+        limiter._try_acquire(0)
+        limiter.in_flight = 0
+    assert limiter._try_acquire(0) > 0
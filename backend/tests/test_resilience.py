@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, RetryPolicy
+
+NO_RETRY = RetryPolicy(max_attempts=1, base_delay=0, max_delay=0)
+
+
+class ServerError(Exception):
+    status_code = 503
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60)
+    monkeypatch.setitem(resilience._breakers, "test", breaker)
+    return breaker
+
+
+def fail():
+    raise ServerError("down")
+
+
+def open_circuit(breaker):
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(ServerError):
+            resilience.call(fail, "op", upstream="test", policy=NO_RETRY)
+
+
+def expire(breaker):
+    breaker._opened_at -= breaker.recovery_timeout
+
+
+def test_opens_after_threshold_and_fails_fast(breaker):
+    open_circuit(breaker)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        resilience.call(lambda: "ok", "op", upstream="test", policy=NO_RETRY)
+
+
+def test_non_retryable_errors_do_not_open(breaker):
+    for _ in range(5):
+        with pytest.raises(ValueError):
+            resilience.call(lambda: int("x"), "op", upstream="test", policy=NO_RETRY)
+    assert breaker.state == "closed"
+
+
+def test_successful_probe_closes(breaker):
+    open_circuit(breaker)
+    expire(breaker)
+    assert breaker.state == "half-open"
+    assert resilience.call(lambda: "ok", "op", upstream="test", policy=NO_RETRY) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_failed_probe_reopens(breaker):
+    open_circuit(breaker)
+    expire(breaker)
+    with pytest.raises(ServerError):
+        resilience.call(fail, "op", upstream="test", policy=NO_RETRY)
+    assert breaker.state == "open"
+
+
+def test_only_one_probe_at_a_time(breaker):
+    open_circuit(breaker)
+    expire(breaker)
+    assert breaker.before_call() is True
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_cancelled_probe_reopens_instead_of_sticking(breaker):
+    open_circuit(breaker)
+    expire(breaker)
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    async def probe():
+        await asyncio.wait_for(resilience.acall(hang, "op", upstream="test", policy=NO_RETRY), 0.01)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(probe())
+    assert breaker.state == "open"
+    assert not breaker._probing
+
+    # Once the timeout passes again, a new probe goes through
+    expire(breaker)
+
+    async def ok():
+        return "ok"
+
+    assert asyncio.run(resilience.acall(ok, "op", upstream="test", policy=NO_RETRY)) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_retries_transient_errors():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ServerError("blip")
+        return "ok"
+
+    policy = RetryPolicy(max_attempts=3, base_delay=0, max_delay=0)
+    assert resilience.call(flaky, "op", policy=policy) == "ok"
+    assert len(calls) == 3
+
+
+def test_delay_honours_retry_after():
+    class Throttled(Exception):
+        status_code = 429
+
+        class response:
+            headers = {"retry-after": "7"}
+
+    policy = RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=30)
+    assert policy.delay(1, Throttled()) == 7
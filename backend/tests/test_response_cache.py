@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+import metrics
+import response_cache
+from response_cache import MemoryCache, SQLiteCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_cache(request, tmp_path, clock):
+    def make(ttl=60, max_entries=3):
+        if request.param == "memory":
+            return MemoryCache(ttl=ttl, max_entries=max_entries)
+        return SQLiteCache(str(tmp_path / "cache" / "responses.sqlite3"), ttl=ttl, max_entries=max_entries)
+
+    return make
+
+
+def test_round_trip_returns_a_copy(make_cache):
+    cache = make_cache()
+    value = {"modules": [{"title": "Introdução"}]}
+    cache.set("k", value)
+    hit = cache.get("k")
+    assert hit == value
+    hit["modules"].clear()
+    assert cache.get("k") == value
+
+
+def test_entries_expire_after_the_ttl(make_cache, clock):
+    cache = make_cache(ttl=60)
+    cache.set("k", 1)
+    clock.now += 59
+    assert cache.get("k") == 1
+    clock.now += 2
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted(make_cache, clock):
+    cache = make_cache(max_entries=3)
+    for key in "abc":
+        cache.set(key, key)
+        clock.now += 1
+    assert cache.get("a") == "a"
+    clock.now += 1
+    cache.set("d", "d")
+
+    assert len(cache) == 3
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == ["a", "c", "d"]
+
+
+def test_memory_cache_never_exceeds_its_bound(clock):
+    cache = MemoryCache(max_entries=10)
+    for i in range(100):
+        cache.set(str(i), i)
+    assert len(cache) == 10
+    assert cache.get("89") is None and cache.get("99") == 99
+
+
+def test_disabled_cache_stores_nothing(clock):
+    cache = MemoryCache(max_entries=0)
+    cache.set("k", 1)
+    assert cache.get("k") is None
+
+
+def test_sqlite_cache_survives_reopening(tmp_path, clock):
+    path = str(tmp_path / "responses.sqlite3")
+    SQLiteCache(path).set("k", [1, 2])
+    assert SQLiteCache(path).get("k") == [1, 2]
+
+
+def test_async_access(make_cache):
+    cache = make_cache()
+
+    async def main():
+        await cache.aset("k", {"a": 1})
+        return await cache.aget("k"), await cache.aget("missing")
+
+    assert asyncio.run(main()) == ({"a": 1}, None)
+
+
+def test_stats_are_exported_as_gauges(make_cache):
+    cache = make_cache()
+    cache.set("k", 1)
+    cache.get("k")
+    cache.get("k")
+    cache.get("missing")
+    cache.get("missing")
+
+    assert cache.stats() == {"hits": 2, "misses": 2, "size": 1}
+    cache.record_stats()
+    assert metrics.CACHE_ENTRIES.value() == 1
+    assert metrics.CACHE_HIT_RATIO.value() == 0.5
+    assert "response_cache_hit_ratio 0.5" in metrics.render()
@@ -0,0 +1,101 @@
+import asyncio
+import random
+import time
+
+import pytest
+
+import resilience
+import sharding
+from sharding import agenerate_sharded, generate_sharded, split_modules
+
+COURSE = {"title": "Curso", "modules": [{"title": f"M{i}"} for i in range(5)]}
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(
+        sharding, "_policy",
+        lambda retries: resilience.RetryPolicy(max_attempts=retries + 1, base_delay=0, max_delay=0),
+    )
+
+
+def quizzes(shard):
+    # Finish out of order, so merging has to restore the module order
+    time.sleep(random.uniform(0, 0.01))
+    return {"quizzes": [{"module": module["title"]} for module in shard["modules"]]}
+
+
+def test_split_keeps_order_and_other_keys():
+    shards = split_modules(COURSE, 2)
+    assert [[m["title"] for m in shard["modules"]] for shard in shards] == [["M0", "M1"], ["M2", "M3"], ["M4"]]
+    assert all(shard["title"] == "Curso" for shard in shards)
+
+
+def test_split_rejects_empty_shards():
+    with pytest.raises(ValueError):
+        split_modules(COURSE, 0)
+
+
+def test_results_are_merged_in_module_order():
+    merged = generate_sharded(split_modules(COURSE, 1), quizzes, "quizzes")
+    assert [quiz["module"] for quiz in merged["quizzes"]] == ["M0", "M1", "M2", "M3", "M4"]
+    assert "failed_shards" not in merged
+
+
+def test_bad_output_is_retried_per_shard():
+    attempts = {}
+
+    def flaky(shard):
+        title = shard["modules"][0]["title"]
+        attempts[title] = attempts.get(title, 0) + 1
+        if title == "M1" and attempts[title] == 1:
+            raise ValueError("JSON inválido")
+        return quizzes(shard)
+
+    merged = generate_sharded(split_modules(COURSE, 1), flaky, "quizzes", retries=1)
+    assert len(merged["quizzes"]) == 5
+    assert attempts == {"M0": 1, "M1": 2, "M2": 1, "M3": 1, "M4": 1}
+
+
+def test_failed_shards_are_reported_not_raised():
+    def broken(shard):
+        if shard["modules"][0]["title"] == "M2":
+            raise ValueError("JSON inválido")
+        return quizzes(shard)
+
+    merged = generate_sharded(split_modules(COURSE, 2), broken, "quizzes", retries=0)
+    assert [quiz["module"] for quiz in merged["quizzes"]] == ["M0", "M1", "M4"]
+    assert merged["failed_shards"] == [{"shard": 1, "modules": ["M2", "M3"], "error": "JSON inválido"}]
+
+
+def test_other_errors_are_not_retried():
+    calls = []
+
+    def down(shard):
+        calls.append(1)
+        raise RuntimeError("API fora")
+
+    with pytest.raises(RuntimeError):
+        generate_sharded(split_modules(COURSE, 5), down, "quizzes", retries=2)
+    assert len(calls) == 1
+
+
+def test_on_shard_reports_each_success():
+    seen = []
+    generate_sharded(split_modules(COURSE, 2), quizzes, "quizzes", on_shard=lambda i, _: seen.append(i))
+    assert sorted(seen) == [0, 1, 2]
+
+
+def test_async_sharding_bounds_concurrency_and_keeps_order():
+    active, peak = [0], [0]
+
+    async def agenerate(shard):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(random.uniform(0, 0.01))
+        active[0] -= 1
+        return quizzes(shard)
+
+    merged = asyncio.run(agenerate_sharded(split_modules(COURSE, 1), agenerate, "quizzes", max_concurrency=2))
+    assert [quiz["module"] for quiz in merged["quizzes"]] == ["M0", "M1", "M2", "M3", "M4"]
+    assert peak[0] == 2
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+
+import pytest
+
+from singleflight import SingleFlight, make_key, normalize_text
+
+
+def test_keys_ignore_case_and_whitespace():
+    assert make_key(normalize_text("  Python   Básico ")) == make_key(normalize_text("python básico"))
+    assert make_key("a", 1) != make_key("a", 2)
+
+
+def test_concurrent_threads_share_one_call():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return {"items": [1, 2]}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", compute))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while flight.stats()["coalesced"] < 4:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{"items": [1, 2]}] * 5
+    # Followers get copies, so one caller mutating its result affects no other
+    assert len({id(result) for result in results}) == 5
+    assert flight.stats() == {"calls": 5, "coalesced": 4, "in_flight": 0}
+
+
+def test_followers_receive_the_leader_exception():
+    flight = SingleFlight("test")
+    started, release = threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("boom")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("k", fail)
+        except RuntimeError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while flight.stats()["coalesced"] < 1:
+        pass
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert [str(e) for e in errors] == ["boom", "boom"]
+
+
+def test_nothing_is_kept_after_the_call():
+    flight = SingleFlight("test")
+    assert flight.do("k", lambda: 1) == 1
+    assert flight.do("k", lambda: 2) == 2
+    assert flight.stats()["coalesced"] == 0
+
+
+def test_async_callers_share_one_call():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return [1]
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("k", compute) for _ in range(3)))
+
+    assert asyncio.run(main()) == [[1]] * 3
+    assert len(calls) == 1
+    assert flight.stats() == {"calls": 3, "coalesced": 2, "in_flight": 0}
+
+
+def test_cancelled_async_caller_does_not_cancel_the_shared_call():
+    flight = SingleFlight("test")
+
+    async def compute():
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    async def main():
+        first = asyncio.ensure_future(flight.ado("k", compute))
+        second = asyncio.ensure_future(flight.ado("k", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "ok"
@@ -0,0 +1,116 @@
+import json
+import types
+
+import pytest
+
+import agent_registry
+import rate_limiter
+import structured_output
+from schemas import Flashcard, FlashcardSet
+
+
+class FakeLLM:
+    """Chat model answering the repair prompts with ``replies`` in order."""
+
+    model_name = structured_output.REPAIR_MODEL
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.prompts = []
+
+    def bind(self, **kwargs):
+        return self
+
+    def invoke(self, messages):
+        self.prompts.append(messages[-1].content)
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return types.SimpleNamespace(content=reply, usage_metadata=None)
+
+
+@pytest.fixture
+def repair_llm(monkeypatch):
+    def install(*replies):
+        llm = FakeLLM(replies)
+        monkeypatch.setattr(agent_registry, "get_llm", lambda *args, **kwargs: llm)
+        agent_registry.clear()
+        return llm
+
+    yield install
+    agent_registry.clear()
+
+
+def card(question):
+    return {"question": question, "answer": "a"}
+
+
+def test_valid_response_needs_no_repair(repair_llm):
+    llm = repair_llm()
+    response = json.dumps({"flashcards": [card("q1"), card("q2")]})
+    assert structured_output.parse_response(response, FlashcardSet) == {"flashcards": [card("q1"), card("q2")]}
+    assert llm.prompts == []
+
+
+def test_broken_item_is_repaired_alone(repair_llm):
+    llm = repair_llm(json.dumps(card("q2")))
+    response = '{"flashcards": [{"question": "q1", "answer": "a"}, {"question": "q2"}, {"question": "q3", "answer": "a"}]}'
+
+    parsed = structured_output.parse_response(response, FlashcardSet)
+
+    assert parsed == {"flashcards": [card("q1"), card("q2"), card("q3")]}
+    assert len(llm.prompts) == 1
+    assert '{"question": "q2"}' in llm.prompts[0] and "q1" not in llm.prompts[0]
+
+
+def test_repair_goes_through_the_chat_limiter(repair_llm, monkeypatch):
+    repair_llm(json.dumps(card("q1")), json.dumps(card("q2")))
+    limiter = rate_limiter.RateLimiter("chat", requests_per_minute=60000)
+    monkeypatch.setitem(rate_limiter._limiters, "chat", limiter)
+    limited = []
+    limit = limiter.limit
+    monkeypatch.setattr(limiter, "limit", lambda tokens=0: limited.append(tokens) or limit(tokens))
+
+    structured_output.parse_response('{"flashcards": [{"question": "q1"}, {"question": "q2"}]}', FlashcardSet)
+
+    assert len(limited) == 2
+
+
+def test_item_is_dropped_after_the_bounded_retries(repair_llm):
+    llm = repair_llm("não sei", '{"question": "q2"}')
+    response = '{"flashcards": [{"question": "q1", "answer": "a"}, {"question": "q2"}]}'
+
+    assert structured_output.parse_response(response, FlashcardSet) == {"flashcards": [card("q1")]}
+    assert len(llm.prompts) == structured_output.MAX_REPAIR_ATTEMPTS
+
+
+def test_only_a_bounded_number_of_items_is_repaired(repair_llm, monkeypatch):
+    monkeypatch.setattr(structured_output, "MAX_REPAIRED_FRAGMENTS", 1)
+    llm = repair_llm(json.dumps(card("q1")))
+    response = '{"flashcards": [{"question": "q1"}, {"question": "q2"}, {"question": "q3", "answer": "a"}]}'
+
+    assert structured_output.parse_response(response, FlashcardSet) == {"flashcards": [card("q1"), card("q3")]}
+    assert len(llm.prompts) == 1
+
+
+def test_api_errors_are_not_retried_as_bad_output(repair_llm):
+    class BadRequest(Exception):
+        status_code = 400
+
+    llm = repair_llm(BadRequest("invalid"))
+    response = '{"flashcards": [{"question": "q1", "answer": "a"}, {"question": "q2"}]}'
+
+    assert structured_output.parse_response(response, FlashcardSet) == {"flashcards": [card("q1")]}
+    assert len(llm.prompts) == 1
+
+
+def test_schema_invalid_response_without_items_raises(repair_llm):
+    repair_llm()
+    with pytest.raises(ValueError):
+        structured_output.parse_response('{"cards": "nenhum"}', FlashcardSet)
+
+
+def test_response_format_follows_the_model():
+    assert structured_output.response_format(Flashcard, "gpt-4o")["type"] == "json_schema"
+    assert structured_output.response_format(Flashcard, "gpt-4-turbo") == {"type": "json_object"}
+    assert structured_output.response_format(Flashcard, "gpt-4") is None
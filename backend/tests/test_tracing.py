@@ -0,0 +1,52 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import sharding
+import tracing
+from pipeline import Stage, run_pipeline
+
+tracer = tracing.get_tracer(__name__)
+
+
+def parent_of_child_span():
+    with tracer.start_as_current_span("child") as span:
+        return span.parent_id
+
+
+def test_spans_nest_across_threads():
+    with tracer.start_as_current_span("root") as root:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            unbound = executor.submit(parent_of_child_span).result()
+            bound = tracing.bind(parent_of_child_span)
+            parents = [executor.submit(bound).result() for _ in range(3)]
+    assert unbound is None
+    assert parents == [root.span_id] * 3
+
+
+def test_bound_function_can_run_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def wait():
+        barrier.wait()
+        return parent_of_child_span()
+
+    with tracer.start_as_current_span("root") as root:
+        bound = tracing.bind(wait)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            parents = list(executor.map(lambda _: bound(), range(2)))
+    assert parents == [root.span_id] * 2
+
+
+def test_pipeline_and_shard_spans_nest_under_the_caller():
+    with tracer.start_as_current_span("root") as root:
+        results, _ = run_pipeline([
+            Stage("a", lambda inputs: parent_of_child_span()),
+            Stage("b", lambda inputs: parent_of_child_span()),
+        ])
+        merged = sharding.generate_sharded(
+            [{"modules": [1]}, {"modules": [2]}], lambda shard: {"items": [tracing.get_current_span().parent_id]},
+            "items",
+        )
+    assert results == {"a": root.span_id, "b": root.span_id}
+    # Each shard runs inside its own attempt span, a child of the caller's
+    assert len(merged["items"]) == 2 and all(parent == root.span_id for parent in merged["items"])
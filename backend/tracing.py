@@ -0,0 +1,256 @@
+"""Nested trace spans with the OpenTelemetry tracer interface.
+
+``get_tracer(__name__).start_as_current_span(name)`` works the same here as
+in ``opentelemetry.trace``, so instrumented code does not change if the
+OpenTelemetry SDK is adopted (``TRACE_EXPORTER=otel`` hands every span to
+it). The built-in exporters are meant for looking at a single run locally:
+
+* ``console``: when a trace finishes, its span tree is written to stderr with
+  each span's offset and duration, the critical path marked with ``*`` and
+  how parallel the children of each span ran;
+* ``file``: every span is appended to ``TRACE_FILE`` as a JSON line, which
+  ``python tracing.py traces.jsonl`` renders the same way.
+
+Spans follow the current context across asyncio tasks; use :func:`bind` to
+carry it into a thread pool.
+"""
+from __future__ import annotations
+
+import contextvars
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+TRACE_EXPORTER = os.environ.get("TRACE_EXPORTER", "none").lower()
+TRACE_FILE = os.environ.get("TRACE_FILE", "traces.jsonl")
+
+UNSET = "UNSET"
+OK = "OK"
+ERROR = "ERROR"
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation; fields are named as in OpenTelemetry's JSON."""
+
+    def __init__(self, name: str, parent: Optional[Span], attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start_time = time.time_ns()
+        self.end_time: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.events: List[Dict[str, Any]] = []
+        self.status = UNSET
+        self.status_description: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        self.attributes.update(attributes)
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> None:
+        self.events.append({"name": name, "timestamp": time.time_ns(), "attributes": dict(attributes or {})})
+
+    def record_exception(self, exception: BaseException) -> None:
+        self.add_event("exception", {
+            "exception.type": type(exception).__name__,
+            "exception.message": str(exception),
+        })
+
+    def set_status(self, status: str, description: Optional[str] = None) -> None:
+        self.status = status
+        self.status_description = description
+
+    def is_recording(self) -> bool:
+        return self.end_time is None
+
+    def end(self) -> None:
+        if self.end_time is None:
+            self.end_time = time.time_ns()
+            _export(self)
+
+    @property
+    def duration(self) -> float:
+        """Seconds from start to end (or to now, while recording)."""
+        return ((self.end_time or time.time_ns()) - self.start_time) / 1e9
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "context": {"trace_id": self.trace_id, "span_id": self.span_id},
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "attributes": self.attributes,
+            "events": self.events,
+            "status": {"status_code": self.status, "description": self.status_description},
+        }
+
+
+class Tracer:
+    def __init__(self, name: str):
+        self.name = name
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> Span:
+        """Start a child of the current span without making it current."""
+        return Span(name, _current.get(), attributes)
+
+    @contextmanager
+    def start_as_current_span(
+        self,
+        name: str,
+        attributes: Optional[Dict[str, Any]] = None,
+        record_exception: bool = True,
+        set_status_on_exception: bool = True,
+    ) -> Iterator[Span]:
+        """Run the ``with`` block inside a new child of the current span."""
+        span = self.start_span(name, attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            if record_exception:
+                span.record_exception(e)
+            if set_status_on_exception:
+                span.set_status(ERROR, f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current.reset(token)
+            span.end()
+
+
+def get_tracer(name: str) -> Any:
+    """The tracer for module ``name``: OpenTelemetry's with
+    ``TRACE_EXPORTER=otel``, the built-in one otherwise."""
+    if TRACE_EXPORTER == "otel":
+        from opentelemetry import trace
+
+        return trace.get_tracer(name)
+    return Tracer(name)
+
+
+def get_current_span() -> Optional[Any]:
+    """The span of the current context: OpenTelemetry's with
+    ``TRACE_EXPORTER=otel`` (a non-recording span outside any), the built-in
+    one (or None) otherwise."""
+    if TRACE_EXPORTER == "otel":
+        from opentelemetry import trace
+
+        return trace.get_current_span()
+    return _current.get()
+
+
+def bind(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """``fn`` running in the caller's context, so spans started in a worker
+    thread nest under the current span. Each call gets its own copy of the
+    context, so the bound function can be submitted any number of times."""
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def run(*args: Any, **kwargs: Any) -> Any:
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+_lock = threading.Lock()
+# Finished spans per trace, until the root ends (console exporter only)
+_pending: Dict[str, List[Span]] = {}
+
+
+def _export(span: Span) -> None:
+    if TRACE_EXPORTER == "file":
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with _lock:
+            with open(TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    elif TRACE_EXPORTER == "console":
+        with _lock:
+            spans = _pending.setdefault(span.trace_id, [])
+            spans.append(span)
+            if span.parent_id is not None:
+                return
+            del _pending[span.trace_id]
+        sys.stderr.write(render_tree([s.to_dict() for s in spans]) + "\n")
+
+
+def _seconds(span: Dict[str, Any]) -> float:
+    return (span["end_time"] - span["start_time"]) / 1e9
+
+
+def _critical_children(children: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Children on the critical path: the last to finish, then the last to
+    finish before it started, and so on."""
+    path = []
+    remaining = sorted(children, key=lambda span: span["end_time"])
+    while remaining:
+        last = remaining.pop()
+        path.append(last)
+        remaining = [span for span in remaining if span["end_time"] <= last["start_time"]]
+    return path
+
+
+def render_tree(spans: List[Dict[str, Any]]) -> str:
+    """Span tree of one trace: offset from the root's start, duration,
+    critical path (``*``) and parallelism of each span's children (the sum
+    of their durations over the span's own)."""
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    ids = {span["context"]["span_id"] for span in spans}
+    for span in sorted(spans, key=lambda span: span["start_time"]):
+        parent = span["parent_id"] if span["parent_id"] in ids else None
+        children.setdefault(parent, []).append(span)
+
+    lines: List[str] = []
+
+    def visit(span: Dict[str, Any], depth: int, origin: int, critical: bool) -> None:
+        kids = children.get(span["context"]["span_id"], [])
+        on_path = {id(kid) for kid in _critical_children(kids)} if critical else set()
+        duration = _seconds(span)
+        line = (
+            f"{'*' if critical else ' '} {'  ' * depth}{span['name']:<{max(1, 40 - 2 * depth)}} "
+            f"+{(span['start_time'] - origin) / 1e9:8.3f}s {duration:8.3f}s"
+        )
+        if len(kids) > 1 and duration > 0:
+            line += f"  paralelismo {sum(_seconds(kid) for kid in kids) / duration:.1f}x"
+        if span["status"]["status_code"] == ERROR:
+            line += f"  ERRO: {span['status']['description']}"
+        lines.append(line)
+        for kid in kids:
+            visit(kid, depth + 1, origin, id(kid) in on_path)
+
+    for root in children.get(None, []):
+        visit(root, 0, root["start_time"], True)
+    return "\n".join(lines)
+
+
+def main() -> None:
+    if len(sys.argv) < 2:
+        print("Usage: python tracing.py traces.jsonl [trace_id]")
+        raise SystemExit(1)
+
+    traces: Dict[str, List[Dict[str, Any]]] = {}
+    with open(sys.argv[1], encoding="utf-8") as f:
+        for line in f:
+            span = json.loads(line)
+            traces.setdefault(span["context"]["trace_id"], []).append(span)
+
+    for trace_id, spans in traces.items():
+        if len(sys.argv) > 2 and trace_id != sys.argv[2]:
+            continue
+        print(f"trace {trace_id}")
+        print(render_tree(spans))
+        print()
+
+
+if __name__ == "__main__":
+    main()